@@ -9,7 +9,7 @@ Pvue是一个将Vue 3前端与Python后端通过WebSocket集成的桌面应用
 - 前后端通过WebSocket实时通信
 - 支持多种桌面应用运行模式
 - 自动处理静态文件服务
-- 支持Python 3.6+，包括Python 3.14
+- 支持Python 3.7+，包括Python 3.14
 - 灵活的日志系统
 - 完善的错误处理和用户反馈
 
@@ -39,61 +39,58 @@ __author__ = "Your Name"
 __email__ = "your.email@example.com"
 __description__ = "A Python framework that integrates Vue 3 frontend with Python backend using WebSocket"
 
-import os
+import importlib
 
-# 只导入核心功能，不导入可选的webview模块
+# 只导入不依赖其他模块的工具函数
 from .utils import get_static_dir
-from .backend.server import WebSocketServer
 
-# 定义__all__，只包含核心功能
+# 延迟导入的名称及其所在模块，首次访问时才导入，
+# 导入 pvue 不会加载 asyncio、websockets、eel、pywebview 等依赖，web 模式和命令行工具可以快速启动
+_LAZY_ATTRIBUTES = {
+    "WebSocketServer": ".backend.server",
+    "get_current_client": ".backend.context",
+    "get_cancel_token": ".backend.context",
+    "CallCancelled": ".backend.context",
+    "get_current_trace": ".backend.tracing",
+    "trace_span": ".backend.tracing",
+    "PvueApp": ".main",
+    "run_pvue_app": ".main",
+    "EelApp": ".eel",
+    "create_eel_app": ".eel",
+    "get_eel_app": ".eel",
+    "WebViewApp": ".webview",
+    "create_webview_app": ".webview",
+    "get_webview_app": ".webview",
+}
+
+# 定义__all__
 __all__ = [
     "get_static_dir",
     "WebSocketServer",
+    "get_current_client",
+    "get_cancel_token",
+    "CallCancelled",
+    "get_current_trace",
+    "trace_span",
+    "PvueApp",
+    "run_pvue_app",
     "__version__",
     "__author__",
     "__email__",
     "__description__"
 ]
 
-# 延迟导入PvueApp和run_pvue_app，直到它们被实际使用
-# 这样在执行pvue --version时就不会触发webview的导入
-import sys
-
-# 检查是否正在执行CLI命令
-# 1. 检查当前脚本是否是cli.py
-# 2. 检查sys.argv中是否包含--version或其他CLI特定参数
-is_cli_command = False
 
-# 检查当前脚本名称
-current_script = os.path.basename(sys.argv[0]) if sys.argv else ""
-is_cli_command = current_script == "pvue" or "pvue.exe" in current_script
+def __getattr__(name):
+    """首次访问延迟导入的名称时导入其所在模块"""
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # 之后的访问不再经过 __getattr__
+    globals()[name] = value
+    return value
 
-# 检查命令行参数
-if not is_cli_command:
-    for arg in sys.argv:
-        if arg in ["--version", "-v", "--web-port", "--ws-port", "--static-dir"]:
-            is_cli_command = True
-            break
 
-# 只有在非CLI命令情况下才导入额外功能
-if not is_cli_command:
-    from .eel import EelApp, create_eel_app, get_eel_app
-    __all__.extend(["EelApp", "create_eel_app", "get_eel_app"])
-    
-    # 尝试导入WebView相关功能，如果失败则跳过
-    webview_imported = False
-    try:
-        from .main import PvueApp, run_pvue_app
-        __all__.extend(["PvueApp", "run_pvue_app"])
-        
-        # 只有在导入PvueApp后才尝试导入webview
-        try:
-            from .webview import WebViewApp, create_webview_app, get_webview_app
-            __all__.extend(["WebViewApp", "create_webview_app", "get_webview_app"])
-            webview_imported = True
-        except ImportError:
-            # 如果pywebview未安装，只提供核心功能
-            pass
-    except ImportError:
-        # 如果导入失败，仍然提供核心功能
-        pass
\ No newline at end of file
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -0,0 +1,211 @@
+"""函数结果缓存模块
+
+为纯查询类的暴露函数缓存返回值。缓存按函数参数序列化后的结果作为键，
+容量有上限（LRU 淘汰），可以设置过期时间（TTL）。
+
+缓存项同时保存每种编解码器编码后的结果，命中时既不执行函数，也不重新编码返回值，
+直接把已编码的结果拼接到响应中。
+"""
+
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# 默认缓存容量
+DEFAULT_MAXSIZE = 128
+
+
+class CachedResult:
+    """缓存的返回值，按编解码器保存编码后的结果
+
+    结果缓存和合并的并发调用（single-flight）都使用它在多个响应之间共享编码结果。
+    """
+
+    __slots__ = ('value', 'expires_at', '_encoded')
+
+    def __init__(self, value, expires_at=None):
+        """
+        初始化缓存项
+
+        Args:
+            value: 函数返回值
+            expires_at: 过期时间（time.monotonic() 时间），None 表示不过期或不在缓存中
+        """
+        self.value = value
+        self.expires_at = expires_at
+        # key 为编解码器名称，value 为编码后的返回值
+        self._encoded = {}
+
+    def encode(self, codec):
+        """
+        获取返回值的编码结果，每种编解码器只编码一次
+
+        Args:
+            codec: 编解码器
+
+        Returns:
+            str 或 bytes: 编码后的返回值
+
+        Raises:
+            TypeError, ValueError: 返回值无法编码时
+        """
+        try:
+            return self._encoded[codec.name]
+        except KeyError:
+            encoded = self._encoded[codec.name] = codec.encode(self.value)
+            return encoded
+
+
+def _key_default(obj):
+    # 二进制编解码器传入的 bytes 等参数，加上类型名避免与字符串参数冲突
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return {'\x00bytes': base64.b64encode(bytes(obj)).decode('ascii')}
+    return {'\x00' + type(obj).__name__: repr(obj)}
+
+
+def make_key(params):
+    """
+    将调用参数序列化为缓存键，字典参数的键顺序不影响结果
+
+    Args:
+        params: 调用参数列表
+
+    Returns:
+        str: 缓存键
+    """
+    return json.dumps(params, sort_keys=True, separators=(',', ':'), default=_key_default)
+
+
+class ResultCache:
+    """单个函数的结果缓存，LRU 淘汰并支持过期时间，可以在任意线程中使用"""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=None):
+        """
+        初始化结果缓存
+
+        Args:
+            maxsize: 最多缓存的参数组合数量
+            ttl: 缓存有效期（秒），默认一直有效
+
+        Raises:
+            ValueError: maxsize 或 ttl 无效时
+        """
+        if not isinstance(maxsize, int) or maxsize <= 0:
+            raise ValueError(f"Invalid cache maxsize: {maxsize!r}. It must be a positive integer")
+        if ttl is not None and ttl <= 0:
+            raise ValueError(f"Invalid cache ttl: {ttl!r}. It must be a positive number")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # 每次失效时递增。调用开始前记录，结束时已经变化说明执行期间缓存失效过，
+        # 结果可能基于失效前的数据，不再保存
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_option(cls, option):
+        """
+        根据 expose() 的 cache 参数创建缓存
+
+        Args:
+            option: True 使用默认配置，dict 可以包含 maxsize 和 ttl，False 或 None 不缓存
+
+        Returns:
+            ResultCache: 结果缓存，不缓存时返回 None
+
+        Raises:
+            ValueError: 参数无效时
+        """
+        if option is None or option is False:
+            return None
+        if option is True:
+            return cls()
+        if isinstance(option, dict):
+            unknown = set(option) - {'maxsize', 'ttl'}
+            if unknown:
+                raise ValueError(f"Invalid cache option: {', '.join(sorted(unknown))}. "
+                                 f"Valid options are: 'maxsize', 'ttl'")
+            return cls(**option)
+        raise ValueError(f"Invalid cache: {option!r}. It must be True or a dict with 'maxsize' and 'ttl'")
+
+    def get(self, key):
+        """
+        查找缓存项，过期的缓存项视为未命中
+
+        Args:
+            key: make_key() 生成的缓存键
+
+        Returns:
+            CachedResult: 缓存项，未命中时返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at is None or entry.expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, generation=None):
+        """
+        保存函数返回值，超过容量时淘汰最久未使用的缓存项
+
+        Args:
+            key: make_key() 生成的缓存键
+            value: 函数返回值
+            generation: 调用开始前的 generation，之后缓存失效过时不保存
+
+        Returns:
+            CachedResult: 新的缓存项，没有保存时同样返回包装了返回值的 CachedResult
+        """
+        expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+        entry = CachedResult(value, expires_at)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, key=None):
+        """
+        使缓存失效
+
+        Args:
+            key: 要失效的缓存键，默认清空整个缓存
+
+        Returns:
+            int: 删除的缓存项数量
+        """
+        with self._lock:
+            self.generation += 1
+            if key is None:
+                count = len(self._entries)
+                self._entries.clear()
+                return count
+            return 1 if self._entries.pop(key, None) is not None else 0
+
+    def stats(self):
+        """
+        获取缓存统计信息
+
+        Returns:
+            dict: 包含 hits、misses、size、maxsize、ttl
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl
+            }
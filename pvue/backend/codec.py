@@ -0,0 +1,495 @@
+"""消息编解码模块
+
+WebSocket 连接在握手时通过子协议（Sec-WebSocket-Protocol）协商编解码器：
+- pvue.json：JSON 文本帧（默认，前端未指定子协议时使用）
+- pvue.msgpack：MessagePack 二进制帧，需要安装 msgpack
+- pvue.cbor：CBOR 二进制帧，需要安装 cbor2
+
+二进制编解码器比 JSON 更紧凑、编解码更快，并且可以直接传输 bytes。
+
+JSON 编解码器在安装了 orjson 时使用 orjson，否则使用标准库 json。
+编解码器原生不支持的类型（datetime、Decimal、dataclass、set、NumPy 数组等）
+通过类型编码器注册表转换，编码时一次完成，不需要先把返回值复制成普通 dict。
+同一个返回值无论使用哪个编解码器、是否安装了 orjson，都按注册表转换，
+解码后得到相同的值（二进制编解码器直接传输 bytes，JSON 转换为 base64 字符串）。
+"""
+
+import base64
+import dataclasses
+import datetime
+import decimal
+import enum
+import json
+import struct
+import uuid
+from pathlib import PurePath
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+# 所有编解码器都原生支持的类型，不经过注册表
+_PLAIN_TYPES = frozenset((str, int, float, bool, type(None)))
+# 内置容器和标量类型，它们的子类没有注册编码器时按基类编码
+_BUILTIN_BASES = (str, int, float, list, tuple, dict)
+# orjson 原生编码且无法通过选项交给 default 处理的类型，用户为它们注册了编码器时不使用 orjson
+_ORJSON_NATIVE = (uuid.UUID, enum.Enum)
+
+
+class DecodeError(ValueError):
+    """消息解码失败"""
+
+
+class TypeEncoderRegistry:
+    """类型编码器注册表
+
+    按对象类型的 MRO 查找编码器，把编解码器原生不支持的对象转换为可编码的值。
+    编码器返回的值可以继续包含需要转换的对象，编解码器会递归处理。
+    """
+
+    def __init__(self):
+        """初始化注册表，并注册内置的类型编码器"""
+        # key 为类型，value 为编码器函数
+        self._encoders = {}
+        # 按具体类型缓存查找结果
+        self._cache = {}
+        # 用户注册的类型，用于判断是否需要覆盖编解码器的原生处理
+        self.custom_types = set()
+        # 用户是否为内置类型（str、int、dict 等）的子类注册了编码器，
+        # 编解码器默认按基类原生编码这些子类，需要改为交给注册表处理
+        self.overrides_builtins = False
+        # 每次注册后递增，编解码器据此刷新缓存的选项
+        self.version = 0
+
+        self._register_builtin(datetime.datetime, _encode_isoformat)
+        self._register_builtin(datetime.date, _encode_isoformat)
+        self._register_builtin(datetime.time, _encode_isoformat)
+        self._register_builtin(decimal.Decimal, str)
+        self._register_builtin(uuid.UUID, str)
+        self._register_builtin(PurePath, str)
+        self._register_builtin(enum.Enum, _encode_enum)
+        self._register_builtin(set, list)
+        self._register_builtin(frozenset, list)
+        self._register_builtin(bytes, _encode_bytes)
+        self._register_builtin(bytearray, _encode_bytes)
+        self._register_builtin(memoryview, _encode_bytes)
+
+    def _register_builtin(self, type_, encoder):
+        self._encoders[type_] = encoder
+
+    def register(self, type_, encoder):
+        """
+        注册类型编码器，覆盖同一类型已有的编码器
+
+        Args:
+            type_: 要编码的类型，子类同样使用该编码器
+            encoder: 编码器函数，接收对象并返回可编码的值
+        """
+        self._encoders[type_] = encoder
+        self.custom_types.add(type_)
+        if issubclass(type_, _BUILTIN_BASES):
+            self.overrides_builtins = True
+        self._cache.clear()
+        self.version += 1
+
+    def find(self, obj):
+        """
+        查找对象的编码器
+
+        Args:
+            obj: 要编码的对象
+
+        Returns:
+            编码器函数，找不到时返回 None
+        """
+        cls = type(obj)
+        try:
+            return self._cache[cls]
+        except KeyError:
+            pass
+
+        encoder = None
+        for base in cls.__mro__:
+            if base in self._encoders:
+                encoder = self._encoders[base]
+                break
+        if encoder is None:
+            if dataclasses.is_dataclass(obj):
+                encoder = _encode_dataclass
+            elif hasattr(obj, 'tolist') and callable(obj.tolist):
+                # NumPy 数组和标量、array.array 等
+                encoder = _encode_tolist
+            elif isinstance(obj, _BUILTIN_BASES):
+                # 编解码器交给注册表处理的内置类型子类（以及 tuple），按基类编码
+                encoder = _encode_builtin
+        self._cache[cls] = encoder
+        return encoder
+
+    def default(self, obj):
+        """
+        编解码器的 default 钩子，转换原生不支持的对象
+
+        Raises:
+            TypeError: 没有可用的编码器时
+        """
+        encoder = self.find(obj)
+        if encoder is None:
+            raise TypeError(f'Object of type {type(obj).__name__} is not serializable')
+        return encoder(obj)
+
+    def normalize(self, obj, binary=False):
+        """
+        把对象转换为只包含 str、int、float、bool、None、list、dict（以及 bytes）的值
+
+        用于无法通过 default 钩子覆盖原生处理的编解码器（cbor2 原生编码 datetime、UUID、
+        Decimal、set，标准库 json 原生编码 str、int 的子类），转换后再编码，
+        结果与其他编解码器一致。会复制整个对象，只在需要时使用。
+
+        Args:
+            obj: 要转换的对象
+            binary: 是否保留 bytes，二进制编解码器直接传输 bytes
+
+        Returns:
+            转换后的值
+
+        Raises:
+            TypeError: 没有可用的编码器时
+        """
+        cls = type(obj)
+        if cls in _PLAIN_TYPES:
+            return obj
+        if cls is list or cls is tuple:
+            return [self.normalize(item, binary) for item in obj]
+        if cls is dict:
+            return {self.normalize(key, binary): self.normalize(value, binary) for key, value in obj.items()}
+        if binary and isinstance(obj, (bytes, bytearray, memoryview)):
+            return bytes(obj)
+        return self.normalize(self.default(obj), binary)
+
+
+def _encode_builtin(obj):
+    # 返回基类的值，避免再次交给 default 处理
+    if isinstance(obj, str):
+        return str.__str__(obj)
+    if isinstance(obj, int):
+        return int.__int__(obj)
+    if isinstance(obj, float):
+        return float.__float__(obj)
+    if isinstance(obj, dict):
+        return dict(obj)
+    return list(obj)
+
+
+def _encode_isoformat(obj):
+    return obj.isoformat()
+
+
+def _encode_enum(obj):
+    return obj.value
+
+
+def _encode_bytes(obj):
+    # JSON 无法直接表示二进制数据，转换为 base64 字符串
+    return base64.b64encode(bytes(obj)).decode('ascii')
+
+
+def _encode_dataclass(obj):
+    # 只做一层浅拷贝，字段值由编解码器继续递归编码
+    return {field.name: getattr(obj, field.name) for field in dataclasses.fields(obj)}
+
+
+def _encode_tolist(obj):
+    return obj.tolist()
+
+
+class Codec:
+    """编解码器基类
+
+    除了完整编码一个对象之外，编解码器还支持把已经编码好的片段拼接成数组或对象，
+    这样批量响应中某个结果编码失败时，不需要重新编码其他结果。
+    """
+
+    # 编解码器名称
+    name = None
+    # 握手时使用的 WebSocket 子协议名称
+    subprotocol = None
+    # 是否使用二进制帧
+    binary = False
+
+    def __init__(self, type_encoders=None):
+        """
+        初始化编解码器
+
+        Args:
+            type_encoders: 类型编码器注册表，默认创建只包含内置编码器的注册表
+        """
+        self.type_encoders = type_encoders or TypeEncoderRegistry()
+
+    def encode(self, obj):
+        """
+        编码对象
+
+        Args:
+            obj: 要编码的对象
+
+        Returns:
+            str 或 bytes: 编码结果，文本编解码器返回 str，二进制编解码器返回 bytes
+
+        Raises:
+            TypeError, ValueError: 对象无法编码时
+        """
+        raise NotImplementedError
+
+    def decode(self, data):
+        """
+        解码消息
+
+        Args:
+            data: 收到的消息
+
+        Returns:
+            解码后的对象
+
+        Raises:
+            DecodeError: 消息格式无效时
+        """
+        raise NotImplementedError
+
+    def encode_array(self, items):
+        """
+        将已编码的片段拼接为数组
+
+        Args:
+            items: 已编码片段列表
+
+        Returns:
+            str 或 bytes: 编码后的数组
+        """
+        raise NotImplementedError
+
+    def encode_object(self, pairs):
+        """
+        将已编码的值拼接为对象
+
+        Args:
+            pairs: (键, 已编码值) 列表，键为字符串
+
+        Returns:
+            str 或 bytes: 编码后的对象
+        """
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    """JSON 编解码器，使用文本帧
+
+    安装了 orjson 时优先使用 orjson，orjson 无法处理的值（例如超过 64 位的整数）
+    回退到标准库 json。
+    """
+
+    name = 'json'
+    subprotocol = 'pvue.json'
+    binary = False
+
+    def __init__(self, type_encoders=None, use_orjson=None):
+        """
+        初始化 JSON 编解码器
+
+        Args:
+            type_encoders: 类型编码器注册表
+            use_orjson: 是否使用 orjson，默认在已安装时使用
+        """
+        super().__init__(type_encoders)
+        self.use_orjson = orjson is not None if use_orjson is None else use_orjson
+        if self.use_orjson and orjson is None:
+            raise ValueError('orjson is not installed')
+        # 缓存的 orjson 选项及其对应的注册表版本
+        self._option = None
+        self._option_version = None
+
+    def _orjson_option(self):
+        """
+        根据用户注册的编码器计算 orjson 选项，用户覆盖的类型不使用 orjson 的原生处理
+
+        NumPy 数组不使用 orjson 的原生编码，和其他编解码器一样由注册表转换。
+
+        Returns:
+            int: orjson 选项，用户覆盖了 orjson 无法交给 default 处理的类型（UUID、Enum）时返回 None
+        """
+        if self._option_version == self.type_encoders.version:
+            return self._option
+        option = orjson.OPT_NON_STR_KEYS
+        for type_ in self.type_encoders.custom_types:
+            if issubclass(type_, _ORJSON_NATIVE):
+                option = None
+                break
+            if issubclass(type_, (datetime.date, datetime.time)):
+                option |= orjson.OPT_PASSTHROUGH_DATETIME
+            elif dataclasses.is_dataclass(type_):
+                option |= orjson.OPT_PASSTHROUGH_DATACLASS
+            elif issubclass(type_, _BUILTIN_BASES):
+                option |= orjson.OPT_PASSTHROUGH_SUBCLASS
+        self._option = option
+        self._option_version = self.type_encoders.version
+        return option
+
+    def encode(self, obj):
+        type_encoders = self.type_encoders
+        if self.use_orjson:
+            option = self._orjson_option()
+            if option is not None:
+                try:
+                    return orjson.dumps(obj, default=type_encoders.default, option=option).decode('utf-8')
+                except TypeError:
+                    # 回退到标准库 json，仍然无法编码时由标准库抛出异常
+                    pass
+        if type_encoders.overrides_builtins or (self.use_orjson and self._option is None):
+            # 标准库 json 原生编码 str、int 等类型的子类，先按注册表转换
+            obj = type_encoders.normalize(obj)
+        return json.dumps(obj, default=type_encoders.default, ensure_ascii=False, separators=(',', ':'))
+
+    def decode(self, data):
+        try:
+            if self.use_orjson:
+                return orjson.loads(data)
+            return json.loads(data)
+        except ValueError as e:
+            raise DecodeError(f'无效的 JSON 格式: {e}')
+
+    def encode_array(self, items):
+        return '[' + ','.join(items) + ']'
+
+    def encode_object(self, pairs):
+        return '{' + ','.join(json.dumps(key) + ':' + value for key, value in pairs) + '}'
+
+
+class _BinaryCodec(Codec):
+    """二进制编解码器基类，数组和对象通过写入长度头后直接拼接片段实现"""
+
+    binary = True
+
+    def _default(self, obj):
+        # 二进制编解码器直接传输 bytes，不转换为 base64
+        if isinstance(obj, (bytes, bytearray, memoryview)):
+            return bytes(obj)
+        return self.type_encoders.default(obj)
+
+    def _array_header(self, length):
+        raise NotImplementedError
+
+    def _map_header(self, length):
+        raise NotImplementedError
+
+    def encode_array(self, items):
+        return self._array_header(len(items)) + b''.join(items)
+
+    def encode_object(self, pairs):
+        parts = [self._map_header(len(pairs))]
+        for key, value in pairs:
+            parts.append(self.encode(key))
+            parts.append(value)
+        return b''.join(parts)
+
+
+class MsgpackCodec(_BinaryCodec):
+    """MessagePack 编解码器"""
+
+    name = 'msgpack'
+    subprotocol = 'pvue.msgpack'
+
+    def encode(self, obj):
+        # 用户为内置类型的子类注册了编码器时，只原生编码精确的内置类型，其他对象交给注册表
+        return msgpack.packb(obj, default=self._default, use_bin_type=True,
+                             strict_types=self.type_encoders.overrides_builtins)
+
+    def decode(self, data):
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            raise DecodeError('MessagePack 消息必须使用二进制帧')
+        try:
+            return msgpack.unpackb(data, raw=False)
+        except Exception as e:
+            raise DecodeError(f'无效的 MessagePack 消息: {e}')
+
+    def _array_header(self, length):
+        if length < 16:
+            return bytes([0x90 | length])
+        if length < 0x10000:
+            return b'\xdc' + struct.pack('>H', length)
+        return b'\xdd' + struct.pack('>I', length)
+
+    def _map_header(self, length):
+        if length < 16:
+            return bytes([0x80 | length])
+        if length < 0x10000:
+            return b'\xde' + struct.pack('>H', length)
+        return b'\xdf' + struct.pack('>I', length)
+
+
+class CborCodec(_BinaryCodec):
+    """CBOR 编解码器"""
+
+    name = 'cbor'
+    subprotocol = 'pvue.cbor'
+
+    def encode(self, obj):
+        # cbor2 原生编码 datetime、UUID、Decimal、set 等类型且无法关闭，先按注册表转换
+        return cbor2.dumps(self.type_encoders.normalize(obj, binary=True))
+
+    def decode(self, data):
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            raise DecodeError('CBOR 消息必须使用二进制帧')
+        try:
+            return cbor2.loads(data)
+        except Exception as e:
+            raise DecodeError(f'无效的 CBOR 消息: {e}')
+
+    @staticmethod
+    def _header(major, length):
+        """按 CBOR 规范编码主类型和长度"""
+        major <<= 5
+        if length < 24:
+            return bytes([major | length])
+        if length < 0x100:
+            return bytes([major | 24, length])
+        if length < 0x10000:
+            return bytes([major | 25]) + struct.pack('>H', length)
+        if length < 0x100000000:
+            return bytes([major | 26]) + struct.pack('>I', length)
+        return bytes([major | 27]) + struct.pack('>Q', length)
+
+    def _array_header(self, length):
+        return self._header(4, length)
+
+    def _map_header(self, length):
+        return self._header(5, length)
+
+
+def available_codecs(type_encoders=None):
+    """
+    获取当前环境可用的编解码器
+
+    Args:
+        type_encoders: 所有编解码器共享的类型编码器注册表
+
+    Returns:
+        dict: 编解码器名称到编解码器实例的映射，JSON 始终可用
+    """
+    type_encoders = type_encoders or TypeEncoderRegistry()
+    codecs = {'json': JsonCodec(type_encoders)}
+    if msgpack is not None:
+        codecs['msgpack'] = MsgpackCodec(type_encoders)
+    if cbor2 is not None:
+        codecs['cbor'] = CborCodec(type_encoders)
+    return codecs
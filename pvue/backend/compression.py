@@ -0,0 +1,118 @@
+"""WebSocket 压缩模块
+
+使用 permessage-deflate 扩展压缩消息。压缩小消息既耗 CPU 又几乎不减小体积，
+因此小于阈值的消息按原样发送，只压缩大消息（笔记内容、表格数据等）。
+permessage-deflate 允许逐条消息决定是否压缩，前端浏览器不需要任何改动。
+"""
+
+try:
+    from websockets.extensions.permessage_deflate import (
+        PerMessageDeflate, ServerPerMessageDeflateFactory
+    )
+    from websockets.frames import Opcode
+except ImportError:
+    PerMessageDeflate = None
+    ServerPerMessageDeflateFactory = None
+    Opcode = None
+
+# 默认压缩配置，窗口大小和内存级别与 websockets 的默认值一致
+DEFAULT_COMPRESSION = {
+    'enabled': True,
+    'window_bits': 12,
+    'memory_level': 5,
+    'threshold': 1024
+}
+
+
+def compression_options(compression):
+    """
+    规范化压缩配置
+
+    Args:
+        compression: True 使用默认配置，False 或 None 关闭压缩，
+                     dict 可以包含 enabled、window_bits、memory_level、threshold
+
+    Returns:
+        dict: 完整的压缩配置
+
+    Raises:
+        ValueError: 配置无效时
+    """
+    options = dict(DEFAULT_COMPRESSION)
+    if compression is None or compression is False:
+        options['enabled'] = False
+    elif isinstance(compression, dict):
+        unknown = set(compression) - set(DEFAULT_COMPRESSION)
+        if unknown:
+            raise ValueError(f"Invalid compression option: {', '.join(sorted(unknown))}. "
+                             f"Valid options are: {', '.join(repr(k) for k in DEFAULT_COMPRESSION)}")
+        options.update(compression)
+    elif compression is not True:
+        raise ValueError(f"Invalid compression: {compression!r}. It must be a bool or a dict")
+
+    if not 9 <= options['window_bits'] <= 15:
+        raise ValueError(f"Invalid compression window_bits: {options['window_bits']}. It must be between 9 and 15")
+    if not 1 <= options['memory_level'] <= 9:
+        raise ValueError(f"Invalid compression memory_level: {options['memory_level']}. It must be between 1 and 9")
+    if options['threshold'] < 0:
+        raise ValueError(f"Invalid compression threshold: {options['threshold']}. It must not be negative")
+    return options
+
+
+if PerMessageDeflate is not None:
+
+    class ThresholdPerMessageDeflate(PerMessageDeflate):
+        """小于阈值的消息不压缩的 permessage-deflate 扩展"""
+
+        def __init__(self, *args, threshold=0, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.threshold = threshold
+
+        def encode(self, frame):
+            # 只跳过未分片的小消息，分片消息的后续帧必须与第一帧保持一致
+            if (frame.fin and frame.opcode in (Opcode.TEXT, Opcode.BINARY)
+                    and len(frame.data) < self.threshold):
+                return frame
+            return super().encode(frame)
+
+    class ThresholdServerPerMessageDeflateFactory(ServerPerMessageDeflateFactory):
+        """创建 ThresholdPerMessageDeflate 的服务器端扩展工厂"""
+
+        def __init__(self, *args, threshold=0, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.threshold = threshold
+
+        def process_request_params(self, params, accepted_extensions):
+            response_params, extension = super().process_request_params(params, accepted_extensions)
+            extension = ThresholdPerMessageDeflate(
+                extension.remote_no_context_takeover,
+                extension.local_no_context_takeover,
+                extension.remote_max_window_bits,
+                extension.local_max_window_bits,
+                self.compress_settings,
+                threshold=self.threshold
+            )
+            return response_params, extension
+
+
+def serve_options(options):
+    """
+    根据压缩配置生成 websockets.serve() 的参数
+
+    Args:
+        options: compression_options() 返回的压缩配置
+
+    Returns:
+        dict: compression 和 extensions 参数
+    """
+    if not options['enabled']:
+        return {'compression': None}
+    if PerMessageDeflate is None:
+        # 当前 websockets 版本不支持自定义扩展，使用内置的压缩配置
+        return {'compression': 'deflate'}
+    factory = ThresholdServerPerMessageDeflateFactory(
+        server_max_window_bits=options['window_bits'],
+        compress_settings={'memLevel': options['memory_level']},
+        threshold=options['threshold']
+    )
+    return {'compression': None, 'extensions': [factory]}
@@ -0,0 +1,83 @@
+"""调用上下文模块
+
+使用 contextvars 保存当前调用的上下文信息。上下文在事件循环中按任务隔离，
+在线程池中执行的函数也会复制调用时的上下文，因此暴露函数可以在任意执行策略下
+获取发起调用的客户端和调用的取消令牌。
+"""
+
+import contextvars
+import threading
+
+# 发起当前调用的客户端连接
+current_client = contextvars.ContextVar('pvue_current_client', default=None)
+# 当前调用的取消令牌
+current_cancel_token = contextvars.ContextVar('pvue_cancel_token', default=None)
+# 当前调用的追踪，开启追踪时才设置
+current_trace = contextvars.ContextVar('pvue_current_trace', default=None)
+
+
+class CallCancelled(Exception):
+    """调用已被前端取消或连接已关闭"""
+
+
+class CancellationToken:
+    """协作式取消令牌
+
+    在事件循环中执行的调用取消时直接中断任务；在线程池中执行的函数无法被强制中断，
+    需要在耗时的循环中检查令牌，尽早结束已经没有意义的计算。令牌可以在任意线程中检查。
+    """
+
+    def __init__(self):
+        """初始化取消令牌"""
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self):
+        """调用是否已被取消"""
+        return self._event.is_set()
+
+    def cancel(self):
+        """取消调用"""
+        self._event.set()
+
+    def wait(self, timeout=None):
+        """
+        等待调用被取消，可以代替 time.sleep() 使用
+
+        Args:
+            timeout: 最长等待时间（秒），默认一直等待
+
+        Returns:
+            bool: 调用是否已被取消
+        """
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        """
+        调用已被取消时抛出异常
+
+        Raises:
+            CallCancelled: 调用已被取消时
+        """
+        if self._event.is_set():
+            raise CallCancelled('调用已取消')
+
+
+def get_current_client():
+    """
+    获取发起当前调用的客户端连接，可用于 push() 向该客户端推送消息
+
+    Returns:
+        客户端连接，不在调用上下文中时返回 None
+    """
+    return current_client.get()
+
+
+def get_cancel_token():
+    """
+    获取当前调用的取消令牌
+
+    Returns:
+        CancellationToken: 取消令牌，不在调用上下文中时返回 None
+    """
+    return current_cancel_token.get()
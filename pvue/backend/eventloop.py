@@ -0,0 +1,76 @@
+"""事件循环模块
+
+WebSocket 服务器可以使用 uvloop 代替 asyncio 默认的事件循环。uvloop 基于 libuv，
+收发帧和调度任务的开销更低，适用于消息量大、受事件循环限制的部署。
+uvloop 是可选依赖（pip install pvue[fast]），不支持 Windows，未安装时回退到 asyncio。
+"""
+
+import asyncio
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+from ..logger import warning
+
+# 事件循环选项
+LOOP_AUTO = 'auto'
+LOOP_ASYNCIO = 'asyncio'
+LOOP_UVLOOP = 'uvloop'
+
+LOOP_OPTIONS = (LOOP_AUTO, LOOP_ASYNCIO, LOOP_UVLOOP)
+
+
+def validate_loop(loop):
+    """
+    检查事件循环选项
+
+    Args:
+        loop: 'auto'、'asyncio' 或 'uvloop'
+
+    Returns:
+        str: 事件循环选项
+
+    Raises:
+        ValueError: 选项无效时
+    """
+    if loop not in LOOP_OPTIONS:
+        raise ValueError(f"Invalid loop: {loop!r}. Valid values are: "
+                         f"{', '.join(repr(option) for option in LOOP_OPTIONS)}")
+    return loop
+
+
+def resolve_loop(loop):
+    """
+    确定实际使用的事件循环
+
+    Args:
+        loop: 事件循环选项。'auto' 在安装了 uvloop 时使用 uvloop；
+              'uvloop' 未安装时给出警告并回退到 asyncio
+
+    Returns:
+        str: 'asyncio' 或 'uvloop'
+    """
+    if loop == LOOP_ASYNCIO:
+        return LOOP_ASYNCIO
+    if uvloop is None:
+        if loop == LOOP_UVLOOP:
+            warning("uvloop 未安装或当前平台不支持，使用 asyncio 默认的事件循环")
+        return LOOP_ASYNCIO
+    return LOOP_UVLOOP
+
+
+def new_event_loop(loop=LOOP_AUTO):
+    """
+    创建事件循环
+
+    Args:
+        loop: 事件循环选项
+
+    Returns:
+        asyncio.AbstractEventLoop: 新的事件循环
+    """
+    if resolve_loop(loop) == LOOP_UVLOOP:
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
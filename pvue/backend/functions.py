@@ -0,0 +1,117 @@
+"""暴露函数注册模块
+
+记录前端可调用的 Python 函数及其执行策略：
+- inline：直接在事件循环线程中执行，只适用于极快且不阻塞的函数
+- pool：在服务器共享的线程池中执行（默认）
+- dedicated：在函数独占的线程池中执行，避免慢函数占满共享线程池
+
+协程函数（async def）始终在事件循环中等待，不受执行策略影响。
+生成器函数和异步生成器函数的返回值按数据块分帧发送给前端，
+普通生成器每次取下一个数据块时按执行策略执行。
+
+设置了 cache 的函数会缓存返回值，相同参数的调用直接返回缓存的结果；
+设置了 single_flight 的函数，参数相同的并发调用只执行一次，所有调用共享同一个结果。
+"""
+
+import asyncio
+import functools
+import inspect
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from .cache import ResultCache
+
+# 执行策略
+EXECUTION_INLINE = 'inline'
+EXECUTION_POOL = 'pool'
+EXECUTION_DEDICATED = 'dedicated'
+
+EXECUTION_POLICIES = (EXECUTION_INLINE, EXECUTION_POOL, EXECUTION_DEDICATED)
+
+
+def default_pool_size():
+    """默认共享线程池大小，与 ThreadPoolExecutor 的默认值保持一致"""
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def _unwrap(func):
+    """去掉 functools.partial 包装，获取原始函数"""
+    while isinstance(func, functools.partial):
+        func = func.func
+    return func
+
+
+def _is_coroutine_function(func):
+    """判断函数是否为协程函数，兼容 functools.partial 和定义了 async __call__ 的对象"""
+    func = _unwrap(func)
+    if asyncio.iscoroutinefunction(func):
+        return True
+    call = getattr(func, '__call__', None)
+    return call is not None and asyncio.iscoroutinefunction(call)
+
+
+class ExposedFunction:
+    """已暴露的函数，保存原函数和调用时使用的执行策略"""
+
+    def __init__(self, name, func, execution=EXECUTION_POOL, max_workers=None, cache=None,
+                 single_flight=False):
+        """
+        初始化暴露函数
+
+        Args:
+            name: 前端调用时使用的函数名
+            func: 要暴露的 Python 函数
+            execution: 执行策略，可选值：'inline'、'pool'、'dedicated'，
+                       也可以直接传入一个 concurrent.futures.Executor 实例
+            max_workers: dedicated 策略下独占线程池的大小，默认为 1
+            cache: 结果缓存配置，True 使用默认配置，
+                   也可以传入 {'maxsize': 最大缓存数量, 'ttl': 有效期（秒）}，默认不缓存
+            single_flight: 是否合并参数相同的并发调用
+
+        Raises:
+            ValueError: 执行策略或缓存配置无效时，或者生成器函数设置了 cache 或 single_flight 时
+        """
+        self.name = name
+        self.func = func
+        # 注册时检测协程函数，调用时直接 await
+        self.is_coroutine = _is_coroutine_function(func)
+        # 注册时检测生成器函数，调用结果按数据块分帧发送
+        self.is_generator = inspect.isgeneratorfunction(_unwrap(func))
+        self.is_async_generator = inspect.isasyncgenfunction(_unwrap(func))
+        # 结果缓存，生成器的数据块逐帧发送，无法缓存或共享
+        self.cache = ResultCache.from_option(cache)
+        if self.cache is not None and (self.is_generator or self.is_async_generator):
+            raise ValueError(f"Cache is not supported for generator function: {name}")
+        self.single_flight = bool(single_flight)
+        if self.single_flight and (self.is_generator or self.is_async_generator):
+            raise ValueError(f"Single-flight is not supported for generator function: {name}")
+        # 独占线程池实例，只有 dedicated 策略才会创建
+        self.executor = None
+        # 线程池是否由本对象创建（决定停止时是否需要关闭）
+        self.owns_executor = False
+
+        if isinstance(execution, Executor):
+            self.executor = execution
+            execution = EXECUTION_DEDICATED
+        elif execution not in EXECUTION_POLICIES:
+            raise ValueError(
+                f"Invalid execution: {execution}. "
+                f"Valid values are: {', '.join(repr(p) for p in EXECUTION_POLICIES)}"
+            )
+        elif execution == EXECUTION_DEDICATED and not self.is_coroutine:
+            self.executor = ThreadPoolExecutor(
+                max_workers=max_workers or 1,
+                thread_name_prefix=f'pvue-{name}'
+            )
+            self.owns_executor = True
+
+        self.execution = execution
+
+    def __call__(self, *args, **kwargs):
+        """直接调用原函数，保持与旧版函数注册表的兼容"""
+        return self.func(*args, **kwargs)
+
+    def shutdown(self):
+        """关闭独占线程池"""
+        if self.owns_executor and self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
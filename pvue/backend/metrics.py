@@ -0,0 +1,226 @@
+"""运行指标模块
+
+记录 WebSocket 服务器的运行指标（每个函数的调用次数、错误次数、执行中的调用数、
+耗时分布，以及连接数和收发字节数），并输出为 Prometheus 文本格式，
+由静态文件服务器在 /_pvue/metrics 路径提供。
+
+不依赖 prometheus_client，指标可以在任意线程中更新和读取。
+"""
+
+import bisect
+import threading
+
+# Prometheus 文本格式的 Content-Type
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 默认耗时分布桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """指标基类，按标签值保存多个时间序列"""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _new_value(self):
+        return 0
+
+    def _render_series(self, labels, value):
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}']
+
+    def render(self):
+        """
+        输出 Prometheus 文本格式
+
+        Returns:
+            list: 文本行
+        """
+        with self._lock:
+            series = [(labels, self._snapshot(value)) for labels, value in self._values.items()]
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        if not series and not self.labelnames:
+            series = [((), self._new_value())]
+        for labels, value in sorted(series, key=lambda item: item[0]):
+            lines.extend(self._render_series(labels, value))
+        return lines
+
+    def _snapshot(self, value):
+        return value
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    type = 'counter'
+
+    def inc(self, *labels, amount=1):
+        """
+        增加计数
+
+        Args:
+            labels: 标签值，顺序与 labelnames 一致
+            amount: 增加量
+        """
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, *labels):
+        """获取当前计数"""
+        return self._values.get(labels, 0)
+
+
+class Gauge(_Metric):
+    """可增可减的当前值"""
+
+    type = 'gauge'
+
+    def inc(self, *labels, amount=1):
+        """增加当前值"""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        """减少当前值"""
+        self.inc(*labels, amount=-amount)
+
+    def get(self, *labels):
+        """获取当前值"""
+        return self._values.get(labels, 0)
+
+
+class Histogram(_Metric):
+    """分布统计，按桶记录观测值的数量"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_value(self):
+        # 各个桶的计数（不累计）、观测值总和
+        return [[0] * (len(self.buckets) + 1), 0.0]
+
+    def observe(self, value, *labels):
+        """
+        记录一个观测值
+
+        Args:
+            value: 观测值
+            labels: 标签值
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = self._new_value()
+            state[0][index] += 1
+            state[1] += value
+
+    def _snapshot(self, value):
+        return [list(value[0]), value[1]]
+
+    def _render_series(self, labels, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = f'le="{_format_value(float(bound))}"'
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+        label_text = _format_labels(self.labelnames, labels)
+        lines.append(f'{self.name}_sum{label_text} {_format_value(total)}')
+        lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+
+class ServerMetrics:
+    """WebSocket 服务器的运行指标"""
+
+    def __init__(self):
+        """创建所有指标"""
+        self.calls = Counter('pvue_calls_total', '函数调用次数', ('function',))
+        self.errors = Counter('pvue_call_errors_total', '函数调用失败次数', ('function',))
+        self.in_flight = Gauge('pvue_calls_in_flight', '正在执行的函数调用数', ('function',))
+        self.duration = Histogram('pvue_call_duration_seconds', '函数调用耗时（秒）', ('function',))
+        self.connections = Gauge('pvue_connections', '当前连接数')
+        self.connections_total = Counter('pvue_connections_total', '累计连接数')
+        self.messages_received = Counter('pvue_messages_received_total', '收到的消息数')
+        self.messages_sent = Counter('pvue_messages_sent_total', '发送的消息数')
+        self.bytes_received = Counter('pvue_received_bytes_total', '收到的字节数')
+        self.bytes_sent = Counter('pvue_sent_bytes_total', '发送的字节数')
+        self._metrics = [
+            self.calls, self.errors, self.in_flight, self.duration,
+            self.connections, self.connections_total,
+            self.messages_received, self.messages_sent, self.bytes_received, self.bytes_sent
+        ]
+
+    def record_received(self, message):
+        """记录收到的消息"""
+        self.messages_received.inc()
+        self.bytes_received.inc(amount=frame_size(message))
+
+    def record_sent(self, frame, count=1):
+        """
+        记录发送的消息
+
+        Args:
+            frame: 发送的帧
+            count: 发送给多少个客户端
+        """
+        self.messages_sent.inc(amount=count)
+        self.bytes_sent.inc(amount=frame_size(frame) * count)
+
+    def render(self):
+        """
+        输出 Prometheus 文本格式
+
+        Returns:
+            str: 所有指标
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def frame_size(frame):
+    """
+    计算帧的字节数，文本帧按 UTF-8 编码计算
+
+    Args:
+        frame: str 或 bytes
+
+    Returns:
+        int: 字节数
+    """
+    if isinstance(frame, str):
+        # 纯 ASCII 文本不需要编码即可得到字节数
+        return len(frame) if frame.isascii() else len(frame.encode('utf-8'))
+    return len(frame)
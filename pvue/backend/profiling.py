@@ -0,0 +1,236 @@
+"""函数调用性能分析模块
+
+在不重启应用的情况下临时开启 cProfile，按采样率分析暴露函数的调用，
+按函数汇总结果，结束后输出 pstats 文件（可以用 snakeviz、flameprof、gprof2dot
+等工具生成火焰图或调用图）。
+
+cProfile 在同一时刻只能有一个分析器工作，因此同一时刻只分析一个调用，
+其他并发调用直接执行，不会被阻塞。
+只分析同步函数，协程函数和生成器的执行会穿插其他任务，结果没有意义。
+
+Python 3.12 起 cProfile 基于 sys.monitoring，对所有线程生效，会把其他线程中
+同时执行的代码计入被分析的调用。因此 3.12 及以上版本改用只分析当前线程的
+profile 模块（纯 Python 实现，开销更大，但只作用于被采样的调用）。
+"""
+
+import cProfile
+import os
+import profile
+import pstats
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+
+from ..logger import info, warning
+
+# cProfile 是否只分析调用它的线程
+_CPROFILE_PER_THREAD = sys.version_info < (3, 12)
+# 每个函数的 pstats 文件所在的子目录，与汇总文件 all.pstats 分开，函数名为 all 时不会覆盖
+FUNCTIONS_DIR = 'functions'
+
+
+class CallProfiler:
+    """暴露函数调用的采样性能分析器"""
+
+    def __init__(self):
+        """初始化性能分析器，默认不工作"""
+        # 是否正在分析，调用路径上只读取这个标志，未开启时没有额外开销
+        self.active = False
+        self.sample_rate = 1.0
+        self.max_calls = None
+        self.deadline = None
+        self.output_dir = None
+        # 已分析的调用数
+        self.profiled_calls = 0
+        # 分析会话编号，开始和结束时递增，分析结果只汇总到开始分析时的会话
+        self._session = 0
+        # 按函数汇总的分析结果，key 为函数名
+        self._stats = {}
+        # 保证同一时刻只分析一个调用
+        self._profile_lock = threading.Lock()
+        # 保护汇总结果和开关状态
+        self._lock = threading.Lock()
+        self._timer = None
+        self._last_output = []
+
+    def start(self, duration=None, calls=None, sample_rate=1.0, output_dir=None):
+        """
+        开始分析，之前未结束的分析会被丢弃
+
+        Args:
+            duration: 分析时长（秒），到时自动结束并输出结果
+            calls: 分析的调用数，达到后自动结束并输出结果
+            sample_rate: 采样率，0 到 1 之间
+            output_dir: 结果输出目录，默认在临时目录中创建
+
+        Raises:
+            ValueError: 参数无效时
+        """
+        if not 0 < sample_rate <= 1:
+            raise ValueError(f"Invalid sample_rate: {sample_rate}. It must be between 0 and 1")
+        if duration is not None and duration <= 0:
+            raise ValueError(f"Invalid duration: {duration}. It must be a positive number")
+        if calls is not None and calls <= 0:
+            raise ValueError(f"Invalid calls: {calls}. It must be a positive integer")
+
+        with self._lock:
+            self._cancel_timer()
+            self._session += 1
+            self._stats = {}
+            self.profiled_calls = 0
+            self.sample_rate = sample_rate
+            self.max_calls = calls
+            self.deadline = None if duration is None else time.monotonic() + duration
+            self.output_dir = output_dir or os.path.join(
+                tempfile.gettempdir(), time.strftime('pvue-profile-%Y%m%d-%H%M%S')
+            )
+            if duration is not None:
+                self._timer = threading.Timer(duration, self.stop)
+                self._timer.daemon = True
+                self._timer.start()
+            self.active = True
+        info("开始性能分析: 时长 {} 秒，调用数 {}，采样率 {}", duration, calls, sample_rate)
+
+    def stop(self):
+        """
+        结束分析并输出结果
+
+        Returns:
+            list: 输出的 pstats 文件路径，每个函数一个文件（在 functions 子目录中），
+                  另有一个汇总所有函数的 all.pstats；没有在分析时返回上一次分析的输出
+        """
+        with self._lock:
+            if not self.active:
+                return list(self._last_output)
+            self.active = False
+            self._cancel_timer()
+        # 等待正在分析的调用结束并汇总结果
+        with self._profile_lock:
+            pass
+        with self._lock:
+            # 之后才结束的调用属于已结束的会话，不再汇总
+            self._session += 1
+            stats, self._stats = self._stats, {}
+        self._last_output = self._dump(stats)
+        info("性能分析结束，共分析 {} 个调用，结果: {}", self.profiled_calls, self.output_dir)
+        return list(self._last_output)
+
+    def status(self):
+        """
+        获取分析状态
+
+        Returns:
+            dict: active、profiled_calls、functions、remaining（剩余秒数）、output_dir、last_output
+        """
+        with self._lock:
+            remaining = None
+            if self.active and self.deadline is not None:
+                remaining = max(0.0, self.deadline - time.monotonic())
+            return {
+                'active': self.active,
+                'profiled_calls': self.profiled_calls,
+                'functions': sorted(self._stats),
+                'remaining': remaining,
+                'output_dir': self.output_dir,
+                'last_output': list(self._last_output)
+            }
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def call(self, name, func, *args):
+        """
+        调用函数，按采样率分析本次调用
+
+        Args:
+            name: 函数名，用于汇总结果
+            func: 要调用的函数
+            args: 函数参数
+
+        Returns:
+            函数返回值
+        """
+        if not self.active or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            return func(*args)
+        # 其他调用正在被分析时直接执行
+        if not self._profile_lock.acquire(blocking=False):
+            return func(*args)
+        # 拿到分析锁时分析可能已经结束：stop() 只等待已经开始分析的调用
+        session = self._session
+        if not self.active:
+            self._profile_lock.release()
+            return func(*args)
+
+        if not _CPROFILE_PER_THREAD:
+            profiler = profile.Profile()
+            try:
+                return profiler.runcall(func, *args)
+            finally:
+                self._collect(name, profiler, session)
+                self._profile_lock.release()
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # 其他分析工具正在工作
+            self._profile_lock.release()
+            return func(*args)
+        try:
+            return func(*args)
+        finally:
+            profiler.disable()
+            self._collect(name, profiler, session)
+            self._profile_lock.release()
+
+    def _collect(self, name, profiler, session):
+        """汇总一次调用的分析结果，达到调用数上限时结束分析"""
+        with self._lock:
+            if session != self._session:
+                # 分析已经结束或重新开始
+                return
+            stats = self._stats.get(name)
+            if stats is None:
+                self._stats[name] = pstats.Stats(profiler)
+            else:
+                stats.add(profiler)
+            self.profiled_calls += 1
+            reached = self.max_calls is not None and self.profiled_calls >= self.max_calls
+        if reached:
+            # 在其他线程中结束，避免在持有分析锁时等待
+            threading.Thread(target=self.stop, name='pvue-profiler', daemon=True).start()
+
+    def _dump(self, stats):
+        """将汇总结果写入输出目录"""
+        if not stats:
+            warning("性能分析期间没有分析到任何调用")
+            return []
+        functions_dir = os.path.join(self.output_dir, FUNCTIONS_DIR)
+        os.makedirs(functions_dir, exist_ok=True)
+        paths = []
+        filenames = set()
+        combined = None
+        for name, function_stats in sorted(stats.items()):
+            filename = re.sub(r'[^\w.-]', '_', name)
+            # 替换字符后重名的函数（例如 a/b 和 a_b）加上序号
+            unique, index = filename, 1
+            while unique in filenames:
+                index += 1
+                unique = f'{filename}-{index}'
+            filenames.add(unique)
+            path = os.path.join(functions_dir, unique + '.pstats')
+            function_stats.dump_stats(path)
+            paths.append(path)
+            if combined is None:
+                combined = pstats.Stats(path)
+            else:
+                combined.add(path)
+        path = os.path.join(self.output_dir, 'all.pstats')
+        combined.dump_stats(path)
+        paths.append(path)
+        return paths
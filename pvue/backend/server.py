@@ -1,37 +1,514 @@
 import asyncio
-import json
+import functools
+import contextvars
+import inspect
+import os
+import signal
+import threading
+import time
 import websockets
+from concurrent.futures import Future, ThreadPoolExecutor
+from ..logger import LogLevel, debug, error, info, warning, is_enabled_for, payload
+from .cache import CachedResult, make_key
+from .codec import DecodeError, TypeEncoderRegistry, available_codecs
+from .compression import compression_options, serve_options
+from .metrics import ServerMetrics
+from .profiling import CallProfiler
+from .tracing import JsonLinesExporter, Trace, trace_span
+from .workers import (
+    COMMAND_BROADCAST, COMMAND_INVALIDATE_CACHE, MessageReader, WorkerSupervisor, decode_message, encode_message,
+    workers_supported
+)
+from .eventloop import LOOP_AUTO, new_event_loop, resolve_loop, validate_loop
+from .context import CancellationToken, current_cancel_token, current_client, current_trace
+from .transfer import (
+    DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE, TransferError, TransferManager, is_transfer_frame, unpack_frame
+)
+from .functions import (
+    ExposedFunction, EXECUTION_INLINE, EXECUTION_POOL, default_pool_size
+)
+
+# 错误码，随错误响应返回给前端
+ERROR_INVALID_JSON = 'invalid_json'
+ERROR_INVALID_MESSAGE = 'invalid_message'
+ERROR_INVALID_REQUEST = 'invalid_request'
+ERROR_FUNCTION_NOT_FOUND = 'function_not_found'
+ERROR_FUNCTION_ERROR = 'function_error'
+ERROR_ENCODE = 'encode_error'
+
+# handle_message() 的 data 参数默认值，表示消息还没有解码（None 是有效的解码结果）
+_NOT_DECODED = object()
+
+class RpcError(Exception):
+    """RPC 协议错误，携带返回给前端的错误码"""
+    
+    def __init__(self, code, message):
+        """
+        初始化 RPC 错误
+        
+        Args:
+            code: 错误码
+            message: 错误信息
+        """
+        super().__init__(message)
+        self.code = code
+
+class _Flight:
+    """合并执行中的一次调用，记录等待结果的调用数量"""
+    
+    def __init__(self, task, token):
+        self.task = task
+        self.token = token
+        self.waiters = 0
 
 class WebSocketServer:
-    """WebSocket 服务器类，用于处理前端和后端之间的通信"""
+    """WebSocket 服务器类，用于处理前端和后端之间的通信
     
-    def __init__(self, port=8765):
+    消息协议：
+    - 请求：{"id": 1, "function": "name", "params": [...]}
+    - 成功响应：{"id": 1, "result": ...}
+    - 错误响应：{"id": 1, "error": {"code": "...", "type": "...", "message": "..."}}
+    - 流式响应：生成器函数的每个数据块单独发送 {"id": 1, "chunk": ...}，
+      结束时发送 {"id": 1, "done": true, "count": 数据块数量}，出错时发送错误响应
+    - 订阅主题：{"id": 2, "type": "subscribe", "topics": ["..."]}，
+      取消订阅时 type 为 "unsubscribe"，响应的 result 为当前订阅的主题列表
+    - 服务器推送：{"topic": "...", "data": ...}，由 broadcast() 或 push() 发送
+    - 取消调用：{"type": "cancel", "id": 1}，id 为要取消的调用（或批量调用）的 id，
+      被取消的调用不再发送响应；连接关闭时自动取消该连接上所有未完成的调用
+    - 文件上传：{"id": 3, "type": "upload", "name": "...", "size": 字节数, "upload_id": 续传时提供}，
+      响应 {"transfer": 传输 ID, "upload_id": ..., "offset": 续传位置}，之后按顺序发送传输帧，
+      最后发送 {"id": 4, "type": "upload_finish", "transfer": 传输 ID}（放弃时 type 为 "upload_abort"）；
+      传输帧写入失败时发送 {"transfer": 传输 ID, "error": {...}}
+    - 文件下载：{"id": 5, "type": "download", "path": "...", "offset": 0, "chunk_size": 262144}，
+      先发送 {"id": 5, "result": {"transfer": 传输 ID, "size": 文件大小, "offset": ...}}，
+      然后发送传输帧，结束时发送 {"id": 5, "done": true, "count": 帧数, "size": 文件大小}
+    - 传输帧：二进制帧，b'\\x00PVF' + 传输 ID（u32）+ 偏移量（u64）+ 数据，见 transfer 模块
+    
+    id 由前端生成并原样返回，同一连接上的多个调用按完成顺序返回响应，
+    前端通过 id 匹配请求和响应。
+    
+    消息默认使用 JSON 文本帧。前端在握手时指定子协议 pvue.msgpack 或 pvue.cbor
+    （服务器已安装对应的库）时，该连接改用二进制帧，消息结构不变。
+    """
+    
+    def __init__(self, port=8765, max_workers=None, max_concurrent_calls=64, codecs=None,
+                 compression=True, upload_dir=None, download_roots=None, trace_file=None, workers=1,
+                 loop=LOOP_AUTO):
         """
         初始化 WebSocket 服务器
         
         Args:
             port: WebSocket 服务器端口
+            max_workers: 共享线程池大小，默认为 min(32, CPU 核数 + 4)
+            max_concurrent_calls: 单个连接同时执行的最大调用数
+            codecs: 允许协商的编解码器名称列表，例如 ['msgpack', 'json']，
+                    默认为所有已安装的编解码器，JSON 始终可用
+            compression: permessage-deflate 压缩配置，True 使用默认配置，False 关闭压缩，
+                         也可以传入 dict：enabled（是否启用）、window_bits（窗口大小，9-15，默认 12）、
+                         memory_level（内存级别，1-9，默认 5）、
+                         threshold（小于该字节数的消息不压缩，默认 1024）
+            upload_dir: 文件上传目录，默认不允许上传
+            download_roots: 允许下载的目录列表，默认不允许下载
+            trace_file: 调用追踪的 JSON Lines 导出文件，记录每条消息各阶段的耗时，默认不追踪
+            workers: 工作进程数，大于 1 时 fork 多个进程通过 SO_REUSEPORT 监听同一个端口，
+                     每个进程运行独立的事件循环；平台不支持时回退到单进程
+            loop: 事件循环，'auto'（安装了 uvloop 时使用 uvloop，默认）、'asyncio' 或 'uvloop'，
+                  uvloop 不可用时回退到 asyncio
+            
+        Raises:
+            ValueError: 指定的编解码器不可用，或压缩配置、事件循环选项无效时
         """
         self.port = port
+        self.max_concurrent_calls = max_concurrent_calls
+        # 所有编解码器共享的类型编码器注册表
+        self.type_encoders = TypeEncoderRegistry()
+        # 可协商的编解码器，key 为编解码器名称
+        installed = available_codecs(self.type_encoders)
+        if codecs is None:
+            self.codecs = installed
+        else:
+            missing = [name for name in codecs if name not in installed]
+            if missing:
+                raise ValueError(f"Codec not available: {', '.join(missing)}. "
+                                 f"Available codecs are: {', '.join(installed)}")
+            self.codecs = {name: installed[name] for name in codecs}
+            self.codecs.setdefault('json', installed['json'])
+        self._codecs_by_subprotocol = {
+            codec.subprotocol: codec for codec in self.codecs.values()
+        }
+        self.compression = compression_options(compression)
+        # 文件上传和下载
+        self.transfers = TransferManager(upload_dir, download_roots)
+        # 运行指标，由 PvueApp 的静态文件服务器以 Prometheus 文本格式提供
+        self.metrics = ServerMetrics()
+        # 性能分析器，调用 start_profiling() 后才工作
+        self.profiler = CallProfiler()
+        # 调用追踪导出，未开启时不创建追踪，没有额外开销
+        self.tracer = JsonLinesExporter(trace_file) if trace_file else None
+        if workers < 1:
+            raise ValueError(f"Invalid workers: {workers}. It must be a positive integer")
+        self.workers = workers
+        # 工作进程监督者，只在主进程以多进程模式运行时存在
+        self.supervisor = None
+        self.loop_option = validate_loop(loop)
+        # 当前工作进程的序号，单进程模式和主进程中为 None
+        self.worker_index = None
         self.server = None
+        self.loop = None
+        # 事件循环所在线程，用于判断 broadcast() 等方法是否在事件循环线程中调用
+        self._loop_thread_id = None
         self.is_running = False
+        # 端口开始监听后设置，多进程模式下所有工作进程都开始监听后设置
+        self.ready = threading.Event()
+        # 工作进程通知主进程已开始监听的管道
+        self._ready_fd = None
+        # 工作进程与监督进程之间转发消息的 socket
+        self._channel = None
         self.connected_clients = set()
+        # 主题订阅表，key 为主题，value 为订阅该主题的客户端集合
+        self.subscriptions = {}
+        # 共享线程池，首次调用 pool 策略的函数时创建
+        self.max_workers = max_workers or default_pool_size()
+        self.executor = None
         # 函数注册表，用于存储前端可以调用的函数
         self.functions = {}
-        # 注册默认的文本处理函数
-        self.functions['uppercase'] = self.uppercase
-        self.functions['lowercase'] = self.lowercase
-        self.functions['reverse'] = self.reverse
+        # 正在执行的合并调用，key 为 (函数名, 参数缓存键)
+        self._flights = {}
+        # 注册默认的文本处理函数（足够快，直接在事件循环中执行）
+        self.expose_function('uppercase', self.uppercase, execution=EXECUTION_INLINE)
+        self.expose_function('lowercase', self.lowercase, execution=EXECUTION_INLINE)
+        self.expose_function('reverse', self.reverse, execution=EXECUTION_INLINE)
     
-    def expose_function(self, name, func):
+    def expose_function(self, name, func, execution=EXECUTION_POOL, max_workers=None, cache=None,
+                        single_flight=False):
         """
         暴露函数给前端调用
         
         Args:
             name: 前端调用时使用的函数名
             func: 要暴露的 Python 函数
+            execution: 执行策略，可选值：'inline'（在事件循环中直接执行）、
+                       'pool'（在共享线程池中执行，默认）、'dedicated'（在独占线程池中执行），
+                       也可以直接传入一个 concurrent.futures.Executor 实例
+            max_workers: dedicated 策略下独占线程池的大小，默认为 1
+            cache: 结果缓存配置，True 使用默认配置，
+                   也可以传入 {'maxsize': 最大缓存数量, 'ttl': 有效期（秒）}，默认不缓存
+            single_flight: 是否合并参数相同的并发调用，同时到达的相同调用只执行一次
+        """
+        exposed = ExposedFunction(name, func, execution, max_workers, cache, single_flight)
+        # 替换同名函数时，关闭旧函数的独占线程池
+        previous = self.functions.get(name)
+        if previous is not None:
+            previous.shutdown()
+        self.functions[name] = exposed
+    
+    def invalidate_cache(self, name=None, params=None):
+        """
+        使函数的结果缓存失效，可以在任意线程中调用
+        
+        多进程模式下通过监督进程转发给所有工作进程，params 需要可以 pickle。
+        
+        Args:
+            name: 函数名，默认为所有设置了缓存的函数
+            params: 调用参数列表，只使这组参数的缓存失效，默认清空函数的整个缓存
+            
+        Returns:
+            int: 删除的缓存项数量。多进程模式下缓存分布在各个工作进程中，
+            在主进程中调用时结果为 None，在工作进程中调用时为本进程删除的数量
+            
+        Raises:
+            KeyError: 函数不存在时
+        """
+        if name is not None and name not in self.functions:
+            raise KeyError(name)
+        if self.supervisor is not None:
+            self.supervisor.send(COMMAND_INVALIDATE_CACHE, name, params)
+            return None
+        if self._channel is not None:
+            # 其他工作进程收到转发的命令后删除各自的缓存，当前进程再删除一次没有影响
+            self._run_in_loop(self._publish(COMMAND_INVALIDATE_CACHE, name, params))
+        return self._invalidate_cache(name, params)
+    
+    def _invalidate_cache(self, name, params):
+        """删除本进程中的缓存项，返回删除的数量"""
+        if name is None:
+            functions = list(self.functions.values())
+        else:
+            functions = [self.functions[name]]
+        key = None if params is None else make_key(list(params))
+        return sum(exposed.cache.invalidate(key) for exposed in functions if exposed.cache is not None)
+    
+    def _check_local_state(self, what):
+        """多进程模式下主进程中没有连接和调用，读取或修改本进程的状态没有意义"""
+        if self.supervisor is not None:
+            raise RuntimeError(f'多进程模式下{what}只作用于各个工作进程，不能在主进程中使用')
+    
+    def cache_stats(self):
+        """
+        获取所有设置了缓存的函数的缓存统计信息
+        
+        Returns:
+            dict: key 为函数名，value 为 {'hits', 'misses', 'size', 'maxsize', 'ttl'}
+            
+        Raises:
+            RuntimeError: 多进程模式下在主进程中调用时
+        """
+        self._check_local_state('缓存统计')
+        return {
+            name: exposed.cache.stats()
+            for name, exposed in self.functions.items() if exposed.cache is not None
+        }
+    
+    def register_type_encoder(self, type_, encoder):
+        """
+        注册类型编码器，让暴露函数可以直接返回编解码器原生不支持的对象
+        
+        内置支持 datetime、date、time、Decimal、UUID、Enum、Path、set、dataclass、
+        NumPy 数组，JSON 连接中的 bytes 转换为 base64 字符串。
+        
+        Args:
+            type_: 要编码的类型，子类同样使用该编码器
+            encoder: 编码器函数，接收对象并返回可编码的值
+        """
+        self.type_encoders.register(type_, encoder)
+    
+    def start_profiling(self, duration=None, calls=None, sample_rate=1.0, output_dir=None):
+        """
+        开始分析同步函数的调用性能，不需要重启应用，可以在任意线程中调用
+        
+        Args:
+            duration: 分析时长（秒），到时自动结束并输出结果
+            calls: 分析的调用数，达到后自动结束并输出结果
+            sample_rate: 采样率，0 到 1 之间，默认分析所有调用
+            output_dir: pstats 文件输出目录，默认在临时目录中创建
+            
+        Raises:
+            ValueError: 参数无效时
+            RuntimeError: 多进程模式下在主进程中调用时
+        """
+        self._check_local_state('性能分析')
+        self.profiler.start(duration, calls, sample_rate, output_dir)
+    
+    def stop_profiling(self):
+        """
+        结束性能分析并输出结果
+        
+        Returns:
+            list: pstats 文件路径，每个函数一个文件（在 functions 子目录中），另有汇总所有函数的 all.pstats
+            
+        Raises:
+            RuntimeError: 多进程模式下在主进程中调用时
+        """
+        self._check_local_state('性能分析')
+        return self.profiler.stop()
+    
+    def profiling_status(self):
+        """
+        获取性能分析状态
+        
+        Returns:
+            dict: active、profiled_calls、functions、remaining、output_dir、last_output
+            
+        Raises:
+            RuntimeError: 多进程模式下在主进程中调用时
+        """
+        self._check_local_state('性能分析')
+        return self.profiler.status()
+    
+    def _get_shared_executor(self):
+        """获取共享线程池，不存在时创建"""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix='pvue-worker'
+            )
+        return self.executor
+    
+    async def _call_function(self, exposed, params):
+        """
+        按照函数的执行策略调用函数
+        
+        Args:
+            exposed: ExposedFunction 实例
+            params: 调用参数列表
+            
+        Returns:
+            函数返回值
+        """
+        # 协程函数直接在事件循环中等待
+        if exposed.is_coroutine:
+            return await exposed.func(*params)
+        
+        # 创建生成器不会执行函数体，直接调用即可，函数体在迭代时按执行策略执行
+        if exposed.is_generator or exposed.is_async_generator:
+            return exposed.func(*params)
+        
+        func = exposed.func
+        if self.profiler.active:
+            # 性能分析期间按采样率分析同步函数的调用
+            func = functools.partial(self.profiler.call, exposed.name, func)
+        
+        if exposed.execution == EXECUTION_INLINE:
+            result = func(*params)
+        else:
+            executor = exposed.executor or self._get_shared_executor()
+            result = await self._run_in_executor(executor, func, *params)
+        
+        # 普通函数返回了可等待对象（例如包装过的协程函数），继续等待其结果
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+    
+    async def _call_single_flight(self, exposed, params, params_key, cache_key=None, generation=None):
+        """
+        合并参数相同的并发调用，只有第一个调用执行函数，其他调用等待同一个结果
+        
+        函数在独立的任务中执行，某个调用被取消不影响其他等待者；
+        所有等待者都取消后才取消函数的执行。
+        
+        Args:
+            exposed: ExposedFunction 实例
+            params: 调用参数列表
+            params_key: make_key() 生成的参数键
+            cache_key: 结果缓存键，函数设置了缓存时提供
+            generation: 调用开始前缓存的 generation，执行期间缓存失效过时不保存结果
+            
+        Returns:
+            CachedResult: 所有等待者共享的结果，每种编解码器只编码一次
+        """
+        key = (exposed.name, params_key)
+        flight = self._flights.get(key)
+        if flight is None:
+            token = CancellationToken()
+            task = asyncio.ensure_future(self._run_flight(exposed, params, cache_key, generation, token))
+            flight = self._flights[key] = _Flight(task, token)
+            
+            def on_flight_done(task):
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                # 所有等待者都已取消时，避免未读取的异常产生警告
+                if not task.cancelled():
+                    task.exception()
+            
+            task.add_done_callback(on_flight_done)
+        
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.token.cancel()
+                flight.task.cancel()
+    
+    async def _run_flight(self, exposed, params, cache_key, generation, token):
+        """执行合并调用的函数，使用独立的取消令牌"""
+        current_cancel_token.set(token)
+        result = await self._call_function(exposed, params)
+        if cache_key is not None:
+            return exposed.cache.put(cache_key, result, generation)
+        return CachedResult(result)
+    
+    def _run_in_executor(self, executor, func, *args):
+        """
+        在线程池中执行函数，并把当前上下文（contextvars）复制到线程中
+        
+        Args:
+            executor: 线程池
+            func: 要执行的函数
+            args: 函数参数
+            
+        Returns:
+            asyncio.Future: 函数执行结果
+        """
+        context = contextvars.copy_context()
+        loop = asyncio.get_event_loop()
+        return loop.run_in_executor(executor, functools.partial(context.run, func, *args))
+    
+    async def _iterate_stream(self, exposed, stream):
+        """
+        逐个获取生成器的数据块
+        
+        普通生成器每次调用 next() 都按函数的执行策略执行，阻塞的生成器不会卡住事件循环；
+        只有在上一个数据块发送完成后才会获取下一个数据块，不会提前把数据读入内存。
+        
+        Args:
+            exposed: ExposedFunction 实例
+            stream: 生成器或异步生成器
+        """
+        if inspect.isasyncgen(stream):
+            try:
+                async for item in stream:
+                    yield item
+            finally:
+                await stream.aclose()
+            return
+        
+        sentinel = object()
+        executor = None
+        if exposed.execution != EXECUTION_INLINE:
+            executor = exposed.executor or self._get_shared_executor()
+        try:
+            while True:
+                if executor is None:
+                    item = next(stream, sentinel)
+                else:
+                    item = await self._run_in_executor(executor, next, stream, sentinel)
+                if item is sentinel:
+                    break
+                yield item
+        finally:
+            try:
+                stream.close()
+            except ValueError:
+                # 生成器仍在线程池中执行（调用被中断），由其自行结束
+                pass
+    
+    async def _send_stream(self, websocket, codec, request_id, exposed, stream):
+        """
+        将生成器的数据块逐帧发送给前端
+        
+        每发送一个数据块都会等待连接的写缓冲区回落，前端读取较慢时生成器随之暂停。
+        
+        Args:
+            websocket: 客户端连接
+            codec: 连接使用的编解码器
+            request_id: 请求 ID
+            exposed: ExposedFunction 实例
+            stream: 生成器或异步生成器
+            
+        Returns:
+            bool: 生成器是否正常结束
         """
-        self.functions[name] = func
+        count = 0
+        chunks = self._iterate_stream(exposed, stream)
+        try:
+            async for item in chunks:
+                try:
+                    frame = codec.encode({'id': request_id, 'chunk': item})
+                except (TypeError, ValueError, OverflowError) as e:
+                    raise RpcError(ERROR_ENCODE, f'数据块无法序列化: {e}')
+                await self._send(websocket, frame)
+                # 背压：写缓冲区超过上限时等待数据发出后再生成下一个数据块
+                await websocket.drain()
+                count += 1
+            end = {'id': request_id, 'done': True, 'count': count}
+        except (websockets.exceptions.ConnectionClosed, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            error("流式调用失败: {}", e)
+            end = self._error_response(request_id, e)
+        finally:
+            await chunks.aclose()
+        
+        await self._send(websocket, codec.encode(end))
+        debug("流式响应结束: {}，共 {} 个数据块", request_id, count)
+        return 'error' not in end
+    
+    async def _send(self, websocket, frame):
+        """发送一帧并记录发送的字节数"""
+        await websocket.send(frame)
+        self.metrics.record_sent(frame)
     
     def uppercase(self, text):
         """将文本转换为大写"""
@@ -45,73 +522,721 @@ class WebSocketServer:
         """反转文本"""
         return text[::-1]
     
+    def _select_subprotocol(self, *args):
+        """
+        选择连接使用的子协议，按前端给出的顺序选择第一个服务器支持的编解码器，
+        前端未指定或都不支持时不使用子协议（回退到 JSON）
+        
+        websockets 新版调用时传入 (connection, subprotocols)，
+        旧版（legacy）调用时传入 (client_subprotocols, server_subprotocols)
+        """
+        offered = args[0] if isinstance(args[0], (list, tuple)) else args[1]
+        for subprotocol in offered:
+            if subprotocol in self._codecs_by_subprotocol:
+                return subprotocol
+        return None
+    
+    def get_codec(self, websocket):
+        """
+        获取连接协商的编解码器
+        
+        Args:
+            websocket: 客户端连接
+            
+        Returns:
+            Codec: 编解码器，未协商子协议时为 JSON 编解码器
+        """
+        subprotocol = getattr(websocket, 'subprotocol', None)
+        return self._codecs_by_subprotocol.get(subprotocol, self.codecs['json'])
+    
+    async def handle_message(self, websocket, message, codec=None, token=None, in_flight=None,
+                             data=_NOT_DECODED):
+        """
+        处理一条客户端消息并发送响应
+        
+        Args:
+            websocket: 客户端连接
+            message: 收到的原始消息
+            codec: 连接使用的编解码器，默认为 JSON
+            token: 本条消息的取消令牌，默认新建
+            in_flight: 连接上正在执行的调用表，key 为请求 ID，value 为 (任务, 取消令牌)，
+                       用于处理 cancel 消息
+            data: 已经解码的消息，默认在这里解码
+        """
+        codec = codec or self.codecs['json']
+        token = token or CancellationToken()
+        if in_flight is None:
+            in_flight = {}
+        # 记录发起调用的客户端，暴露函数可以通过 get_current_client() 获取
+        current_client.set(websocket)
+        # 线程池中的函数可以通过 get_cancel_token() 检查调用是否已被取消
+        current_cancel_token.set(token)
+        # 追踪各阶段的耗时，线程池中的函数同样可以获取追踪上下文
+        trace = None
+        if self.tracer is not None:
+            trace = Trace()
+            current_trace.set(trace)
+        # 每条消息只判断一次是否记录，收到的消息和发送的响应成对出现在日志中
+        log_message = is_enabled_for(LogLevel.DEBUG, sampled=True)
+        if log_message:
+            debug("收到消息: {}", payload(message))
+        
+        try:
+            try:
+                # 解码消息，读取循环中已经解码过的不再解码
+                if data is _NOT_DECODED:
+                    with trace_span('decode'):
+                        data = codec.decode(message)
+            except DecodeError as e:
+                code = ERROR_INVALID_JSON if codec.name == 'json' else ERROR_INVALID_MESSAGE
+                response = self._error_response(None, RpcError(code, str(e)))
+            else:
+                message_type = data.get('type') if isinstance(data, dict) else None
+                if trace is not None:
+                    self._annotate_trace(trace, data, message_type)
+                if message_type == 'cancel':
+                    self.handle_cancel(data, in_flight)
+                    response = None
+                elif message_type in ('subscribe', 'unsubscribe'):
+                    response = self.handle_subscription(websocket, data)
+                elif message_type in ('upload', 'upload_finish', 'upload_abort'):
+                    response = await self.handle_upload(websocket, data)
+                else:
+                    request_id = self._track_call(in_flight, data, token)
+                    try:
+                        if message_type == 'download':
+                            response = await self.handle_download(websocket, codec, data)
+                        elif isinstance(data, list) or (isinstance(data, dict) and 'batch' in data):
+                            response = await self.handle_batch(data)
+                        else:
+                            response = await self.handle_call(data, websocket, codec)
+                    finally:
+                        self._untrack_call(in_flight, request_id)
+            
+            if response is None:
+                # 流式响应已经逐帧发送，或者消息不需要响应
+                return
+            
+            if trace is not None and isinstance(response, dict) and 'error' in response:
+                trace.error = True
+            
+            with trace_span('encode'):
+                frame = self._encode_response(response, codec)
+            
+            # 调用完成后立即发送响应，不等待同一连接上的其他调用
+            with trace_span('send'):
+                await self._send(websocket, frame)
+            if log_message:
+                debug("发送响应: {}", payload(frame))
+        except websockets.exceptions.ConnectionClosed:
+            # 调用完成前连接已关闭，丢弃响应
+            debug("连接已关闭，丢弃响应: {}", websocket.remote_address)
+        except asyncio.CancelledError:
+            debug("调用已取消: {}", websocket.remote_address)
+            raise
+        finally:
+            if trace is not None:
+                trace.finish()
+                self.tracer.export(trace)
+    
+    def _annotate_trace(self, trace, data, message_type):
+        """从解码后的消息中记录请求 ID、函数名和前端传入的追踪上下文"""
+        if isinstance(data, dict):
+            trace.set_traceparent(data.get('traceparent'))
+            trace.request_id = data.get('id')
+            trace.function = data.get('function', message_type)
+            if 'batch' in data:
+                trace.function = 'batch'
+        elif isinstance(data, list):
+            trace.function = 'batch'
+    
+    def _track_call(self, in_flight, data, token):
+        """
+        登记正在执行的调用，使其可以被 cancel 消息取消
+        
+        Returns:
+            已登记的请求 ID，没有 id 或 id 无法作为键时返回 None
+        """
+        request_id = data.get('id') if isinstance(data, dict) else None
+        if request_id is None:
+            return None
+        try:
+            in_flight[request_id] = (asyncio.current_task(), token)
+        except TypeError:
+            return None
+        return request_id
+    
+    def _untrack_call(self, in_flight, request_id):
+        """移除已结束的调用，前端复用了同一个 id 时不影响新的调用"""
+        if request_id is None:
+            return
+        entry = in_flight.get(request_id)
+        if entry is not None and entry[0] is asyncio.current_task():
+            del in_flight[request_id]
+    
+    def handle_cancel(self, data, in_flight):
+        """
+        取消正在执行的调用
+        
+        在事件循环中等待的调用（协程、排队中的线程池调用、流式响应）立即中断；
+        已经在线程池中运行的函数会继续执行，通过取消令牌得知调用已被取消。
+        
+        Args:
+            data: {'type': 'cancel', 'id': 要取消的请求 ID}
+            in_flight: 连接上正在执行的调用表
+            
+        Returns:
+            bool: 是否找到并取消了调用，调用已经结束时返回 False
+        """
+        try:
+            entry = in_flight.pop(data.get('id'), None)
+        except TypeError:
+            entry = None
+        if entry is None:
+            return False
+        task, token = entry
+        token.cancel()
+        task.cancel()
+        return True
+    
+    async def handle_call(self, data, websocket=None, codec=None):
+        """
+        执行一个调用请求
+        
+        Args:
+            data: 解析后的请求，格式为 {'id': ..., 'function': ..., 'params': [...]}
+            websocket: 客户端连接，提供时生成器的数据块直接逐帧发送；
+                       不提供时（例如批量调用）收集所有数据块作为结果返回
+            codec: 连接使用的编解码器，与 websocket 一起提供
+            
+        Returns:
+            dict: 响应消息，成功时为 {'id': ..., 'result': ...}，
+                  失败时为 {'id': ..., 'error': {'code': ..., 'type': ..., 'message': ...}}；
+                  流式响应已经逐帧发送时返回 None
+        """
+        request_id = data.get('id') if isinstance(data, dict) else None
+        # 函数开始执行的时间，只为已注册的函数记录指标
+        started = None
+        
+        try:
+            with trace_span('dispatch'):
+                # 检查消息格式
+                if not isinstance(data, dict) or 'function' not in data:
+                    raise RpcError(ERROR_INVALID_REQUEST, '消息缺少 function 字段')
+                
+                function = data['function']
+                params = data.get('params', [])
+                if not isinstance(params, list):
+                    raise RpcError(ERROR_INVALID_REQUEST, 'params 字段必须是数组')
+                
+                # 检查函数是否存在
+                if function not in self.functions:
+                    raise RpcError(ERROR_FUNCTION_NOT_FOUND, f'不支持的功能 "{function}"')
+                
+                exposed = self.functions[function]
+                self.metrics.calls.inc(function)
+                self.metrics.in_flight.inc(function)
+                started = time.perf_counter()
+                
+                # 命中缓存时直接返回已编码的结果，不执行函数
+                params_key = cache_key = generation = None
+                if exposed.cache is not None or exposed.single_flight:
+                    params_key = make_key(params)
+                if exposed.cache is not None:
+                    cache_key = params_key
+                    # 在查找缓存之前记录，执行期间缓存失效过时不保存结果
+                    generation = exposed.cache.generation
+                    cached = exposed.cache.get(cache_key)
+                    if cached is not None:
+                        return {'id': request_id, 'result': cached}
+            
+            # 调用函数（阻塞函数在线程池中执行，不会卡住其他客户端）
+            with trace_span('execute', function=function):
+                if exposed.single_flight:
+                    result = await self._call_single_flight(exposed, params, params_key, cache_key, generation)
+                else:
+                    result = await self._call_function(exposed, params)
+                    if cache_key is not None:
+                        result = exposed.cache.put(cache_key, result, generation)
+            
+            if inspect.isgenerator(result) or inspect.isasyncgen(result):
+                if websocket is not None:
+                    # 逐帧编码和发送数据块，记录为一个 stream 阶段
+                    with trace_span('stream', function=function):
+                        completed = await self._send_stream(websocket, codec, request_id, exposed, result)
+                    if not completed:
+                        self.metrics.errors.inc(function)
+                    return None
+                # 无法逐帧发送时，收集所有数据块作为结果
+                result = [item async for item in self._iterate_stream(exposed, result)]
+        except (websockets.exceptions.ConnectionClosed, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            if started is None:
+                # 请求无效或函数不存在是前端的问题，不记录为服务器错误
+                warning("无效的调用请求: {}", e)
+            else:
+                error("调用失败: {}", e)
+            if started is not None:
+                self.metrics.errors.inc(function)
+            return self._error_response(request_id, e)
+        finally:
+            if started is not None:
+                self.metrics.in_flight.dec(function)
+                self.metrics.duration.observe(time.perf_counter() - started, function)
+        
+        return {'id': request_id, 'result': result}
+    
+    def handle_subscription(self, websocket, data):
+        """
+        处理订阅和取消订阅请求
+        
+        Args:
+            websocket: 客户端连接
+            data: {'id': ..., 'type': 'subscribe' 或 'unsubscribe', 'topics': [...]}
+            
+        Returns:
+            dict: 响应消息，result 为客户端当前订阅的主题列表
+        """
+        request_id = data.get('id')
+        topics = data.get('topics', [])
+        if isinstance(topics, str):
+            topics = [topics]
+        if not isinstance(topics, list) or not all(isinstance(t, str) for t in topics):
+            return self._error_response(
+                request_id, RpcError(ERROR_INVALID_REQUEST, 'topics 字段必须是字符串数组')
+            )
+        
+        for topic in topics:
+            if data['type'] == 'subscribe':
+                self.subscriptions.setdefault(topic, set()).add(websocket)
+            else:
+                self._unsubscribe(websocket, topic)
+        
+        subscribed = sorted(t for t, clients in self.subscriptions.items() if websocket in clients)
+        return {'id': request_id, 'result': subscribed}
+    
+    async def handle_upload(self, websocket, data):
+        """
+        处理上传控制消息：开始（或续传）、完成、放弃上传
+        
+        Args:
+            websocket: 客户端连接
+            data: upload、upload_finish 或 upload_abort 消息
+            
+        Returns:
+            dict: 响应消息
+        """
+        request_id = data.get('id')
+        executor = self._get_shared_executor()
+        try:
+            if data['type'] == 'upload':
+                result = await self._run_in_executor(
+                    executor, self.transfers.start_upload,
+                    websocket, data.get('name'), data.get('size'), data.get('upload_id')
+                )
+            elif data['type'] == 'upload_finish':
+                result = await self._run_in_executor(
+                    executor, self.transfers.finish_upload, websocket, data.get('transfer')
+                )
+            else:
+                await self._run_in_executor(
+                    executor, self.transfers.abort_upload, websocket, data.get('transfer')
+                )
+                result = True
+        except Exception as e:
+            warning("上传失败: {}", e)
+            return self._error_response(request_id, e)
+        return {'id': request_id, 'result': result}
+    
+    async def handle_transfer_frame(self, websocket, codec, message):
+        """
+        写入一个上传数据帧
+        
+        数据帧在读取消息的循环中按顺序处理，写入完成前不会读取下一条消息，
+        磁盘写入较慢时前端的发送随之暂停。
+        
+        Args:
+            websocket: 客户端连接
+            codec: 连接使用的编解码器
+            message: 传输帧
+        """
+        transfer_id = None
+        try:
+            transfer_id = unpack_frame(message)[0]
+            await self._run_in_executor(
+                self._get_shared_executor(), self.transfers.write_frame, websocket, message
+            )
+        except Exception as e:
+            warning("写入上传数据失败: {}", e)
+            response = self._error_response(None, e)
+            del response['id']
+            response['transfer'] = transfer_id
+            await self._send(websocket, codec.encode(response))
+    
+    async def handle_download(self, websocket, codec, data):
+        """
+        使用内存映射读取文件，按固定大小的传输帧发送给前端
+        
+        每块数据在线程池中读取，每发送一帧都会等待连接的写缓冲区回落，不会把整个文件读入内存。
+        
+        Args:
+            websocket: 客户端连接
+            codec: 连接使用的编解码器
+            data: {'id': ..., 'type': 'download', 'path': ..., 'offset': 续传位置, 'chunk_size': 分块大小}
+            
+        Returns:
+            dict: 结束消息或错误响应
+        """
+        request_id = data.get('id')
+        download = None
+        try:
+            offset = data.get('offset', 0)
+            chunk_size = data.get('chunk_size', DEFAULT_CHUNK_SIZE)
+            if not isinstance(offset, int) or offset < 0:
+                raise TransferError('offset 字段必须是非负整数')
+            if not isinstance(chunk_size, int) or not 0 < chunk_size <= MAX_CHUNK_SIZE:
+                raise TransferError(f'chunk_size 字段必须是 1 到 {MAX_CHUNK_SIZE} 之间的整数')
+            
+            executor = self._get_shared_executor()
+            path = await self._run_in_executor(executor, self.transfers.resolve_download, data.get('path'))
+            download = await self._run_in_executor(executor, self.transfers.open_download, path)
+            if offset > download.size:
+                raise TransferError(f'offset 超过文件大小 {download.size}')
+            
+            await self._send(websocket, codec.encode({
+                'id': request_id,
+                'result': {'transfer': download.transfer_id, 'size': download.size, 'offset': offset}
+            }))
+            count = 0
+            while offset < download.size:
+                # 读取映射的文件可能触发磁盘读取，与上传写入文件一样放到线程池中执行
+                frame = await self._run_in_executor(executor, download.frame, offset, chunk_size)
+                await self._send(websocket, frame)
+                # 背压：写缓冲区超过上限时等待数据发出后再读取下一块
+                await websocket.drain()
+                offset += chunk_size
+                count += 1
+            return {'id': request_id, 'done': True, 'count': count, 'size': download.size}
+        except (websockets.exceptions.ConnectionClosed, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            warning("下载失败: {}", e)
+            return self._error_response(request_id, e)
+        finally:
+            if download is not None:
+                download.close()
+    
+    def _unsubscribe(self, websocket, topic):
+        """取消客户端对主题的订阅，没有订阅者的主题会被删除"""
+        clients = self.subscriptions.get(topic)
+        if clients is not None:
+            clients.discard(websocket)
+            if not clients:
+                del self.subscriptions[topic]
+    
+    def broadcast(self, topic, payload):
+        """
+        向订阅了主题的所有客户端推送消息，可以在任意线程中调用
+        
+        消息对每种编解码器只编码一次，然后发送给使用该编解码器的所有订阅者。
+        多进程模式下消息经监督进程转发给所有工作进程，payload 需要可以 pickle。
+        
+        Args:
+            topic: 主题
+            payload: 推送的数据
+            
+        Returns:
+            在事件循环线程中调用时返回 asyncio.Task，否则返回 concurrent.futures.Future，
+            结果为收到消息的客户端数量。多进程模式下订阅者分布在各个工作进程中，结果为 None
+            
+        Raises:
+            RuntimeError: WebSocket 服务器未运行时
+        """
+        if self.supervisor is not None:
+            self.supervisor.send(COMMAND_BROADCAST, topic, payload)
+            future = Future()
+            future.set_result(None)
+            return future
+        if self._channel is not None:
+            return self._run_in_loop(self._publish(COMMAND_BROADCAST, topic, payload))
+        return self._run_in_loop(self._broadcast(topic, payload))
+    
+    def push(self, client, topic, payload):
+        """
+        向单个客户端推送消息，客户端不需要订阅该主题，可以在任意线程中调用
+        
+        Args:
+            client: 客户端连接，可以在暴露函数中通过 get_current_client() 获取
+            topic: 主题，前端据此区分推送的内容
+            payload: 推送的数据
+            
+        Returns:
+            与 broadcast() 相同
+            
+        Raises:
+            RuntimeError: WebSocket 服务器未运行时，或多进程模式下在主进程中调用时
+        """
+        if self.supervisor is not None:
+            # 连接只存在于工作进程中
+            raise RuntimeError('多进程模式下只能在工作进程中（例如暴露函数内）调用 push()')
+        return self._run_in_loop(self._broadcast(topic, payload, (client,)))
+    
+    def _run_in_loop(self, coro):
+        """在事件循环中执行协程，兼容在事件循环线程和其他线程中调用"""
+        if self.loop is None or self.loop.is_closed():
+            coro.close()
+            raise RuntimeError('WebSocket 服务器未运行')
+        if threading.get_ident() == self._loop_thread_id:
+            return asyncio.ensure_future(coro)
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+    
+    async def _publish(self, command, *args):
+        """在工作进程中把命令发送给监督进程，由它转发给所有工作进程（包括当前进程）"""
+        await self.loop.sock_sendall(self._channel, encode_message(command, *args))
+    
+    async def _receive_messages(self):
+        """在工作进程中接收监督进程转发的命令：推送广播消息给本进程的订阅者，或删除本进程的缓存项"""
+        reader = MessageReader()
+        while True:
+            try:
+                data = await self.loop.sock_recv(self._channel, 65536)
+            except OSError:
+                data = b''
+            if not data:
+                warning("WebSocket 监督进程已退出，关闭工作进程 {}", self.worker_index)
+                self.server.close()
+                return
+            for frame in reader.feed(data):
+                try:
+                    command, args = decode_message(frame)
+                    if command == COMMAND_BROADCAST:
+                        await self._broadcast(*args)
+                    elif command == COMMAND_INVALIDATE_CACHE:
+                        self._invalidate_cache(*args)
+                except Exception as e:
+                    error("处理转发的消息失败: {}", e)
+    
+    async def _broadcast(self, topic, payload, clients=None):
+        """
+        将推送消息发送给指定的客户端
+        
+        Args:
+            topic: 主题
+            payload: 推送的数据
+            clients: 客户端连接集合，默认为订阅了主题的所有客户端
+            
+        Returns:
+            int: 收到消息的客户端数量
+        """
+        if clients is None:
+            clients = self.subscriptions.get(topic, ())
+        
+        # 按编解码器分组，每种编解码器只编码一次
+        groups = {}
+        for client in list(clients):
+            if client in self.connected_clients:
+                groups.setdefault(self.get_codec(client), []).append(client)
+        
+        message = {'topic': topic, 'data': payload}
+        count = 0
+        for codec, group in groups.items():
+            frame = codec.encode(message)
+            if hasattr(websockets, 'broadcast'):
+                # 同步写入所有连接的发送缓冲区，不逐个等待发送完成
+                websockets.broadcast(group, frame)
+            else:
+                await asyncio.gather(
+                    *(client.send(frame) for client in group), return_exceptions=True
+                )
+            self.metrics.record_sent(frame, len(group))
+            count += len(group)
+        return count
+    
+    async def handle_batch(self, data):
+        """
+        执行批量调用请求，一个消息中包含多个调用，所有结果合并到一个响应中返回
+        
+        Args:
+            data: 解析后的请求，可以是调用对象数组（并行执行，最多同时执行 max_concurrent_calls 个），
+                  也可以是 {'id': ..., 'batch': [...], 'parallel': True/False}
+            
+        Returns:
+            请求为数组时返回响应数组，否则返回 {'id': ..., 'batch': [...]}，
+            响应数组与调用数组一一对应
+        """
+        if isinstance(data, list):
+            calls, parallel = data, True
+        else:
+            calls, parallel = data['batch'], data.get('parallel', True)
+            if not isinstance(calls, list):
+                return self._error_response(
+                    data.get('id'), RpcError(ERROR_INVALID_REQUEST, 'batch 字段必须是数组')
+                )
+        
+        if parallel:
+            # 并行执行，所有调用完成后一起返回。同时执行的调用数同样不超过 max_concurrent_calls，
+            # 一个批量请求不能绕过单个连接的并发限制
+            limit = asyncio.Semaphore(self.max_concurrent_calls)
+            
+            async def bounded_call(call):
+                async with limit:
+                    return await self.handle_call(call)
+            
+            results = list(await asyncio.gather(*(bounded_call(call) for call in calls)))
+        else:
+            # 按顺序执行，适用于后一个调用依赖前一个调用结果的场景
+            results = []
+            for call in calls:
+                results.append(await self.handle_call(call))
+        
+        if isinstance(data, list):
+            return results
+        return {'id': data.get('id'), 'batch': results}
+    
+    def _encode_response(self, response, codec):
+        """
+        编码响应，无法序列化的调用结果替换为 encode_error 错误响应
+        
+        Args:
+            response: 单个响应、响应数组或批量响应
+            codec: 连接使用的编解码器
+            
+        Returns:
+            str 或 bytes: 编码后的响应
+        """
+        if isinstance(response, list):
+            items = response
+        elif 'batch' in response:
+            items = response['batch']
+        else:
+            items = None
+        # 批量响应中有缓存的结果时无法整体编码，直接逐项编码后拼接，不先尝试整体编码
+        if items is not None and any(
+                isinstance(item, dict) and isinstance(item.get('result'), CachedResult) for item in items):
+            return self._encode_batch_response(response, items, codec)
+        
+        try:
+            if isinstance(response, dict) and isinstance(response.get('result'), CachedResult):
+                # 缓存的结果已经编码，直接拼接
+                return codec.encode_object([
+                    ('id', codec.encode(response['id'])),
+                    ('result', response['result'].encode(codec))
+                ])
+            return codec.encode(response)
+        except (TypeError, ValueError, OverflowError) as e:
+            if items is not None:
+                return self._encode_batch_response(response, items, codec)
+            # 返回值无法序列化
+            return codec.encode(self._error_response(
+                response.get('id'), RpcError(ERROR_ENCODE, f'返回值无法序列化: {e}')
+            ))
+    
+    def _encode_batch_response(self, response, items, codec):
+        """逐项编码批量响应后拼接，某一项无法编码时只替换这一项"""
+        encoded = codec.encode_array([self._encode_response(item, codec) for item in items])
+        if isinstance(response, list):
+            return encoded
+        return codec.encode_object([
+            ('id', codec.encode(response['id'])),
+            ('batch', encoded)
+        ])
+    
+    def _error_response(self, request_id, exc):
+        """
+        构造错误响应
+        
+        Args:
+            request_id: 请求 ID
+            exc: 异常对象，RpcError 使用其错误码，其他异常视为函数执行错误
+            
+        Returns:
+            dict: 错误响应消息
+        """
+        return {
+            'id': request_id,
+            'error': {
+                'code': getattr(exc, 'code', ERROR_FUNCTION_ERROR),
+                'type': exc.__class__.__name__,
+                'message': str(exc)
+            }
+        }
+    
     async def handle_connection(self, websocket, path=None):
         """处理客户端连接"""
         client_address = websocket.remote_address
-        print(f"\n新连接: {client_address}")
+        info("新连接: {}", client_address)
         
         # 添加到已连接客户端集合
         self.connected_clients.add(websocket)
+        self.metrics.connections.inc()
+        self.metrics.connections_total.inc()
+        # 握手时协商的编解码器
+        codec = self.get_codec(websocket)
+        
+        # 当前连接上正在执行的消息任务，value 为任务的取消令牌
+        pending_tasks = {}
+        # 带 id 的调用，用于按 id 取消
+        in_flight = {}
+        # 限制单个连接同时执行的调用数，超过时暂停执行新消息（cancel 消息除外）
+        slots = asyncio.Semaphore(self.max_concurrent_calls)
+        
+        def on_task_done(task):
+            pending_tasks.pop(task, None)
+            slots.release()
         
         try:
-            # 持续接收客户端消息
+            # 持续接收客户端消息，每条消息作为独立任务执行，
+            # 同一客户端的多个调用可以并发处理
             async for message in websocket:
-                print(f"收到消息: {message}")
-                
-                try:
-                    # 解析 JSON 消息
-                    data = json.loads(message)
-                    
-                    # 检查消息格式
-                    if 'function' not in data:
-                        raise ValueError('消息缺少 function 字段')
-                    
-                    function = data['function']
-                    params = data.get('params', [])
-                    
-                    # 检查函数是否存在
-                    if function not in self.functions:
-                        raise ValueError(f'不支持的功能 "{function}"')
-                    
-                    # 调用函数
-                    func = self.functions[function]
-                    result = func(*params)
-                    
-                    # 构造响应消息
-                    response = {
-                        'result': result
-                    }
-                    
-                    # 发送响应给客户端
-                    await websocket.send(json.dumps(response))
-                    print(f"发送响应: {response}")
-                    
-                except json.JSONDecodeError:
-                    # 处理 JSON 解析错误
-                    error_response = {
-                        'result': '错误：无效的 JSON 格式'
-                    }
-                    await websocket.send(json.dumps(error_response))
-                    print("发送错误响应: 无效的 JSON 格式")
-                    
-                except Exception as e:
-                    # 处理其他异常
-                    error_response = {
-                        'result': f'错误：{str(e)}'
-                    }
-                    await websocket.send(json.dumps(error_response))
-                    print(f"发送错误响应: {str(e)}")
+                self.metrics.record_received(message)
+                if is_transfer_frame(message):
+                    # 上传数据帧按顺序写入，不作为独立任务执行
+                    await self.handle_transfer_frame(websocket, codec, message)
+                    continue
+                data = _NOT_DECODED
+                if slots.locked():
+                    # 调用数已达上限时先解码，cancel 消息不占用名额直接处理，
+                    # 否则要等到它要取消的调用结束后才能执行
+                    try:
+                        data = codec.decode(message)
+                    except DecodeError:
+                        pass
+                    if isinstance(data, dict) and data.get('type') == 'cancel':
+                        debug("收到取消消息: {}", payload(message))
+                        # 先让已创建的任务运行到登记请求 ID，刚发送的调用也能被取消
+                        await asyncio.sleep(0)
+                        self.handle_cancel(data, in_flight)
+                        continue
+                await slots.acquire()
+                token = CancellationToken()
+                task = asyncio.ensure_future(
+                    self.handle_message(websocket, message, codec, token, in_flight, data)
+                )
+                pending_tasks[task] = token
+                task.add_done_callback(on_task_done)
                     
         except websockets.exceptions.ConnectionClosedOK:
-            print(f"连接正常关闭: {client_address}")
+            debug("连接正常关闭: {}", client_address)
         except websockets.exceptions.ConnectionClosedError:
-            print(f"连接异常关闭: {client_address}")
+            warning("连接异常关闭: {}", client_address)
         except Exception as e:
-            print(f"连接处理错误: {e}")
+            error("连接处理错误: {}", e)
         finally:
-            # 从已连接客户端集合中移除
+            # 连接已关闭，响应无法送达，取消所有未完成的调用
+            for task, token in list(pending_tasks.items()):
+                token.cancel()
+                task.cancel()
+            
+            # 关闭未完成的上传，临时文件保留用于续传
+            self.transfers.close_client(websocket)
+            
+            # 从已连接客户端集合和所有订阅中移除
             self.connected_clients.remove(websocket)
-            print(f"连接已关闭: {client_address}")
+            self.metrics.connections.dec()
+            for topic in list(self.subscriptions):
+                self._unsubscribe(websocket, topic)
+            info("连接已关闭: {}", client_address)
     
     async def start_server(self):
         """启动 WebSocket 服务器"""
@@ -119,22 +1244,109 @@ class WebSocketServer:
             self.server = await websockets.serve(
                 self.handle_connection,  # 处理函数
                 "localhost",              # 主机地址
-                self.port                 # 端口号
+                self.port,                # 端口号
+                # 可协商的编解码器子协议，前端未指定时回退到 JSON
+                subprotocols=[codec.subprotocol for codec in self.codecs.values()],
+                select_subprotocol=self._select_subprotocol,
+                # 压缩配置，小消息不压缩
+                **serve_options(self.compression),
+                # 工作进程共享同一个端口
+                **({'reuse_port': True} if self.worker_index is not None else {})
             )
             self.is_running = True
+            receiver = None
+            if self.worker_index is not None:
+                # 监督进程停止工作进程时发送 SIGTERM，关闭服务器后正常结束事件循环
+                asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self.server.close)
+                receiver = asyncio.ensure_future(self._receive_messages())
+            self._notify_ready()
             
             # 保持服务器运行
-            await self.server.wait_closed()
+            try:
+                await self.server.wait_closed()
+            finally:
+                if receiver is not None:
+                    receiver.cancel()
         except Exception as e:
-            print(f"WebSocket 服务器启动失败: {e}")
+            error("WebSocket 服务器启动失败: {}", e)
             raise
     
+    def _notify_ready(self):
+        """通知等待启动的线程端口已开始监听，工作进程同时通知主进程"""
+        self.ready.set()
+        if self._ready_fd is not None:
+            os.write(self._ready_fd, b'\x01')
+    
+    def wait_ready(self, timeout=None):
+        """
+        等待服务器开始监听，可以在其他线程中调用
+        
+        Args:
+            timeout: 最长等待时间（秒），默认一直等待
+            
+        Returns:
+            bool: 服务器是否已开始监听
+        """
+        return self.ready.wait(timeout)
+    
+    def fork_workers(self):
+        """
+        多进程模式下 fork 监督进程，由它启动并监督工作进程
+        
+        fork 时其他线程持有的锁会被复制到子进程中，可能使子进程死锁，应在主线程中、
+        启动其他线程之前调用。start() 时尚未调用则在当前线程中调用。
+        单进程模式或平台不支持时不做任何事。
+        """
+        if self.workers <= 1 or self.supervisor is not None:
+            return
+        if not workers_supported():
+            warning("当前平台不支持多进程模式（需要 fork 和 SO_REUSEPORT），使用单进程运行")
+            self.workers = 1
+            return
+        self.supervisor = WorkerSupervisor(self, self.workers)
+        self.supervisor.start()
+        self.is_running = True
+    
     def start(self):
-        """启动 WebSocket 服务器"""
+        """启动 WebSocket 服务器，多进程模式下等待工作进程就绪，直到服务器停止"""
+        self.fork_workers()
+        if self.supervisor is not None:
+            try:
+                self.supervisor.wait()
+            except KeyboardInterrupt:
+                self.stop()
+            return
+        self._serve()
+    
+    def run_worker(self, index, ready_fd=None, channel=None):
+        """
+        在工作进程中运行服务器，由 WorkerSupervisor 在 fork 后调用，服务器关闭后返回
+        
+        Args:
+            index: 工作进程序号
+            ready_fd: 开始监听后写入一个字节通知主进程的管道
+            channel: 与监督进程相连的 socket，用于转发广播和缓存失效消息
+        """
+        self.supervisor = None
+        self.worker_index = index
+        self._ready_fd = ready_fd
+        if channel is not None:
+            channel.setblocking(False)
+        self._channel = channel
+        self._serve()
+        self.shutdown_executors()
+        if self.tracer is not None:
+            self.tracer.close()
+    
+    def _serve(self):
+        """在当前线程中创建事件循环并运行服务器"""
         try:
-            # 创建事件循环
-            self.loop = asyncio.new_event_loop()
+            # 创建事件循环，uvloop 不可用时回退到 asyncio
+            loop_name = resolve_loop(self.loop_option)
+            self.loop = new_event_loop(loop_name)
+            debug("WebSocket 服务器事件循环: {}", loop_name)
             asyncio.set_event_loop(self.loop)
+            self._loop_thread_id = threading.get_ident()
             
             # 运行服务器
             self.loop.run_until_complete(self.start_server())
@@ -143,15 +1355,28 @@ class WebSocketServer:
     
     def stop(self):
         """停止 WebSocket 服务器"""
+        if self.supervisor is not None:
+            info("停止 WebSocket 工作进程...")
+            self.supervisor.stop()
+            self.supervisor = None
+            self.ready.clear()
+            self.is_running = False
+            info("WebSocket 服务器已停止")
+            return
+        
+        if self.is_running and self.loop.is_running() and threading.get_ident() != self._loop_thread_id:
+            self._stop_from_thread()
+            return
+        
         if self.is_running:
-            print(f"\n停止 WebSocket 服务器...")
+            info("停止 WebSocket 服务器...")
             
             # 关闭所有连接
             for client in self.connected_clients.copy():
                 try:
                     self.loop.run_until_complete(client.close())
                 except Exception as e:
-                    print(f"关闭客户端连接时出错: {e}")
+                    warning("关闭客户端连接时出错: {}", e)
             
             # 关闭服务器
             if self.server:
@@ -161,5 +1386,41 @@ class WebSocketServer:
             # 关闭事件循环
             self.loop.close()
             
+            # 关闭线程池
+            self.shutdown_executors()
+            
+            # 写完剩余的追踪
+            if self.tracer is not None:
+                self.tracer.close()
+            
+            self.ready.clear()
             self.is_running = False
-            print("WebSocket 服务器已停止")
\ No newline at end of file
+            info("WebSocket 服务器已停止")
+    
+    def _stop_from_thread(self):
+        """在其他线程中停止：由事件循环线程关闭服务器和所有连接，start_server() 随之返回"""
+        info("停止 WebSocket 服务器...")
+        
+        async def close():
+            self.server.close()
+            await self.server.wait_closed()
+        
+        try:
+            asyncio.run_coroutine_threadsafe(close(), self.loop).result(5)
+        except Exception as e:
+            warning("关闭 WebSocket 服务器时出错: {}", e)
+        
+        self.shutdown_executors()
+        if self.tracer is not None:
+            self.tracer.close()
+        self.ready.clear()
+        self.is_running = False
+        info("WebSocket 服务器已停止")
+    
+    def shutdown_executors(self):
+        """关闭共享线程池和所有函数的独占线程池"""
+        for exposed in self.functions.values():
+            exposed.shutdown()
+        if self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
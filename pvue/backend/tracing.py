@@ -0,0 +1,244 @@
+"""调用追踪模块
+
+按请求记录消息处理各阶段的耗时，定位端到端延迟花在哪里：
+
+    decode    解码消息
+    dispatch  检查请求、查找函数、检查结果缓存
+    execute   执行函数（包括在线程池中排队的时间）
+    encode    编码响应
+    send      发送响应
+
+每条消息生成一个 request span，各阶段作为它的子 span，导出到 JSON Lines 文件，每行一个 span。
+
+前端可以在消息中携带 W3C Trace Context 格式的 traceparent 字段
+（00-<trace_id>-<parent_id>-<flags>），服务器沿用其中的 trace_id，前后端的追踪可以关联。
+追踪上下文保存在 contextvars 中，线程池中执行的函数同样可以通过 trace_span()
+记录自定义阶段，或通过 get_current_trace().traceparent 向下游服务传递追踪上下文。
+"""
+
+import atexit
+import contextlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+
+from .context import current_trace
+
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+# 未开启追踪时 trace_span() 返回的空上下文管理器，可以重复使用
+_NO_SPAN = contextlib.nullcontext()
+
+
+def _new_id(size):
+    """生成 size 字节的十六进制 ID"""
+    return os.urandom(size).hex()
+
+
+class Trace:
+    """一条消息的追踪，记录各阶段的开始和结束时间
+
+    子 span 只在结束时追加到列表中，可以在事件循环和线程池中同时记录。
+    """
+
+    __slots__ = ('trace_id', 'parent_id', 'span_id', 'request_id', 'function', 'error',
+                 'start_time', '_start', '_end', 'spans')
+
+    def __init__(self):
+        """开始追踪，记录收到消息的时间"""
+        self.trace_id = None
+        # 前端 traceparent 中的 span ID
+        self.parent_id = None
+        self.span_id = _new_id(8)
+        self.request_id = None
+        self.function = None
+        self.error = False
+        # 墙上时间用于导出，性能计数器用于计算耗时
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self._end = None
+        # (名称, 开始, 结束, 属性)
+        self.spans = []
+
+    def set_traceparent(self, value):
+        """
+        沿用前端传入的追踪上下文，格式无效时忽略
+
+        Args:
+            value: W3C traceparent 字符串
+        """
+        match = _TRACEPARENT.match(value) if isinstance(value, str) else None
+        if match:
+            self.trace_id, self.parent_id = match.group(1), match.group(2)
+
+    @property
+    def traceparent(self):
+        """当前请求的 W3C traceparent，可以传递给下游服务"""
+        if self.trace_id is None:
+            self.trace_id = _new_id(16)
+        return f'00-{self.trace_id}-{self.span_id}-01'
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        """
+        记录一个阶段的耗时
+
+        Args:
+            name: 阶段名称
+            attributes: 导出时附加到 span 上的属性
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, start, time.perf_counter(), attributes))
+
+    def finish(self):
+        """结束追踪"""
+        self._end = time.perf_counter()
+
+    def records(self):
+        """
+        生成导出的 span 记录
+
+        Returns:
+            list: dict 列表，第一项为 request span，其余为各阶段的子 span
+        """
+        trace_id = self.traceparent.split('-')[1]
+        end = self._end if self._end is not None else time.perf_counter()
+        records = [{
+            'trace_id': trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': 'request',
+            'request_id': self.request_id,
+            'function': self.function,
+            'start': self.start_time,
+            'duration_ms': (end - self._start) * 1000,
+            'error': self.error
+        }]
+        for name, start, stop, attributes in list(self.spans):
+            record = {
+                'trace_id': trace_id,
+                'span_id': _new_id(8),
+                'parent_id': self.span_id,
+                'name': name,
+                'request_id': self.request_id,
+                'start': self.start_time + (start - self._start),
+                'duration_ms': (stop - start) * 1000
+            }
+            record.update(attributes)
+            records.append(record)
+        return records
+
+
+def get_current_trace():
+    """
+    获取当前请求的追踪
+
+    Returns:
+        Trace: 追踪，未开启追踪或不在调用上下文中时返回 None
+    """
+    return current_trace.get()
+
+
+def trace_span(name, **attributes):
+    """
+    在当前请求的追踪中记录一个阶段，未开启追踪时没有额外开销
+
+    用法：
+        with trace_span('query', table='users'):
+            ...
+
+    Args:
+        name: 阶段名称
+        attributes: 导出时附加到 span 上的属性
+
+    Returns:
+        上下文管理器
+    """
+    trace = current_trace.get()
+    if trace is None:
+        return _NO_SPAN
+    return trace.span(name, **attributes)
+
+
+class JsonLinesExporter:
+    """在后台线程中把追踪写入 JSON Lines 文件
+
+    调用方只把结束的追踪放入队列，序列化和写入都在后台线程中完成，不阻塞事件循环。
+    """
+
+    def __init__(self, path):
+        """
+        打开导出文件（追加写入）并启动后台线程
+
+        Args:
+            path: JSON Lines 文件路径
+        """
+        self.path = os.path.abspath(path)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._queue = queue.SimpleQueue()
+        self._paused = False
+        self._start()
+        # 退出时写完队列中剩余的追踪
+        atexit.register(self.close)
+        # fork 时后台线程可能正持有文件或队列的锁，先停下后台线程，
+        # fork 后在父进程中继续，在子进程中使用新的队列重新启动
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(before=self._pause, after_in_parent=self._resume,
+                                after_in_child=self._restart_in_child)
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name='pvue-tracing', daemon=True)
+        self._thread.start()
+
+    def _pause(self):
+        self._paused = self._thread.is_alive()
+        if self._paused:
+            self._queue.put(None)
+            self._thread.join()
+
+    def _resume(self):
+        if self._paused:
+            self._paused = False
+            self._start()
+
+    def _restart_in_child(self):
+        if self._paused:
+            self._queue = queue.SimpleQueue()
+            self._resume()
+
+    def export(self, trace):
+        """放入一条结束的追踪"""
+        self._queue.put(trace)
+
+    def _run(self):
+        while True:
+            trace = self._queue.get()
+            if trace is None:
+                break
+            try:
+                for record in trace.records():
+                    self._file.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+                # 队列中没有更多追踪时才刷新，连续的追踪合并写入
+                if self._queue.empty():
+                    self._file.flush()
+            except Exception:
+                # 导出失败不能影响后台线程继续工作
+                pass
+        self._file.flush()
+
+    def close(self):
+        """写完队列中剩余的追踪后停止后台线程并关闭文件"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if not self._file.closed:
+            self._file.close()
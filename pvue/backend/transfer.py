@@ -0,0 +1,356 @@
+"""文件传输模块
+
+在 RPC 连接上分块传输文件，文件内容使用二进制帧，不经过编解码器：
+
+    帧头（16 字节）：b'\\x00PVF' + 传输 ID（u32，大端）+ 偏移量（u64，大端），之后为数据
+
+以 0x00 开头的完整 MessagePack/CBOR 消息只有一个字节，因此传输帧不会与普通消息混淆。
+
+上传：前端发送 upload 消息获得传输 ID，然后按顺序发送数据帧，最后发送 upload_finish。
+数据直接写入上传目录中的临时文件，不在内存中缓存整个文件；中断后使用同一个 upload_id
+重新发送 upload 消息，从响应中的 offset 继续上传。
+
+下载：前端发送 download 消息，服务器使用内存映射读取文件，按固定大小的数据帧发送，
+可以通过 offset 从中断的位置继续下载。只允许下载 download_roots 中的文件。
+"""
+
+import itertools
+import mmap
+import os
+import re
+import struct
+import threading
+import uuid
+
+# 传输帧魔数
+FRAME_MAGIC = b'\x00PVF'
+# 传输帧头：魔数、传输 ID、偏移量
+FRAME_HEADER = struct.Struct('>4sIQ')
+# 默认下载分块大小
+DEFAULT_CHUNK_SIZE = 256 * 1024
+# 下载分块大小上限，websockets 默认的单帧大小限制为 1 MiB
+MAX_CHUNK_SIZE = 1024 * 1024 - FRAME_HEADER.size
+
+ERROR_TRANSFER = 'transfer_error'
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class TransferError(Exception):
+    """文件传输错误"""
+
+    code = ERROR_TRANSFER
+
+
+def _move_exclusive(source, path):
+    """
+    将文件移动到 path，检查和移动是一个原子操作，不会覆盖同时创建的文件
+
+    Raises:
+        FileExistsError: path 已存在时
+    """
+    try:
+        os.link(source, path)
+    except FileExistsError:
+        raise
+    except (AttributeError, OSError):
+        # 文件系统不支持硬链接：先以 O_EXCL 创建空文件占用文件名，再替换为上传的文件
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        os.replace(source, path)
+        return
+    os.remove(source)
+
+
+def is_transfer_frame(message):
+    """判断消息是否为传输帧"""
+    return isinstance(message, (bytes, bytearray, memoryview)) and bytes(message[:4]) == FRAME_MAGIC
+
+
+def pack_frame(transfer_id, offset, data):
+    """
+    构造传输帧
+
+    Args:
+        transfer_id: 传输 ID
+        offset: 数据在文件中的偏移量
+        data: 数据
+
+    Returns:
+        bytes: 传输帧
+    """
+    return FRAME_HEADER.pack(FRAME_MAGIC, transfer_id, offset) + data
+
+
+def unpack_frame(message):
+    """
+    解析传输帧
+
+    Args:
+        message: 传输帧
+
+    Returns:
+        tuple: (传输 ID, 偏移量, 数据)
+
+    Raises:
+        TransferError: 帧长度不足时
+    """
+    if len(message) < FRAME_HEADER.size:
+        raise TransferError('传输帧不完整')
+    _, transfer_id, offset = FRAME_HEADER.unpack_from(message)
+    return transfer_id, offset, memoryview(message)[FRAME_HEADER.size:]
+
+
+class Upload:
+    """一次上传，数据写入上传目录中的临时文件"""
+
+    def __init__(self, transfer_id, upload_id, name, size, part_path, client):
+        self.transfer_id = transfer_id
+        self.upload_id = upload_id
+        self.name = name
+        self.size = size
+        self.part_path = part_path
+        self.client = client
+        # 追加模式打开，已有的临时文件从末尾继续写入
+        self.file = open(part_path, 'ab')
+        self.received = self.file.tell()
+        if self.received > size:
+            self.file.close()
+            raise TransferError(f'临时文件大小 {self.received} 超过文件大小 {size}')
+
+    def write(self, offset, data):
+        """
+        写入一块数据，数据必须按顺序到达
+
+        Raises:
+            TransferError: 偏移量与已接收的数据量不一致或超过文件大小时
+        """
+        if offset != self.received:
+            raise TransferError(f'偏移量 {offset} 与已接收的数据量 {self.received} 不一致')
+        if offset + len(data) > self.size:
+            raise TransferError(f'数据超过文件大小 {self.size}')
+        self.file.write(data)
+        self.received += len(data)
+
+    def close(self):
+        """关闭临时文件，保留已接收的数据用于续传"""
+        if not self.file.closed:
+            self.file.close()
+
+
+class TransferManager:
+    """文件传输管理器，保存所有连接上正在进行的上传
+
+    文件读写都是阻塞操作，由 WebSocket 服务器放到线程池中执行。
+    """
+
+    def __init__(self, upload_dir=None, download_roots=None):
+        """
+        初始化文件传输管理器
+
+        Args:
+            upload_dir: 上传目录，默认不允许上传
+            download_roots: 允许下载的目录列表，默认不允许下载
+        """
+        self.upload_dir = os.path.abspath(upload_dir) if upload_dir else None
+        self.download_roots = [os.path.realpath(root) for root in (download_roots or [])]
+        # 正在进行的上传，key 为传输 ID
+        self.uploads = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _next_id(self):
+        with self._lock:
+            return next(self._ids) & 0xFFFFFFFF
+
+    def start_upload(self, client, name, size, upload_id=None):
+        """
+        开始或继续上传
+
+        Args:
+            client: 客户端连接
+            name: 文件名，只保留最后一级名称
+            size: 文件大小（字节）
+            upload_id: 续传时使用上次返回的 upload_id
+
+        Returns:
+            dict: {'transfer': 传输 ID, 'upload_id': ..., 'offset': 从该偏移量开始发送数据}
+
+        Raises:
+            TransferError: 不允许上传或参数无效时
+        """
+        if self.upload_dir is None:
+            raise TransferError('服务器未启用文件上传')
+        if not isinstance(name, str) or not os.path.basename(name):
+            raise TransferError('name 字段必须是文件名')
+        if not isinstance(size, int) or size < 0:
+            raise TransferError('size 字段必须是非负整数')
+        if upload_id is None:
+            upload_id = uuid.uuid4().hex
+        elif not isinstance(upload_id, str) or not _UPLOAD_ID.match(upload_id):
+            raise TransferError('无效的 upload_id')
+
+        os.makedirs(self.upload_dir, exist_ok=True)
+        part_path = os.path.join(self.upload_dir, f'.{upload_id}.part')
+        with self._lock:
+            for upload in self.uploads.values():
+                if upload.upload_id == upload_id:
+                    raise TransferError('该文件正在上传')
+            transfer_id = next(self._ids) & 0xFFFFFFFF
+            upload = Upload(transfer_id, upload_id, os.path.basename(name), size, part_path, client)
+            self.uploads[transfer_id] = upload
+        return {'transfer': upload.transfer_id, 'upload_id': upload_id, 'offset': upload.received}
+
+    def _get_upload(self, client, transfer_id):
+        """查找客户端的上传，调用方需要持有 _lock"""
+        upload = self.uploads.get(transfer_id)
+        if upload is None or upload.client is not client:
+            raise TransferError(f'上传不存在: {transfer_id}')
+        return upload
+
+    def write_frame(self, client, message):
+        """
+        写入一个上传数据帧
+
+        Args:
+            client: 客户端连接
+            message: 传输帧
+
+        Returns:
+            int: 传输 ID
+
+        Raises:
+            TransferError: 上传不存在或数据无效时
+        """
+        transfer_id, offset, data = unpack_frame(message)
+        with self._lock:
+            upload = self._get_upload(client, transfer_id)
+        upload.write(offset, data)
+        return transfer_id
+
+    def finish_upload(self, client, transfer_id):
+        """
+        完成上传，将临时文件移动到上传目录中
+
+        Args:
+            client: 客户端连接
+            transfer_id: 传输 ID
+
+        Returns:
+            dict: {'path': 文件路径, 'name': 文件名, 'size': 文件大小}
+
+        Raises:
+            TransferError: 上传不存在或数据不完整时
+        """
+        with self._lock:
+            upload = self._get_upload(client, transfer_id)
+            if upload.received != upload.size:
+                raise TransferError(f'数据不完整：已接收 {upload.received} 字节，文件大小 {upload.size} 字节')
+            del self.uploads[transfer_id]
+        upload.close()
+
+        # 不覆盖已有的文件，同时完成的同名上传各自使用不同的文件名
+        base, ext = os.path.splitext(upload.name)
+        path = os.path.join(self.upload_dir, upload.name)
+        for index in itertools.count(1):
+            try:
+                _move_exclusive(upload.part_path, path)
+                break
+            except FileExistsError:
+                path = os.path.join(self.upload_dir, f'{base} ({index}){ext}')
+        return {'path': path, 'name': os.path.basename(path), 'size': upload.size}
+
+    def abort_upload(self, client, transfer_id):
+        """
+        放弃上传并删除临时文件
+
+        Args:
+            client: 客户端连接
+            transfer_id: 传输 ID
+        """
+        with self._lock:
+            upload = self._get_upload(client, transfer_id)
+            del self.uploads[transfer_id]
+        upload.close()
+        try:
+            os.remove(upload.part_path)
+        except FileNotFoundError:
+            pass
+
+    def close_client(self, client):
+        """连接关闭时关闭该连接的所有上传，临时文件保留用于续传"""
+        with self._lock:
+            closed = [upload for upload in self.uploads.values() if upload.client is client]
+            for upload in closed:
+                del self.uploads[upload.transfer_id]
+        for upload in closed:
+            upload.close()
+
+    def resolve_download(self, path):
+        """
+        检查下载路径是否在允许下载的目录中
+
+        Args:
+            path: 文件路径
+
+        Returns:
+            str: 文件的真实路径
+
+        Raises:
+            TransferError: 不允许下载或文件不存在时
+        """
+        if not self.download_roots:
+            raise TransferError('服务器未启用文件下载')
+        if not isinstance(path, str):
+            raise TransferError('path 字段必须是字符串')
+        real_path = os.path.realpath(path)
+        for root in self.download_roots:
+            if os.path.commonpath([root, real_path]) == root:
+                break
+        else:
+            raise TransferError(f'不允许下载: {path}')
+        if not os.path.isfile(real_path):
+            raise TransferError(f'文件不存在: {path}')
+        return real_path
+
+    def open_download(self, path):
+        """
+        打开要下载的文件
+
+        Args:
+            path: resolve_download() 返回的路径
+
+        Returns:
+            Download: 下载
+        """
+        return Download(self._next_id(), path)
+
+
+class Download:
+    """一次下载，使用内存映射按块读取文件"""
+
+    def __init__(self, transfer_id, path):
+        self.transfer_id = transfer_id
+        self.path = path
+        self._file = open(path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        # 空文件无法映射
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+
+    def frame(self, offset, chunk_size):
+        """
+        读取一块数据并构造传输帧
+
+        Args:
+            offset: 偏移量
+            chunk_size: 分块大小
+
+        Returns:
+            bytes: 传输帧
+        """
+        return pack_frame(self.transfer_id, offset, self._map[offset:offset + chunk_size])
+
+    def close(self):
+        """关闭内存映射和文件"""
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
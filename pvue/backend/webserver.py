@@ -0,0 +1,213 @@
+"""静态文件服务器模块
+
+wsgiref.simple_server 一次只处理一个请求，使用 HTTP/1.0，每个请求都要重新建立连接，
+页面的几十个静态资源只能依次加载，一个慢客户端会阻塞所有客户端。
+
+这里的服务器每个连接使用一个线程，支持 HTTP/1.1 keep-alive，浏览器可以并行加载资源
+并复用连接。应用仍然是标准的 WSGI 应用，响应没有 Content-Length 时
+（wsgiref 不支持分块传输编码）发送完后关闭连接。
+
+应用返回 wsgi.file_wrapper 包装的文件时使用 sendfile 发送，大文件不需要读入内存。
+"""
+
+import io
+import re
+import socket
+import socketserver
+from wsgiref.simple_server import ServerHandler, WSGIRequestHandler, WSGIServer
+
+# keep-alive 连接空闲超过该秒数后关闭，释放处理线程
+KEEP_ALIVE_TIMEOUT = 15
+# 无法使用 sendfile 时每次读取的文件块大小
+FILE_BLOCK_SIZE = 64 * 1024
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(value, size):
+    """
+    解析 Range 请求头，只支持单个字节范围
+
+    Args:
+        value: Range 请求头，例如 'bytes=0-1023'、'bytes=1024-'、'bytes=-500'
+        size: 文件大小
+
+    Returns:
+        tuple: (start, end)，包括 end。没有 Range 请求头、格式无效或请求多个范围时返回 None，
+               应返回完整文件
+
+    Raises:
+        ValueError: 范围超出文件大小时，应返回 416
+    """
+    match = _RANGE.match(value.strip()) if value else None
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    if match.group(1) == '':
+        # 后缀范围：最后 N 个字节
+        suffix = int(match.group(2))
+        if suffix == 0 or size == 0:
+            raise ValueError(f"Unsatisfiable range: {value!r}")
+        return max(size - suffix, 0), size - 1
+    start = int(match.group(1))
+    end = int(match.group(2)) if match.group(2) else None
+    if end is not None and end < start:
+        return None
+    if start >= size:
+        raise ValueError(f"Unsatisfiable range: {value!r}")
+    return start, size - 1 if end is None else min(end, size - 1)
+
+
+def iter_file(file, length, block_size=FILE_BLOCK_SIZE):
+    """
+    从文件当前位置分块读取 length 个字节，结束或关闭时关闭文件
+
+    Args:
+        file: 二进制模式打开的文件
+        length: 读取的字节数
+        block_size: 每次读取的字节数
+
+    Yields:
+        bytes: 文件块
+    """
+    try:
+        while length > 0:
+            block = file.read(min(block_size, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+    finally:
+        file.close()
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    """每个连接使用一个线程的 WSGI 服务器"""
+
+    daemon_threads = True
+    # 同时到达的连接较多时（页面并行加载资源）不拒绝连接
+    request_queue_size = 128
+
+
+class KeepAliveServerHandler(ServerHandler):
+    """HTTP/1.1 响应处理，决定响应后是否保持连接"""
+
+    http_version = '1.1'
+
+    def cleanup_headers(self):
+        super().cleanup_headers()
+        request_handler = self.request_handler
+        # 无法确定响应长度时只能以关闭连接表示响应结束
+        if 'Content-Length' not in self.headers:
+            request_handler.close_connection = True
+        if request_handler.close_connection:
+            self.headers['Connection'] = 'close'
+        elif request_handler.request_version == 'HTTP/1.0':
+            self.headers['Connection'] = 'keep-alive'
+
+    def write(self, data):
+        if self.environ['REQUEST_METHOD'] != 'HEAD':
+            super().write(data)
+            return
+        # HEAD 请求只发送响应头，Content-Length 仍然是完整响应的长度
+        if not self.headers_sent:
+            self.bytes_sent = len(data)
+            self.send_headers()
+        self._flush()
+
+    def sendfile(self):
+        """
+        使用 socket.sendfile() 发送 wsgi.file_wrapper 包装的文件
+
+        从文件当前位置发送 Content-Length 个字节，文件内容不经过 Python 内存
+        （os.sendfile 可用时由内核直接复制）。
+
+        Returns:
+            bool: 是否已经发送，返回 False 时按普通迭代器逐块发送
+        """
+        if 'Content-Length' not in self.headers:
+            return False
+        file = self.result.filelike
+        try:
+            file.fileno()
+            offset = file.tell()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            return False
+        count = int(self.headers['Content-Length'])
+        self.bytes_sent = count
+        self.send_headers()
+        if self.environ['REQUEST_METHOD'] == 'HEAD' or count == 0:
+            return True
+        sent = self.request_handler.connection.sendfile(file, offset, count)
+        if sent < count:
+            # 文件在发送过程中被截断，响应不完整，只能关闭连接
+            self.request_handler.close_connection = True
+        return True
+
+    def handle_error(self):
+        # 出错时响应可能已经发送了一部分，不能继续复用连接
+        self.request_handler.close_connection = True
+        super().handle_error()
+
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    """在同一个连接上依次处理多个请求的 WSGI 请求处理器"""
+
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEP_ALIVE_TIMEOUT
+    # 响应头和响应体分开写入，关闭 Nagle 算法，避免复用连接时每个请求等待延迟确认
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        # WSGIRequestHandler 只处理一个请求，使用 BaseHTTPRequestHandler 的循环
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection:
+            self.handle_one_request()
+
+    def handle_one_request(self):
+        """处理一个请求，连接关闭或空闲超时时设置 close_connection"""
+        try:
+            self.raw_requestline = self.rfile.readline(65537)
+        except (socket.timeout, ConnectionError):
+            self.close_connection = True
+            return
+        if not self.raw_requestline:
+            self.close_connection = True
+            return
+        if len(self.raw_requestline) > 65536:
+            self.requestline = ''
+            self.request_version = ''
+            self.command = ''
+            self.send_error(414)
+            return
+
+        # 根据请求的版本和 Connection 头设置 close_connection
+        if not self.parse_request():
+            return
+        # 应用不一定读取请求体，剩余的数据会被当成下一个请求，有请求体时不复用连接
+        if self.headers.get('Content-Length', '0') != '0' or 'Transfer-Encoding' in self.headers:
+            self.close_connection = True
+
+        handler = KeepAliveServerHandler(
+            self.rfile, self.wfile, self.get_stderr(), self.get_environ(),
+            multithread=True
+        )
+        handler.request_handler = self
+        handler.run(self.server.get_app())
+
+
+def make_web_server(host, port, app):
+    """
+    创建静态文件服务器
+
+    Args:
+        host: 监听地址，'' 表示所有地址
+        port: 监听端口
+        app: WSGI 应用
+
+    Returns:
+        ThreadingWSGIServer: 已绑定端口并开始监听的服务器，调用 serve_forever() 处理请求
+    """
+    server = ThreadingWSGIServer((host, port), KeepAliveRequestHandler)
+    server.set_app(app)
+    return server
@@ -0,0 +1,402 @@
+"""多进程工作进程模块
+
+单个 WebSocket 服务器只有一个事件循环，消息的编解码和分发最多只能使用一个 CPU 核。
+工作进程模式 fork 出多个进程，每个进程运行自己的事件循环，通过 SO_REUSEPORT
+监听同一个端口，由操作系统把新连接分配给各个进程。
+
+主进程在启动其他线程之前 fork 出一个监督进程，由单线程的监督进程 fork 工作进程，
+工作进程异常退出时自动重启。在多线程的进程中 fork 可能复制其他线程持有的锁，
+使子进程死锁，因此 PvueApp 在启动静态文件服务器等线程之前调用
+WebSocketServer.fork_workers()。
+
+广播和缓存失效通过监督进程转发：主进程或任一工作进程调用 broadcast() 或
+invalidate_cache() 时，消息经管道发送给监督进程，再转发给所有工作进程，由各工作进程
+推送给本进程中订阅了主题的连接或删除本进程的缓存项。其他状态相互独立：主题订阅、
+合并调用、运行指标和性能分析都只作用于本进程的连接，主进程中没有这些状态，
+读取它们的方法在主进程中抛出 RuntimeError；push() 只能在工作进程中（例如暴露函数内）调用。
+
+需要 os.fork 和 SO_REUSEPORT（Linux、macOS、BSD），不支持的平台回退到单进程。
+"""
+
+import os
+import pickle
+import select
+import signal
+import socket
+import struct
+import threading
+import time
+
+from ..logger import error, flush_sink, info, warning
+
+# 工作进程启动后运行不到该秒数就退出时，视为启动失败，逐步延长重启间隔
+MIN_UPTIME = 1.0
+# 最长重启间隔（秒）
+MAX_RESTART_DELAY = 30.0
+# 停止时等待工作进程退出的秒数，超时后强制结束
+STOP_TIMEOUT = 5.0
+
+# 转发的命令
+COMMAND_BROADCAST = 'broadcast'
+COMMAND_INVALIDATE_CACHE = 'invalidate_cache'
+
+# 进程间消息的长度头
+_HEADER = struct.Struct('>I')
+# fork 时已经暂停的后台线程，不影响子进程
+_PVUE_THREADS = ('pvue-logger', 'pvue-tracing')
+
+
+def workers_supported():
+    """
+    判断当前平台是否支持工作进程模式
+
+    Returns:
+        bool: 是否支持 os.fork 和 SO_REUSEPORT
+    """
+    return hasattr(os, 'fork') and hasattr(socket, 'SO_REUSEPORT')
+
+
+def encode_message(command, *args):
+    """
+    编码在进程间转发的消息
+
+    Args:
+        command: 命令，COMMAND_BROADCAST 或 COMMAND_INVALIDATE_CACHE
+        *args: 命令参数，需要可以 pickle
+
+    Returns:
+        bytes: 带长度头的消息
+    """
+    data = pickle.dumps((command, args), pickle.HIGHEST_PROTOCOL)
+    return _HEADER.pack(len(data)) + data
+
+
+def decode_message(frame):
+    """
+    解码 encode_message() 编码的消息
+
+    Returns:
+        tuple: (命令, 命令参数元组)
+    """
+    return pickle.loads(frame[_HEADER.size:])
+
+
+class MessageReader:
+    """从字节流中切分出完整的消息"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """
+        追加收到的数据
+
+        Args:
+            data: 收到的字节
+
+        Returns:
+            list: 完整的消息（包括长度头），可以直接转发或用 decode_message() 解码
+        """
+        self._buffer += data
+        frames = []
+        while len(self._buffer) >= _HEADER.size:
+            size = _HEADER.size + _HEADER.unpack_from(self._buffer)[0]
+            if len(self._buffer) < size:
+                break
+            frames.append(bytes(self._buffer[:size]))
+            del self._buffer[:size]
+        return frames
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _describe_status(status):
+    """描述 waitpid 返回的退出状态"""
+    if os.WIFSIGNALED(status):
+        return f'信号 {os.WTERMSIG(status)}'
+    return f'退出码 {os.WEXITSTATUS(status)}'
+
+
+class _Worker:
+    """监督进程中记录的工作进程"""
+
+    __slots__ = ('pid', 'started', 'channel', 'reader')
+
+    def __init__(self, pid, channel):
+        self.pid = pid
+        self.started = time.monotonic()
+        # 与工作进程相连的 socket，双向转发消息，工作进程退出后为 None
+        self.channel = channel
+        self.reader = MessageReader()
+
+
+class WorkerSupervisor:
+    """工作进程监督者
+
+    start()、wait()、send() 和 stop() 在主进程中调用，
+    其余方法在 fork 出的监督进程中运行。
+    """
+
+    def __init__(self, server, workers):
+        """
+        初始化监督者
+
+        Args:
+            server: 已注册函数的 WebSocketServer，工作进程 fork 后运行它的副本
+            workers: 工作进程数
+        """
+        self.server = server
+        self.workers = workers
+        # 监督进程 ID（主进程中）
+        self.pid = None
+        # 工作进程（监督进程中），key 为序号
+        self.processes = {}
+        # 等待重启的工作进程，key 为序号，value 为重启时间
+        self._restarts = {}
+        self._delays = {}
+        self._stopping = False
+        # 工作进程开始监听后向管道写入一个字节，主进程据此判断是否就绪
+        self._ready_read = self._ready_write = None
+        # 主进程向监督进程发送消息的管道
+        self._control_read = self._control_write = None
+        self._control_lock = threading.Lock()
+
+    def start(self):
+        """
+        fork 监督进程，由它启动工作进程后立即返回
+
+        应在主线程中、启动其他线程之前调用，pvue 自己的后台线程会在 fork 时暂停。
+        """
+        others = [
+            thread.name for thread in threading.enumerate()
+            if thread is not threading.current_thread() and thread.name not in _PVUE_THREADS
+        ]
+        if others:
+            warning("fork 工作进程时还有其他线程在运行（{}），子进程可能因为这些线程持有的锁而死锁，"
+                    "请在启动其他线程之前调用 fork_workers()", ', '.join(others))
+
+        self._ready_read, self._ready_write = os.pipe()
+        self._control_read, self._control_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            self._run_supervisor()
+        os.close(self._ready_write)
+        os.close(self._control_read)
+        self.pid = pid
+        info("已启动 {} 个 WebSocket 工作进程", self.workers)
+
+    def wait(self):
+        """在主进程中等待工作进程就绪，直到监督进程退出"""
+        ready = 0
+        try:
+            while True:
+                readable, _, _ = select.select([self._ready_read], [], [], 0.5)
+                if readable:
+                    data = os.read(self._ready_read, 64)
+                    if not data:
+                        # 监督进程和所有工作进程都已退出
+                        break
+                    ready += len(data)
+                    if ready >= self.workers:
+                        # 所有工作进程都已开始监听（重启的工作进程同样会通知）
+                        self.server.ready.set()
+                if self._reap_supervisor(os.WNOHANG):
+                    break
+        finally:
+            os.close(self._ready_read)
+
+    def send(self, command, *args):
+        """
+        在主进程中发送命令，由监督进程转发给所有工作进程
+
+        Args:
+            command: 命令，COMMAND_BROADCAST 或 COMMAND_INVALIDATE_CACHE
+            *args: 命令参数，需要可以 pickle
+        """
+        frame = encode_message(command, *args)
+        with self._control_lock:
+            if self._control_write is None:
+                raise RuntimeError('WebSocket 服务器未运行')
+            _write_all(self._control_write, frame)
+
+    def stop(self):
+        """停止监督进程，由它结束所有工作进程"""
+        with self._control_lock:
+            if self._control_write is not None:
+                os.close(self._control_write)
+                self._control_write = None
+        try:
+            os.kill(self.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        deadline = time.monotonic() + STOP_TIMEOUT + 1
+        while not self._reap_supervisor(os.WNOHANG):
+            if time.monotonic() > deadline:
+                # 监督进程没有及时结束，强制结束它所在进程组中的所有进程
+                os.killpg(self.pid, signal.SIGKILL)
+                self._reap_supervisor(0)
+                break
+            time.sleep(0.05)
+
+    def _reap_supervisor(self, options):
+        """回收监督进程，返回它是否已经退出"""
+        try:
+            done, _ = os.waitpid(self.pid, options)
+        except ChildProcessError:
+            return True
+        return bool(done)
+
+    # 以下方法在监督进程中运行
+
+    def _run_supervisor(self):
+        """在监督进程中启动并监督工作进程，不返回"""
+        code = 0
+        try:
+            os.close(self._ready_read)
+            os.close(self._control_write)
+            # 独立的进程组，主进程可以一次结束监督进程和所有工作进程
+            os.setpgid(0, 0)
+            # Ctrl+C 由主进程处理，主进程停止时发送 SIGTERM
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, self._on_sigterm)
+            for index in range(self.workers):
+                self._spawn(index)
+            self._supervise()
+        except BaseException as e:
+            error("WebSocket 监督进程出错: {}", e)
+            code = 1
+        finally:
+            self._stop_workers()
+            # 写完后台日志，不执行主进程注册的 atexit 等清理
+            flush_sink()
+            os._exit(code)
+
+    def _on_sigterm(self, signum, frame):
+        self._stopping = True
+
+    def _supervise(self):
+        """转发消息，重启退出的工作进程"""
+        control_reader = MessageReader()
+        while not self._stopping:
+            channels = {
+                worker.channel.fileno(): worker
+                for worker in self.processes.values() if worker.channel is not None
+            }
+            readable, _, _ = select.select([self._control_read, *channels], [], [], 0.5)
+            for fd in readable:
+                if fd == self._control_read:
+                    data = os.read(fd, 65536)
+                    if not data:
+                        # 主进程已退出或正在停止
+                        return
+                    self._forward(control_reader.feed(data))
+                    continue
+                worker = channels[fd]
+                try:
+                    data = worker.channel.recv(65536)
+                except OSError:
+                    data = b''
+                if not data:
+                    # 工作进程正在退出，由 waitpid 处理
+                    worker.channel.close()
+                    worker.channel = None
+                    continue
+                self._forward(worker.reader.feed(data))
+            self._reap_workers()
+            self._restart_due()
+
+    def _forward(self, frames):
+        """把消息转发给所有工作进程"""
+        for frame in frames:
+            for worker in self.processes.values():
+                if worker.channel is None:
+                    continue
+                try:
+                    worker.channel.sendall(frame)
+                except OSError:
+                    # 工作进程已退出
+                    pass
+
+    def _reap_workers(self):
+        """回收退出的工作进程并安排重启，启动后很快退出时逐步延长重启间隔"""
+        for index, worker in list(self.processes.items()):
+            try:
+                done, status = os.waitpid(worker.pid, os.WNOHANG)
+            except ChildProcessError:
+                done, status = worker.pid, 0
+            if not done:
+                continue
+            del self.processes[index]
+            if worker.channel is not None:
+                worker.channel.close()
+            if time.monotonic() - worker.started < MIN_UPTIME:
+                delay = min(self._delays.get(index, 0.5) * 2, MAX_RESTART_DELAY)
+            else:
+                delay = 0
+            self._delays[index] = delay or 0.5
+            warning("WebSocket 工作进程 {} 已退出（{}），{} 秒后重启", index, _describe_status(status), delay)
+            self._restarts[index] = time.monotonic() + delay
+
+    def _restart_due(self):
+        now = time.monotonic()
+        for index, at in list(self._restarts.items()):
+            if at <= now:
+                del self._restarts[index]
+                self._spawn(index)
+
+    def _spawn(self, index):
+        """fork 一个工作进程"""
+        channel, worker_channel = socket.socketpair()
+        pid = os.fork()
+        if pid == 0:
+            channel.close()
+            self._run_worker(index, worker_channel)
+        worker_channel.close()
+        self.processes[index] = _Worker(pid, channel)
+
+    def _run_worker(self, index, channel):
+        """在工作进程中运行 WebSocket 服务器，不返回"""
+        code = 0
+        try:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            # 关闭监督进程的管道和其他工作进程的 socket
+            os.close(self._control_read)
+            for worker in self.processes.values():
+                if worker.channel is not None:
+                    worker.channel.close()
+            self.server.run_worker(index, self._ready_write, channel)
+        except BaseException as e:
+            error("WebSocket 工作进程 {} 出错: {}", index, e)
+            code = 1
+        finally:
+            flush_sink()
+            os._exit(code)
+
+    def _stop_workers(self):
+        """结束所有工作进程，超时后强制结束"""
+        for worker in self.processes.values():
+            try:
+                os.kill(worker.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for worker in list(self.processes.values()):
+            while True:
+                try:
+                    done, _ = os.waitpid(worker.pid, os.WNOHANG)
+                except ChildProcessError:
+                    break
+                if done:
+                    break
+                if time.monotonic() > deadline:
+                    os.kill(worker.pid, signal.SIGKILL)
+                    os.waitpid(worker.pid, 0)
+                    break
+                time.sleep(0.05)
+        self.processes.clear()
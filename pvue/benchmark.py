@@ -0,0 +1,420 @@
+"""WebSocket 服务器压测工具
+
+在独立进程中启动 WebSocketServer，注册几种典型的合成函数，用 N 个并发客户端
+持续调用，统计吞吐量、p50/p99 延迟和服务器进程的内存占用：
+
+    tiny      极小的请求和响应，衡量协议本身的开销（inline 执行）
+    large     大响应（表格数据），衡量编码、压缩和发送的开销
+    cpu       CPU 密集的计算，在线程池中执行
+    blocking  阻塞 IO（sleep），在线程池中执行
+
+结果可以保存为基线，之后与基线对比，吞吐量下降或 p99 延迟上升超过容差时以非零状态码退出：
+
+    python -m pvue.benchmark --save-baseline bench.json
+    python -m pvue.benchmark --baseline bench.json --tolerance 0.2
+
+客户端和服务器运行在不同的进程中，客户端的开销不会计入服务器的 CPU 时间。
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+import websockets
+
+from .backend.codec import TypeEncoderRegistry, available_codecs
+from .backend.eventloop import LOOP_AUTO, LOOP_OPTIONS, new_event_loop, resolve_loop
+
+# 基线文件格式版本
+BASELINE_VERSION = 1
+
+# 默认压测场景
+SCENARIOS = ('tiny', 'large', 'cpu', 'blocking')
+
+# 判断回归时比较的指标，True 表示越大越好
+COMPARED_METRICS = {
+    'throughput': True,
+    'p99_ms': False
+}
+
+
+def _bench_tiny(value):
+    """原样返回参数"""
+    return value
+
+
+@functools.lru_cache(maxsize=4)
+def _bench_large(rows):
+    """返回 rows 行的表格数据，结果在服务器进程中缓存，只衡量编码和发送的开销"""
+    return [
+        {'id': i, 'name': f'row-{i}', 'value': i * 0.5, 'tags': ['alpha', 'beta'], 'active': i % 2 == 0}
+        for i in range(rows)
+    ]
+
+
+def _bench_cpu(n):
+    """纯 Python 计算，持有 GIL"""
+    total = 0
+    for i in range(n):
+        total += i * i
+    return total
+
+
+def _bench_blocking(ms):
+    """模拟阻塞 IO"""
+    time.sleep(ms / 1000)
+    return ms
+
+
+def _bench_memory():
+    """
+    获取服务器进程的内存占用
+
+    Returns:
+        dict: rss_mb（当前常驻内存）和 peak_rss_mb（峰值常驻内存），无法获取时为 None
+    """
+    rss = peak = None
+    try:
+        # Linux：/proc/self/statm 第二项为常驻内存页数
+        with open('/proc/self/statm') as f:
+            rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 以字节为单位，Linux 以 KiB 为单位
+        peak = peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    to_mb = lambda value: None if value is None else round(value / (1024 * 1024), 1)
+    return {'rss_mb': to_mb(rss), 'peak_rss_mb': to_mb(peak)}
+
+
+def _run_server(port, server_options):
+    """在压测服务器进程中运行 WebSocket 服务器"""
+    from .logger import set_log_level
+    from .backend.server import WebSocketServer
+    set_log_level('WARNING')
+    # terminate() 发送 SIGTERM，按 Ctrl+C 处理，多进程模式下先停止工作进程
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    server = WebSocketServer(port, **server_options)
+    server.expose_function('bench_tiny', _bench_tiny, execution='inline')
+    server.expose_function('bench_large', _bench_large)
+    server.expose_function('bench_cpu', _bench_cpu)
+    server.expose_function('bench_blocking', _bench_blocking)
+    server.expose_function('bench_memory', _bench_memory, execution='inline')
+    server.start()
+
+
+def _free_port():
+    """获取一个空闲端口"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('localhost', 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(sorted_values, percent):
+    """最近秩法计算百分位数"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(percent / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class BenchmarkClient:
+    """压测客户端，持有到服务器的连接"""
+
+    def __init__(self, url, codec):
+        self.url = url
+        self.codec = codec
+        self.websocket = None
+        self._next_id = 0
+
+    async def connect(self):
+        subprotocols = [self.codec.subprotocol] if self.codec.subprotocol else None
+        # 大响应可能超过 websockets 默认的 1 MiB 消息上限
+        self.websocket = await websockets.connect(self.url, subprotocols=subprotocols, max_size=None)
+
+    async def call(self, function, params):
+        """
+        调用一次函数并等待响应
+
+        Returns:
+            dict: 响应消息
+        """
+        self._next_id += 1
+        await self.websocket.send(self.codec.encode(
+            {'id': self._next_id, 'function': function, 'params': params}
+        ))
+        return self.codec.decode(await self.websocket.recv())
+
+    async def close(self):
+        if self.websocket is not None:
+            await self.websocket.close()
+
+
+async def _drive(client, function, params, deadline, latencies):
+    """
+    在截止时间前持续调用，每次等待上一个响应后再发送下一个请求
+
+    Returns:
+        int: 失败的调用数
+    """
+    errors = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.call(function, params)
+        if latencies is not None:
+            latencies.append(time.perf_counter() - start)
+        if 'error' in response:
+            errors += 1
+    return errors
+
+
+async def run_scenario(clients, function, params, duration, warmup):
+    """
+    运行一个压测场景
+
+    Args:
+        clients: 已连接的 BenchmarkClient 列表
+        function: 调用的函数名
+        params: 调用参数
+        duration: 计时的秒数
+        warmup: 预热的秒数，不计入结果
+
+    Returns:
+        dict: requests、errors、throughput、mean_ms、p50_ms、p99_ms、max_ms
+    """
+    if warmup > 0:
+        deadline = time.perf_counter() + warmup
+        await asyncio.gather(*(_drive(c, function, params, deadline, None) for c in clients))
+
+    latencies = []
+    started = time.perf_counter()
+    deadline = started + duration
+    errors = sum(await asyncio.gather(*(_drive(c, function, params, deadline, latencies) for c in clients)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    to_ms = lambda value: None if value is None else round(value * 1000, 3)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': round(len(latencies) / elapsed, 1),
+        'mean_ms': to_ms(sum(latencies) / len(latencies)) if latencies else None,
+        'p50_ms': to_ms(_percentile(latencies, 50)),
+        'p99_ms': to_ms(_percentile(latencies, 99)),
+        'max_ms': to_ms(latencies[-1]) if latencies else None
+    }
+
+
+def scenario_calls(args):
+    """
+    各压测场景调用的函数和参数
+
+    Returns:
+        dict: key 为场景名，value 为 (函数名, 参数列表)
+    """
+    return {
+        'tiny': ('bench_tiny', ['ping']),
+        'large': ('bench_large', [args.large_rows]),
+        'cpu': ('bench_cpu', [args.cpu_iterations]),
+        'blocking': ('bench_blocking', [args.blocking_ms])
+    }
+
+
+async def run_benchmark(args, port):
+    """
+    连接压测服务器并依次运行所有场景
+
+    Returns:
+        dict: key 为场景名，value 为场景结果（包含服务器内存占用）
+    """
+    codec = available_codecs(TypeEncoderRegistry())[args.codec]
+    url = f'ws://localhost:{port}'
+    clients = [BenchmarkClient(url, codec) for _ in range(args.clients)]
+    await _wait_for_server(clients[0], args.startup_timeout)
+    await asyncio.gather(*(client.connect() for client in clients[1:]))
+
+    calls = scenario_calls(args)
+    results = {}
+    try:
+        for name in args.scenarios:
+            function, params = calls[name]
+            result = await run_scenario(clients, function, params, args.duration, args.warmup)
+            memory = await clients[0].call('bench_memory', [])
+            result.update(memory.get('result') or {})
+            results[name] = result
+            print(format_result(name, result))
+    finally:
+        await asyncio.gather(*(client.close() for client in clients))
+    return results
+
+
+async def _wait_for_server(client, timeout):
+    """等待压测服务器开始监听"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await client.connect()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+
+
+def format_result(name, result):
+    """格式化一个场景的结果"""
+    memory = '-' if result.get('rss_mb') is None else f"{result['rss_mb']} MB"
+    return (f"{name:<10} {result['throughput']:>10.1f} req/s  "
+            f"p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms  "
+            f"errors {result['errors']}  rss {memory}")
+
+
+def compare(results, baseline, tolerance):
+    """
+    与基线对比
+
+    Args:
+        results: 本次结果
+        baseline: 基线文件内容
+        tolerance: 容差，例如 0.2 表示允许 20% 的变化
+
+    Returns:
+        list: 回归描述，没有回归时为空列表
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            current, previous = result.get(metric), base.get(metric)
+            if current is None or not previous:
+                continue
+            change = (current - previous) / previous
+            if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+                regressions.append(f'{name} {metric}: {previous} -> {current} ({change:+.1%})')
+        if result['errors'] > base.get('errors', 0):
+            regressions.append(f"{name} errors: {base.get('errors', 0)} -> {result['errors']}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m pvue.benchmark',
+        description='Pvue WebSocket 服务器压测工具'
+    )
+    parser.add_argument('--clients', type=int, default=10, help='并发客户端数，默认为 10')
+    parser.add_argument('--duration', type=float, default=3.0, help='每个场景计时的秒数，默认为 3')
+    parser.add_argument('--warmup', type=float, default=0.5, help='每个场景预热的秒数，默认为 0.5')
+    parser.add_argument('--scenarios', type=lambda value: value.split(','), default=list(SCENARIOS),
+                        help=f"逗号分隔的场景列表，默认为 {','.join(SCENARIOS)}")
+    parser.add_argument('--codec', default='json', help='使用的编解码器：json、msgpack 或 cbor，默认为 json')
+    parser.add_argument('--no-compression', action='store_true', help='关闭 permessage-deflate 压缩')
+    parser.add_argument('--workers', type=int, default=1, help='WebSocket 工作进程数，默认为 1')
+    parser.add_argument('--loop', choices=LOOP_OPTIONS, default=LOOP_AUTO,
+                        help='服务器和客户端的事件循环，默认为 auto（安装了 uvloop 时使用 uvloop）')
+    parser.add_argument('--large-rows', type=int, default=2000, help='large 场景返回的行数，默认为 2000')
+    parser.add_argument('--cpu-iterations', type=int, default=20000, help='cpu 场景的循环次数，默认为 20000')
+    parser.add_argument('--blocking-ms', type=float, default=10, help='blocking 场景的阻塞毫秒数，默认为 10')
+    parser.add_argument('--port', type=int, default=None, help='压测服务器端口，默认使用空闲端口')
+    parser.add_argument('--startup-timeout', type=float, default=30, help='等待压测服务器启动的秒数')
+    parser.add_argument('--output', help='把结果写入 JSON 文件')
+    parser.add_argument('--save-baseline', metavar='FILE', help='把结果保存为基线')
+    parser.add_argument('--baseline', metavar='FILE', help='与基线对比，出现回归时以状态码 1 退出')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='与基线对比的容差，默认为 0.2（20%%）')
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知的场景: {', '.join(unknown)}，可选值为: {', '.join(SCENARIOS)}")
+    if args.clients < 1:
+        parser.error('--clients 必须大于 0')
+    return args
+
+
+def settings(args):
+    """影响结果的压测参数，保存到基线中"""
+    return {
+        'clients': args.clients,
+        'duration': args.duration,
+        'codec': args.codec,
+        'compression': not args.no_compression,
+        'workers': args.workers,
+        'loop': resolve_loop(args.loop),
+        'large_rows': args.large_rows,
+        'cpu_iterations': args.cpu_iterations,
+        'blocking_ms': args.blocking_ms
+    }
+
+
+def main(argv=None):
+    """
+    运行压测
+
+    Returns:
+        int: 退出状态码，与基线对比出现回归时为 1
+    """
+    args = parse_args(argv)
+    if args.codec not in available_codecs(TypeEncoderRegistry()):
+        print(f'编解码器不可用: {args.codec}', file=sys.stderr)
+        return 2
+
+    port = args.port or _free_port()
+    server_options = {'compression': not args.no_compression, 'workers': args.workers, 'loop': args.loop}
+    process = multiprocessing.Process(target=_run_server, args=(port, server_options), daemon=True)
+    process.start()
+    print(f'压测服务器: ws://localhost:{port}，{args.clients} 个客户端，每个场景 {args.duration} 秒，'
+          f'事件循环 {resolve_loop(args.loop)}')
+    try:
+        loop = new_event_loop(args.loop)
+        try:
+            results = loop.run_until_complete(run_benchmark(args, port))
+        finally:
+            loop.close()
+    finally:
+        process.terminate()
+        process.join()
+
+    report = {
+        'version': BASELINE_VERSION,
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'settings': settings(args),
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f'基线已保存: {args.save_baseline}')
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('settings') != report['settings']:
+            print('警告: 基线的压测参数与本次不同，对比结果可能没有意义', file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f'性能回归（容差 {args.tolerance:.0%}）:', file=sys.stderr)
+            for line in regressions:
+                print(f'  {line}', file=sys.stderr)
+            return 1
+        print(f'与基线对比没有回归（容差 {args.tolerance:.0%}）')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
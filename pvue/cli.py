@@ -47,6 +47,13 @@ def main():
         help='静态文件目录，默认为框架内置的静态文件'
     )
     
+    parser.add_argument(
+        '--ws-workers',
+        type=int,
+        default=1,
+        help='WebSocket 工作进程数，大于 1 时多个进程共享端口，默认为 1'
+    )
+    
     parser.add_argument(
         '--version',
         action='store_true',
@@ -67,7 +74,8 @@ def main():
     run_pvue_app(
         web_port=args.web_port,
         ws_port=args.ws_port,
-        static_dir=args.static_dir
+        static_dir=args.static_dir,
+        ws_workers=args.ws_workers
     )
 
 if __name__ == '__main__':
@@ -26,10 +26,31 @@ critical("这是一个严重错误信息")  # 会输出到stderr
 # 支持格式化
 info("访问地址: {}", "http://localhost:3000")
 error("错误: {}", Exception("发生了一个错误"))
+```
+
+高频日志（例如每条 WebSocket 消息）：
+```python
+from pvue.logger import LogLevel, debug, is_enabled_for, payload, set_sink, set_sample_rate
+
+# 日志在后台线程中格式化并写入文件，调用方只需把记录放入队列
+set_sink('pvue.log')
+# 只记录 1% 的消息
+set_sample_rate(0.01)
+
+# 级别未开启时不做任何格式化；payload() 在格式化时才转换为字符串并截断
+if is_enabled_for(LogLevel.DEBUG, sampled=True):
+    debug("收到消息: {}", payload(message))
+```
 """
 
+import atexit
+import os
+import queue
+import random
 import sys
+import threading
 import time
+import traceback
 
 # 日志级别定义
 class LogLevel:
@@ -42,6 +63,15 @@ class LogLevel:
 # 默认日志级别
 _current_log_level = LogLevel.INFO
 
+# payload() 转换为字符串后的最大长度，None 表示不截断
+_max_payload_length = 1000
+
+# is_enabled_for(sampled=True) 的采样率
+_sample_rate = 1.0
+
+# 后台日志输出，None 表示在调用线程中直接输出到 stdout/stderr
+_sink = None
+
 # 日志级别名称映射
 _log_level_names = {
     LogLevel.DEBUG: "DEBUG",
@@ -51,6 +81,16 @@ _log_level_names = {
     LogLevel.CRITICAL: "CRITICAL"
 }
 
+def _parse_level(level):
+    """将字符串日志级别转换为 LogLevel 枚举值"""
+    if isinstance(level, str):
+        name = level.upper()
+        for log_level, level_name in _log_level_names.items():
+            if level_name == name:
+                return log_level
+        raise ValueError(f"无效的日志级别: {name}")
+    return level
+
 def set_log_level(level):
     """设置日志级别
     
@@ -58,16 +98,188 @@ def set_log_level(level):
         level: 日志级别，可以是 LogLevel 枚举值或字符串
     """
     global _current_log_level
-    if isinstance(level, str):
-        # 从字符串转换为 LogLevel 枚举
-        level = level.upper()
-        for log_level, name in _log_level_names.items():
-            if name == level:
-                _current_log_level = log_level
-                return
-        raise ValueError(f"无效的日志级别: {level}")
-    else:
-        _current_log_level = level
+    _current_log_level = _parse_level(level)
+
+def is_enabled_for(level, sampled=False):
+    """判断日志级别是否开启，高频日志调用前先检查，避免准备日志参数的开销
+    
+    Args:
+        level: 日志级别，可以是 LogLevel 枚举值或字符串
+        sampled: 是否按采样率抽样，用于每条消息都会产生的日志
+        
+    Returns:
+        bool: 是否需要记录日志
+    """
+    if _parse_level(level) < _current_log_level:
+        return False
+    if sampled and _sample_rate < 1.0:
+        return random.random() < _sample_rate
+    return True
+
+def set_sample_rate(rate):
+    """设置 is_enabled_for(sampled=True) 的采样率
+    
+    Args:
+        rate: 采样率，0 到 1 之间，1 表示记录所有消息
+    """
+    global _sample_rate
+    if not 0 <= rate <= 1:
+        raise ValueError(f"无效的采样率: {rate}")
+    _sample_rate = rate
+
+def set_max_payload_length(length):
+    """设置 payload() 转换为字符串后的最大长度
+    
+    Args:
+        length: 最大字符数，None 表示不截断
+    """
+    global _max_payload_length
+    _max_payload_length = length
+
+class payload:
+    """延迟格式化的消息内容，只有日志真正输出时才转换为字符串，并截断过长的内容"""
+    
+    __slots__ = ('value',)
+    
+    def __init__(self, value):
+        self.value = value
+    
+    def __str__(self):
+        text = str(self.value)
+        if _max_payload_length is not None and len(text) > _max_payload_length:
+            return f"{text[:_max_payload_length]}...(共 {len(text)} 个字符)"
+        return text
+    
+    def __format__(self, format_spec):
+        return format(str(self), format_spec)
+
+class QueueSink:
+    """后台日志输出
+    
+    调用线程只把日志记录放入队列，格式化和写入都在后台线程中完成，
+    写入文件或终端的耗时不会影响调用线程。
+    """
+    
+    def __init__(self, target=None):
+        """
+        初始化后台日志输出并启动后台线程
+        
+        Args:
+            target: 日志文件路径或文本流，默认为 sys.stderr
+        """
+        if isinstance(target, (str, os.PathLike)):
+            self._stream = open(target, 'a', encoding='utf-8')
+            self._owns_stream = True
+        else:
+            self._stream = target or sys.stderr
+            self._owns_stream = False
+        self._queue = queue.SimpleQueue()
+        self._paused = False
+        self._start()
+    
+    def _start(self):
+        """启动后台线程"""
+        self._thread = threading.Thread(target=self._run, name='pvue-logger', daemon=True)
+        self._thread.start()
+    
+    def _pause(self):
+        """写完队列中的日志后停止后台线程，fork 前调用，避免子进程复制后台线程持有的锁"""
+        self._paused = self._thread.is_alive()
+        if self._paused:
+            self._queue.put(None)
+            self._thread.join()
+    
+    def _resume(self):
+        """重新启动 _pause() 停止的后台线程"""
+        if self._paused:
+            self._paused = False
+            self._start()
+    
+    def put(self, record):
+        """放入一条日志记录 (level, timestamp, message, args, kwargs)"""
+        self._queue.put(record)
+    
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+            try:
+                self._stream.write(_format_record(*record) + '\n')
+                # 队列中没有更多记录时才刷新，连续的日志合并写入
+                if self._queue.empty():
+                    self._stream.flush()
+            except Exception:
+                # 日志输出失败不能影响后台线程继续工作
+                pass
+        self._stream.flush()
+    
+    def close(self):
+        """写完队列中剩余的日志后停止后台线程"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self._owns_stream:
+            self._stream.close()
+
+def set_sink(target=None, background=True):
+    """设置日志输出位置
+    
+    Args:
+        target: 日志文件路径或文本流
+        background: 是否在后台线程中格式化和写入日志。为 False 且 target 为 None 时，
+                    恢复默认行为：在调用线程中输出到 stdout/stderr
+                    
+    Returns:
+        QueueSink: 后台日志输出，恢复默认行为时返回 None
+    """
+    global _sink
+    previous, _sink = _sink, None
+    if previous is not None:
+        previous.close()
+    if background:
+        _sink = QueueSink(target)
+    elif target is not None:
+        raise ValueError("target 只能在后台输出时指定")
+    return _sink
+
+def flush_sink():
+    """写完后台日志输出中剩余的日志并停止后台线程，之后的日志在调用线程中输出"""
+    global _sink
+    sink, _sink = _sink, None
+    if sink is not None:
+        sink.close()
+
+def _close_sink():
+    if _sink is not None:
+        _sink.close()
+
+atexit.register(_close_sink)
+
+def _pause_sink_before_fork():
+    if _sink is not None:
+        _sink._pause()
+
+def _resume_sink_after_fork():
+    if _sink is not None:
+        _sink._resume()
+
+def _restart_sink_after_fork():
+    # fork 出的子进程中没有后台线程，使用新的队列重新启动
+    if _sink is not None:
+        _sink._queue = queue.SimpleQueue()
+        _sink._resume()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_pause_sink_before_fork, after_in_parent=_resume_sink_after_fork,
+                        after_in_child=_restart_sink_after_fork)
+
+def _format_record(level, timestamp, message, args, kwargs):
+    """格式化一条日志记录"""
+    if args or kwargs:
+        message = message.format(*args, **kwargs)
+    timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+    return f"[{timestamp}] [Pvue] [{_log_level_names[level]}] {message}"
 
 def _log(level, message, *args, **kwargs):
     """内部日志函数
@@ -81,15 +293,14 @@ def _log(level, message, *args, **kwargs):
     if level < _current_log_level:
         return
     
-    # 格式化消息
-    if args or kwargs:
-        message = message.format(*args, **kwargs)
-    
-    # 获取当前时间
-    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    sink = _sink
+    if sink is not None:
+        # 格式化在后台线程中进行
+        sink.put((level, time.time(), message, args, kwargs))
+        return
     
     # 构建日志行
-    log_line = f"[{timestamp}] [Pvue] [{_log_level_names[level]}] {message}"
+    log_line = _format_record(level, time.time(), message, args, kwargs)
     
     # 根据日志级别选择输出流
     if level >= LogLevel.ERROR:
@@ -155,7 +366,5 @@ def exception(message, *args, **kwargs):
         args: 格式化参数
         kwargs: 关键字参数
     """
-    import traceback
     _log(LogLevel.ERROR, message, *args, **kwargs)
-    _log(LogLevel.ERROR, "异常详情:")
-    traceback.print_exc(file=sys.stderr)
+    _log(LogLevel.ERROR, "异常详情:\n{}", traceback.format_exc().rstrip())
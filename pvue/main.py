@@ -1,41 +1,37 @@
+import json
+import mimetypes
 import os
+import secrets
 import sys
 import threading
 import time
-from wsgiref.simple_server import make_server
+from urllib.parse import parse_qs
 from .backend.server import WebSocketServer
-from .eel import EelApp, create_eel_app
+from .backend.webserver import FILE_BLOCK_SIZE, iter_file, make_web_server, parse_range
+from .backend.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
 from .utils import get_static_dir
 from .logger import info, error, warning
 
-# 尝试导入WebView相关功能
-webview_imported = False
-try:
-    # 首先检查webview模块是否可以导入
-    import webview as pywebview_module
-    
-    # 然后导入我们的webview模块功能
-    from .webview import WebViewApp, create_webview_app, get_webview_app
-    webview_imported = True
-    info("WebView模块导入成功")
-except ImportError as e:
-    # 打印更详细的错误信息，帮助调试
-    warning("WebView模块导入失败: {}", e)
-    # 如果pywebview未安装，只提供核心功能
-    WebViewApp = None
-    create_webview_app = None
-    webview_imported = False
-except Exception as e:
-    # 捕获其他可能的异常
-    error("WebView模块导入过程中发生错误: {}", e)
-    WebViewApp = None
-    create_webview_app = None
-    webview_imported = False
+# Eel 和 PyWebView 只在对应的运行模式下导入，web 模式不需要加载 GUI 相关的依赖
+
+# 静态文件服务器保留的指标路径
+METRICS_PATH = '/_pvue/metrics'
+# 静态文件服务器保留的性能分析管理路径前缀
+PROFILE_PATH = '/_pvue/profile/'
+# 只允许本机访问管理路径
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1', '::ffff:127.0.0.1')
+# 开始和结束性能分析的请求需要在该请求头中携带 PvueApp.admin_token
+ADMIN_TOKEN_HEADER = 'X-Pvue-Admin-Token'
+# 等待服务器开始监听的最长时间（秒），超时后给出警告并继续启动
+STARTUP_TIMEOUT = 10
 
 class PvueApp:
     """Pvue 应用类，用于管理前端静态文件和后端 WebSocket 服务器"""
     
-    def __init__(self, web_port=3000, ws_port=8765, static_dir=None, mode='web', eel_options=None, webview_options=None):
+    def __init__(self, web_port=3000, ws_port=8765, static_dir=None, mode='web', eel_options=None, webview_options=None,
+                 ws_max_workers=None, ws_codecs=None, ws_compression=True, ws_upload_dir=None,
+                 ws_download_roots=None, ws_trace_file=None, ws_workers=1, ws_loop='auto',
+                 admin=False):
         """
         初始化 Pvue 应用
         
@@ -46,6 +42,20 @@ class PvueApp:
             mode: 运行模式，可选值：'web'（传统 Web 服务器）、'eel'（Eel 桌面应用）、'webview'（PyWebView 桌面应用）
             eel_options: Eel 应用选项，包括 size, app_mode, port, dev_mode 等
             webview_options: PyWebView 应用选项，包括 title, size, resizable, fullscreen, frameless, debug 等
+            ws_max_workers: WebSocket 服务器共享线程池大小，默认为 min(32, CPU 核数 + 4)
+            ws_codecs: WebSocket 连接可协商的编解码器名称列表，默认为所有已安装的编解码器
+            ws_compression: WebSocket 压缩配置，True 使用默认配置，False 关闭压缩，也可以传入 dict：
+                            enabled、window_bits、memory_level、threshold（小于该字节数的消息不压缩）
+            ws_upload_dir: 前端上传文件的保存目录，默认不允许上传
+            ws_download_roots: 允许前端下载的目录列表，默认不允许下载
+            ws_trace_file: 调用追踪的 JSON Lines 导出文件，记录每条消息解码、分发、执行、编码、
+                           发送各阶段的耗时，默认不追踪
+            ws_workers: WebSocket 工作进程数，大于 1 时 fork 多个进程共享端口（SO_REUSEPORT），
+                        充分利用多核；广播和缓存失效转发给所有工作进程，指标和性能分析相互独立，平台不支持时回退到单进程
+            ws_loop: WebSocket 服务器的事件循环，'auto'（安装了 uvloop 时使用 uvloop，默认）、
+                     'asyncio' 或 'uvloop'，uvloop 不可用时回退到 asyncio
+            admin: 是否在静态文件服务器上开放管理路径（性能分析开关），只允许本机访问，
+                   开始和结束性能分析需要使用 POST 请求并携带 admin_token
         """
         self.web_port = web_port
         self.ws_port = ws_port
@@ -53,7 +63,22 @@ class PvueApp:
         self.mode = mode
         self.eel_options = eel_options or {}
         self.webview_options = webview_options or {}
+        self.ws_max_workers = ws_max_workers
+        self.ws_codecs = ws_codecs
+        self.ws_compression = ws_compression
+        self.ws_upload_dir = ws_upload_dir
+        self.ws_download_roots = ws_download_roots
+        self.ws_trace_file = ws_trace_file
+        self.ws_workers = ws_workers
+        self.ws_loop = ws_loop
+        self.admin = admin
+        # 管理接口令牌，每个进程随机生成，网页无法猜到，不能借用户的浏览器开关性能分析
+        self.admin_token = secrets.token_urlsafe(32) if admin else None
+        # 在 WebSocket 服务器创建前注册的类型编码器
+        self._type_encoders = []
         self.web_server = None
+        # 静态文件服务器开始监听后设置
+        self.web_ready = threading.Event()
         self.ws_server = None
         self.eel_app = None
         self.webview_app = None
@@ -73,26 +98,21 @@ class PvueApp:
             webview_available = True
             error_message = ""
             
-            # 首先检查webview_imported标志
-            if not webview_imported:
-                webview_available = False
-                error_message = "pywebview未安装或导入失败"
-            else:
-                # 尝试导入webview模块，确保它能正常工作
-                try:
-                    from . import webview as pvue_webview
-                    if pvue_webview.webview is None:
-                        webview_available = False
-                        error_message = "webview模块初始化失败"
-                    else:
-                        # 检查webview_import_successful标志
-                        if not pvue_webview.webview_import_successful:
-                            warning("WebView模块已安装，但初始化不完全，尝试继续使用...")
-                            # 即使初始化不完全，也尝试使用webview模式
-                            webview_available = True
-                except (ImportError, AttributeError) as e:
+            # 首次使用 webview 模式时才导入 pywebview 并探测 GUI 后端
+            try:
+                from . import webview as pvue_webview
+                if not pvue_webview.initialize_webview():
                     webview_available = False
-                    error_message = str(e)
+                    error_message = "pywebview未安装或导入失败"
+                else:
+                    # 检查webview_import_successful标志
+                    if not pvue_webview.webview_import_successful:
+                        warning("WebView模块已安装，但初始化不完全，尝试继续使用...")
+                        # 即使初始化不完全，也尝试使用webview模式
+                        webview_available = True
+            except (ImportError, AttributeError) as e:
+                webview_available = False
+                error_message = str(e)
             
             if not webview_available:
                 # 自动回退到web模式，提高用户体验
@@ -105,18 +125,42 @@ class PvueApp:
         """静态文件处理函数"""
         path = environ['PATH_INFO']
         
+        # Prometheus 指标
+        if path == METRICS_PATH:
+            return self._metrics_handler(environ, start_response)
+        
+        # 性能分析开关
+        if path.startswith(PROFILE_PATH):
+            return self._profile_handler(environ, start_response, path[len(PROFILE_PATH):])
+        
         # 默认返回 index.html
         if path == '/':
             path = '/index.html'
         
-        # 构建文件路径
-        file_path = os.path.join(self.static_dir, path[1:])
+        # 构建文件路径，拒绝访问静态文件目录之外的文件（例如 /../ 或 //etc/passwd）
+        static_root = os.path.abspath(self.static_dir)
+        file_path = os.path.normpath(os.path.join(static_root, path.lstrip('/\\')))
+        try:
+            outside = os.path.commonpath([static_root, file_path]) != static_root
+        except ValueError:
+            # Windows 上位于不同驱动器
+            outside = True
         
         # 处理文件请求
         try:
-            with open(file_path, 'rb') as f:
-                content = f.read()
-                
+            if outside:
+                raise FileNotFoundError(path)
+            f = open(file_path, 'rb')
+        except FileNotFoundError:
+            start_response('404 Not Found', [('Content-Type', 'text/plain')])
+            return [b'404 Not Found']
+        except Exception as e:
+            start_response('500 Internal Server Error', [('Content-Type', 'text/plain')])
+            return [f'Error: {str(e)}'.encode('utf-8')]
+        
+        try:
+            size = os.fstat(f.fileno()).st_size
+            
             # 根据文件扩展名设置 Content-Type
             content_type = 'text/plain'
             if path.endswith('.html'):
@@ -133,23 +177,151 @@ class PvueApp:
                 content_type = 'image/jpeg'
             elif path.endswith('.gif'):
                 content_type = 'image/gif'
+            else:
+                # 视频、音频、字体等其他文件
+                content_type = mimetypes.guess_type(path)[0] or content_type
+            headers = [('Content-Type', content_type), ('Accept-Ranges', 'bytes')]
             
-            start_response('200 OK', [('Content-Type', content_type)])
-            return [content]
+            # 支持 Range 请求，媒体文件可以拖动进度
+            try:
+                byte_range = parse_range(environ.get('HTTP_RANGE'), size)
+            except ValueError:
+                f.close()
+                start_response('416 Range Not Satisfiable', headers + [
+                    ('Content-Range', f'bytes */{size}'),
+                    ('Content-Length', '0')
+                ])
+                return [b'']
+            if byte_range is None:
+                status, start, end = '200 OK', 0, size - 1
+            else:
+                status, (start, end) = '206 Partial Content', byte_range
+                headers.append(('Content-Range', f'bytes {start}-{end}/{size}'))
+            length = end - start + 1
+            headers.append(('Content-Length', str(length)))
+            
+            f.seek(start)
+            start_response(status, headers)
+            # 不把整个文件读入内存：发送到文件末尾时交给服务器的 wsgi.file_wrapper（使用 sendfile），
+            # 否则分块读取指定范围
+            file_wrapper = environ.get('wsgi.file_wrapper')
+            if file_wrapper is not None and end == size - 1:
+                return file_wrapper(f, FILE_BLOCK_SIZE)
+            return iter_file(f, length)
             
-        except FileNotFoundError:
-            start_response('404 Not Found', [('Content-Type', 'text/plain')])
-            return [b'404 Not Found']
         except Exception as e:
+            f.close()
             start_response('500 Internal Server Error', [('Content-Type', 'text/plain')])
             return [f'Error: {str(e)}'.encode('utf-8')]
     
+    def _metrics_handler(self, environ, start_response):
+        """以 Prometheus 文本格式返回 WebSocket 服务器的运行指标"""
+        if not self.ws_server:
+            start_response('503 Service Unavailable', [('Content-Type', 'text/plain')])
+            return [b'503 Service Unavailable']
+        if self.ws_server.supervisor is not None:
+            # 指标记录在各个工作进程中，主进程的指标始终为空
+            content = '多进程模式下运行指标只记录在各个工作进程中'.encode('utf-8')
+            start_response('503 Service Unavailable', [
+                ('Content-Type', 'text/plain; charset=utf-8'),
+                ('Content-Length', str(len(content)))
+            ])
+            return [content]
+        content = self.ws_server.metrics.render().encode('utf-8')
+        start_response('200 OK', [
+            ('Content-Type', METRICS_CONTENT_TYPE),
+            ('Content-Length', str(len(content)))
+        ])
+        return [content]
+    
+    def _profile_handler(self, environ, start_response, action):
+        """
+        性能分析管理接口，返回 JSON
+        
+        POST start?duration=秒数&calls=调用数&sample_rate=采样率 开始分析（参数也可以放在表单请求体中），
+        POST stop 结束分析并返回 pstats 文件路径，GET status 返回分析状态。
+        start 和 stop 会改变状态，必须使用 POST 并在请求头中携带 admin_token，
+        其他网页不能通过链接或图片让用户的浏览器发起请求。
+        """
+        if not self.admin:
+            start_response('404 Not Found', [('Content-Type', 'text/plain')])
+            return [b'404 Not Found']
+        if environ.get('REMOTE_ADDR') not in LOOPBACK_ADDRESSES:
+            start_response('403 Forbidden', [('Content-Type', 'text/plain')])
+            return [b'403 Forbidden']
+        
+        status = '200 OK'
+        try:
+            query = parse_qs(environ.get('QUERY_STRING', ''))
+            # 读取请求体，保持连接可以继续处理下一个请求
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+            if length > 0:
+                query.update(parse_qs(environ['wsgi.input'].read(length).decode('latin-1')))
+            if action in ('start', 'stop'):
+                if environ.get('REQUEST_METHOD') != 'POST':
+                    start_response('405 Method Not Allowed', [('Content-Type', 'text/plain'), ('Allow', 'POST')])
+                    return [b'405 Method Not Allowed']
+                token = environ.get('HTTP_' + ADMIN_TOKEN_HEADER.upper().replace('-', '_'), '')
+                if not secrets.compare_digest(token.encode('utf-8'), self.admin_token.encode('utf-8')):
+                    start_response('403 Forbidden', [('Content-Type', 'text/plain')])
+                    return [b'403 Forbidden']
+            
+            if action == 'start':
+                duration = query.get('duration', [None])[0]
+                calls = query.get('calls', [None])[0]
+                sample_rate = query.get('sample_rate', ['1'])[0]
+                self.start_profiling(
+                    duration=float(duration) if duration else None,
+                    calls=int(calls) if calls else None,
+                    sample_rate=float(sample_rate)
+                )
+                result = self.profiling_status()
+            elif action == 'stop':
+                result = {'files': self.stop_profiling()}
+            elif action == 'status':
+                result = self.profiling_status()
+            else:
+                status, result = '404 Not Found', {'error': f'未知的操作: {action}'}
+        except ValueError as e:
+            status, result = '400 Bad Request', {'error': str(e)}
+        except RuntimeError as e:
+            status, result = '503 Service Unavailable', {'error': str(e)}
+        
+        content = json.dumps(result, ensure_ascii=False).encode('utf-8')
+        start_response(status, [
+            ('Content-Type', 'application/json; charset=utf-8'),
+            ('Content-Length', str(len(content)))
+        ])
+        return [content]
+    
+    def _create_ws_server(self):
+        """创建 WebSocket 服务器实例"""
+        ws_server = WebSocketServer(
+            self.ws_port,
+            max_workers=self.ws_max_workers,
+            codecs=self.ws_codecs,
+            compression=self.ws_compression,
+            upload_dir=self.ws_upload_dir,
+            download_roots=self.ws_download_roots,
+            trace_file=self.ws_trace_file,
+            workers=self.ws_workers,
+            loop=self.ws_loop
+        )
+        for type_, encoder in self._type_encoders:
+            ws_server.register_type_encoder(type_, encoder)
+        return ws_server
+    
     def start_web_server(self):
         """启动静态文件服务器"""
         try:
-            self.web_server = make_server('', self.web_port, self._static_file_handler)
+            # 多线程处理连接，支持 HTTP/1.1 keep-alive，浏览器可以并行加载静态资源
+            self.web_server = make_web_server('', self.web_port, self._static_file_handler)
+            # 端口已绑定并开始监听，之后到达的连接在 serve_forever() 中处理
+            self.web_ready.set()
             info("静态文件服务器正在运行...")
             info("访问地址: http://localhost:{}", self.web_port)
+            if self.admin:
+                info("管理接口令牌（请求头 {}）: {}", ADMIN_TOKEN_HEADER, self.admin_token)
             self.web_server.serve_forever()
         except KeyboardInterrupt:
             pass
@@ -162,7 +334,7 @@ class PvueApp:
         try:
             # 使用已经初始化并注册了函数的 WebSocketServer 实例
             if not self.ws_server:
-                self.ws_server = WebSocketServer(self.ws_port)
+                self.ws_server = self._create_ws_server()
             info("WebSocket 服务器正在运行...")
             info("WebSocket 地址: ws://localhost:{}", self.ws_port)
             self.ws_server.start()
@@ -172,12 +344,20 @@ class PvueApp:
             error("WebSocket 服务器启动失败: {}", e)
             sys.exit(1)
     
-    def expose(self, name=None):
+    def expose(self, name=None, execution='pool', max_workers=None, cache=None, single_flight=False):
         """
         暴露 Python 函数给前端调用
         
         Args:
             name: 前端调用时使用的函数名，默认为原函数名
+            execution: 执行策略，可选值：'inline'（在事件循环中直接执行）、
+                       'pool'（在共享线程池中执行，默认）、'dedicated'（在独占线程池中执行）
+            max_workers: dedicated 策略下独占线程池的大小，默认为 1
+            cache: 结果缓存配置，适用于相同参数总是返回相同结果的函数。
+                   True 使用默认配置（最多缓存 128 组参数，不过期），
+                   也可以传入 {'maxsize': 最大缓存数量, 'ttl': 有效期（秒）}，默认不缓存
+            single_flight: 是否合并参数相同的并发调用，适用于多个窗口同时调用的耗时函数，
+                           同时到达的相同调用只执行一次，所有调用收到同一个结果
             
         Returns:
             装饰器函数
@@ -185,15 +365,21 @@ class PvueApp:
         def decorator(func):
             # 获取函数名
             func_name = name or func.__name__
+            options = {
+                'execution': execution,
+                'max_workers': max_workers,
+                'cache': cache,
+                'single_flight': single_flight
+            }
             
             # 在所有模式下，都将函数注册到 WebSocket 服务器
             if self.ws_server:
-                self.ws_server.expose_function(func_name, func)
+                self.ws_server.expose_function(func_name, func, **options)
             else:
                 # 否则，将函数添加到待注册列表
                 if not hasattr(self, '_pending_functions'):
                     self._pending_functions = []
-                self._pending_functions.append((func_name, func))
+                self._pending_functions.append((func_name, func, options))
             
             # 对于 Eel 和 WebView 模式，还需要将函数暴露给对应的应用
             if self.mode in ['eel', 'webview']:
@@ -206,6 +392,136 @@ class PvueApp:
             return func
         return decorator
     
+    def invalidate_cache(self, name=None, params=None):
+        """
+        使函数的结果缓存失效，数据发生变化后调用
+        
+        多进程模式下转发给所有工作进程，params 需要可以 pickle。
+        
+        Args:
+            name: 函数名，默认为所有设置了缓存的函数
+            params: 调用参数列表，只使这组参数的缓存失效，默认清空函数的整个缓存
+            
+        Returns:
+            int: 删除的缓存项数量，多进程模式下在主进程中调用时为 None
+        """
+        if not self.ws_server:
+            return 0
+        return self.ws_server.invalidate_cache(name, params)
+    
+    def cache_stats(self):
+        """
+        获取结果缓存的统计信息
+        
+        Returns:
+            dict: key 为函数名，value 为 {'hits', 'misses', 'size', 'maxsize', 'ttl'}
+            
+        Raises:
+            RuntimeError: 多进程模式下在主进程中调用时
+        """
+        if not self.ws_server:
+            return {}
+        return self.ws_server.cache_stats()
+    
+    def start_profiling(self, duration=None, calls=None, sample_rate=1.0, output_dir=None):
+        """
+        开始分析暴露函数的调用性能，不需要重启应用
+        
+        Args:
+            duration: 分析时长（秒），到时自动结束并输出结果
+            calls: 分析的调用数，达到后自动结束并输出结果
+            sample_rate: 采样率，0 到 1 之间，默认分析所有调用
+            output_dir: pstats 文件输出目录，默认在临时目录中创建
+            
+        Raises:
+            RuntimeError: 应用未启动时，或多进程模式下在主进程中调用时
+            ValueError: 参数无效时
+        """
+        if not self.ws_server:
+            raise RuntimeError('Pvue 应用未启动')
+        self.ws_server.start_profiling(duration, calls, sample_rate, output_dir)
+    
+    def stop_profiling(self):
+        """
+        结束性能分析并输出结果
+        
+        Returns:
+            list: pstats 文件路径，每个函数一个文件（在 functions 子目录中），另有汇总所有函数的 all.pstats
+            
+        Raises:
+            RuntimeError: 应用未启动时，或多进程模式下在主进程中调用时
+        """
+        if not self.ws_server:
+            raise RuntimeError('Pvue 应用未启动')
+        return self.ws_server.stop_profiling()
+    
+    def profiling_status(self):
+        """
+        获取性能分析状态
+        
+        Returns:
+            dict: active、profiled_calls、functions、remaining、output_dir、last_output
+            
+        Raises:
+            RuntimeError: 应用未启动时，或多进程模式下在主进程中调用时
+        """
+        if not self.ws_server:
+            raise RuntimeError('Pvue 应用未启动')
+        return self.ws_server.profiling_status()
+    
+    def register_type_encoder(self, type_, encoder):
+        """
+        注册类型编码器，让暴露函数可以直接返回编解码器原生不支持的对象
+        
+        Args:
+            type_: 要编码的类型，子类同样使用该编码器
+            encoder: 编码器函数，接收对象并返回可编码的值
+        """
+        self._type_encoders.append((type_, encoder))
+        if self.ws_server:
+            self.ws_server.register_type_encoder(type_, encoder)
+    
+    def broadcast(self, topic, payload):
+        """
+        向订阅了主题的所有前端推送消息，可以在任意线程中调用
+        
+        多进程模式下消息转发给所有工作进程，payload 需要可以 pickle。
+        
+        Args:
+            topic: 主题
+            payload: 推送的数据
+            
+        Returns:
+            Future，结果为收到消息的客户端数量，多进程模式下为 None
+            
+        Raises:
+            RuntimeError: 应用未启动时
+        """
+        if not self.ws_server:
+            raise RuntimeError('Pvue 应用未启动')
+        return self.ws_server.broadcast(topic, payload)
+    
+    def push(self, client, topic, payload):
+        """
+        向单个前端推送消息，可以在任意线程中调用
+        
+        多进程模式下连接只存在于工作进程中，只能在暴露函数等工作进程中运行的代码里调用。
+        
+        Args:
+            client: 客户端连接，可以在暴露函数中通过 pvue.get_current_client() 获取
+            topic: 主题
+            payload: 推送的数据
+            
+        Returns:
+            Future，结果为收到消息的客户端数量
+            
+        Raises:
+            RuntimeError: 应用未启动时，或多进程模式下在主进程中调用时
+        """
+        if not self.ws_server:
+            raise RuntimeError('Pvue 应用未启动')
+        return self.ws_server.push(client, topic, payload)
+    
     def start(self):
         """启动 Pvue 应用"""
         if self.is_running:
@@ -219,26 +535,38 @@ class PvueApp:
         info("运行模式: {}", self._get_mode_description())
         
         # 初始化 WebSocket 服务器（不启动）
-        self.ws_server = WebSocketServer(self.ws_port)
+        self.ws_server = self._create_ws_server()
         
         # 先注册待处理的函数到 WebSocket 服务器
         if hasattr(self, '_pending_functions'):
-            for name, func in self._pending_functions:
-                self.ws_server.expose_function(name, func)
+            for name, func, options in self._pending_functions:
+                self.ws_server.expose_function(name, func, **options)
             delattr(self, '_pending_functions')
         
-        # 启动 WebSocket 服务器线程（在所有模式下都需要）
+        # 多进程模式下在启动任何线程之前 fork 工作进程，子进程不会复制其他线程持有的锁
+        self.ws_server.fork_workers()
+        
+        # 同时启动 WebSocket 服务器（所有模式都需要）和静态文件服务器（Eel 模式由 Eel 提供），
+        # 两个服务器都开始监听后立即继续
+        started = time.perf_counter()
         ws_thread = threading.Thread(target=self.start_ws_server, daemon=True)
         ws_thread.start()
+        servers = [('WebSocket 服务器', self.ws_server.ready, ws_thread)]
+        if self.mode in ('web', 'webview'):
+            web_thread = threading.Thread(target=self.start_web_server, daemon=True)
+            web_thread.start()
+            servers.append(('静态文件服务器', self.web_ready, web_thread))
         
-        # 等待 WebSocket 服务器启动
-        time.sleep(0.5)
+        if not self._wait_ready(servers, started):
+            self.stop()
+            sys.exit(1)
         
         # 构建服务器 URL
         server_url = f"http://localhost:{self.web_port}"
         
         if self.mode == 'eel':
             # Eel 模式：启动 Eel 应用
+            from .eel import create_eel_app
             self.eel_app = create_eel_app(
                 static_dir=self.static_dir,
                 port=self.web_port,
@@ -247,7 +575,7 @@ class PvueApp:
             
             # 暴露待处理的函数
             if hasattr(self, '_pending_functions'):
-                for name, func in self._pending_functions:
+                for name, func, _ in self._pending_functions:
                     self.eel_app.expose_function(name, func)
                 delattr(self, '_pending_functions')
             
@@ -262,15 +590,9 @@ class PvueApp:
             except KeyboardInterrupt:
                 self.stop()
         elif self.mode == 'webview':
-            # WebView 模式：先启动静态文件服务器，再启动 WebView 窗口
-            # 启动静态文件服务器线程
-            web_thread = threading.Thread(target=self.start_web_server, daemon=True)
-            web_thread.start()
-            
-            # 等待静态文件服务器启动
-            time.sleep(0.5)
-            
+            # WebView 模式：静态文件服务器已就绪，启动 WebView 窗口
             # 创建 WebView 应用
+            from .webview import create_webview_app
             self.webview_app = create_webview_app(
                 static_dir=self.static_dir,
                 **self.webview_options
@@ -278,7 +600,7 @@ class PvueApp:
             
             # 暴露待处理的函数
             if hasattr(self, '_pending_functions'):
-                for name, func in self._pending_functions:
+                for name, func, _ in self._pending_functions:
                     self.webview_app.expose_function(name, func)
                 delattr(self, '_pending_functions')
             
@@ -294,13 +616,7 @@ class PvueApp:
             except KeyboardInterrupt:
                 self.stop()
         else:
-            # 传统 Web 模式：启动静态文件服务器
-            web_thread = threading.Thread(target=self.start_web_server, daemon=True)
-            web_thread.start()
-            
-            # 等待服务器启动
-            time.sleep(0.5)
-            
+            # 传统 Web 模式：静态文件服务器已就绪
             info("=== Pvue 应用启动成功 ===")
             info("前端地址: {}", server_url)
             info("WebSocket地址: ws://localhost:{}", self.ws_port)
@@ -313,6 +629,31 @@ class PvueApp:
             except KeyboardInterrupt:
                 self.stop()
     
+    def _wait_ready(self, servers, started, timeout=STARTUP_TIMEOUT):
+        """
+        等待服务器开始监听并报告启动用时
+        
+        Args:
+            servers: (名称, 就绪事件, 服务器线程) 列表
+            started: 开始启动的时间（time.perf_counter()）
+            timeout: 最长等待时间（秒），超时后给出警告并继续启动
+            
+        Returns:
+            bool: 服务器都没有启动失败时返回 True
+        """
+        for name, ready, thread in servers:
+            while not ready.wait(0.05):
+                if not thread.is_alive():
+                    error("{}启动失败", name)
+                    return False
+                if time.perf_counter() - started > timeout:
+                    warning("{}在 {} 秒内未就绪，继续启动", name, timeout)
+                    break
+            else:
+                info("{}已就绪，用时 {:.0f} ms", name, (time.perf_counter() - started) * 1000)
+        info("服务器启动用时 {:.0f} ms", (time.perf_counter() - started) * 1000)
+        return True
+    
     def _get_mode_description(self):
         """
         获取运行模式描述
@@ -338,6 +679,8 @@ class PvueApp:
         # 停止静态文件服务器
         if self.web_server:
             self.web_server.shutdown()
+            self.web_server.server_close()
+        self.web_ready.clear()
         
         # 停止 Eel 应用
         if self.eel_app:
@@ -351,7 +694,7 @@ class PvueApp:
         self.is_running = False
         info("Pvue 应用已停止")
 
-def run_pvue_app(web_port=3000, ws_port=8765, static_dir=None):
+def run_pvue_app(web_port=3000, ws_port=8765, static_dir=None, ws_workers=1):
     """
     快速启动 Pvue 应用的便捷函数
     
@@ -359,6 +702,7 @@ def run_pvue_app(web_port=3000, ws_port=8765, static_dir=None):
         web_port: 静态文件服务端口
         ws_port: WebSocket 服务器端口
         static_dir: 静态文件目录
+        ws_workers: WebSocket 工作进程数
     """
-    app = PvueApp(web_port, ws_port, static_dir)
+    app = PvueApp(web_port, ws_port, static_dir, ws_workers=ws_workers)
     app.start()
\ No newline at end of file
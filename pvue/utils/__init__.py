@@ -12,3 +12,21 @@ def get_static_dir():
     # 拼接静态文件目录路径
     static_dir = os.path.join(parent_dir, 'static')
     return static_dir
+
+def get_cache_dir():
+    """
+    获取用户缓存目录路径（不会创建目录）
+
+    Windows 使用 %LOCALAPPDATA%，macOS 使用 ~/Library/Caches，
+    其他平台使用 $XDG_CACHE_HOME 或 ~/.cache
+
+    Returns:
+        str: pvue 的缓存目录路径
+    """
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'pvue')
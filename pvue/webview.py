@@ -1,247 +1,403 @@
 """PyWebView 集成模块，用于将 Vue 3 前端嵌入到 Python GUI 窗口中"""
 
+import importlib.util
+import json
 import os
 import sys
 import threading
 import time
-from .utils import get_static_dir
+from .utils import get_static_dir, get_cache_dir
 from .logger import info, error, warning, debug
 
-# 初始化变量
+# 初始化变量，首次使用 webview 模式时由 initialize_webview() 设置
 webview = None
 webview_import_successful = False
-
-# 首先检查webview模块是否已安装
 webview_installed = False
-try:
-    # 先尝试简单导入，不初始化
-    import webview
-    webview_installed = True
-except ImportError:
-    debug("WebView 模块未安装，尝试安装...")
-    # 尝试自动安装pywebview
+# 是否已经导入并探测过 GUI 后端
+_initialized = False
+_initialize_lock = threading.Lock()
+# pywebview 上次实际启动的 GUI，下次启动时通过 gui 参数直接指定
+_BACKEND_CACHE_FILE = 'webview_backend.json'
+# webview.start() 的 gui 参数可选值
+_GUI_TYPES = ('qt', 'gtk', 'cef', 'mshtml', 'edgechromium', 'android', 'cocoa')
+# 使用缓存跳过探测时的 GUI，通过 gui 参数传给 webview.start()
+_cached_gui = None
+
+def initialize_webview():
+    """
+    导入 pywebview 并探测可用的 GUI 后端
+    
+    只在首次使用 webview 模式时执行一次，导入 pvue 时不执行，
+    web 模式和命令行工具不需要等待 pywebview 的导入和后端探测。
+    
+    Returns:
+        bool: webview 是否可用
+    """
+    global _initialized
+    with _initialize_lock:
+        if not _initialized:
+            # 有上次实际启动的 GUI 时直接使用，webview.start() 失败后才重新探测
+            if not _import_cached_backend():
+                _probe_backends()
+            _initialized = True
+    return webview is not None
+
+def _import_cached_backend():
+    """
+    使用缓存的 GUI 导入 pywebview，跳过后端探测
+    
+    Returns:
+        bool: 是否有缓存并且导入成功
+    """
+    global webview, webview_import_successful, webview_installed, _cached_gui
+    if sys.version_info >= (3, 14):
+        # Python 3.14 需要在探测时做兼容处理
+        return False
+    gui = _load_cached_backend()
+    if gui not in _GUI_TYPES:
+        return False
+    os.environ['PYWEBVIEW_GUI'] = gui
+    os.environ['WEBVIEW_GUI'] = gui  # 兼容旧版本
     try:
-        import subprocess
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "pywebview>=6.1"])
-        # 安装后再次尝试导入
-        import webview
-        webview_installed = True
-        info("WebView 模块安装成功")
+        import webview as module
     except Exception as e:
-        warning("WebView 模块安装失败: {}", e)
-        warning("建议手动安装: pip install pvue[webview]")
+        debug("使用缓存的 {} 后端导入 WebView 失败: {}", gui, e)
+        return False
+    webview = module
+    webview_installed = webview_import_successful = True
+    _cached_gui = gui
+    info("WebView 初始化成功，使用缓存的 {} 后端", gui)
+    return True
 
-if webview_installed:
-    # 确保不导入 pythonnet，避免 Python 3.14 兼容性问题
-    if 'pythonnet' in sys.modules:
-        del sys.modules['pythonnet']
+def _reprobe_backends():
+    """缓存的 GUI 启动失败后清除缓存并重新探测"""
+    global _cached_gui
+    _save_cached_backend(None)
+    _cached_gui = None
+    # 导入时设置的环境变量会让 pywebview 再次选择失败的 GUI
+    os.environ.pop('PYWEBVIEW_GUI', None)
+    os.environ.pop('WEBVIEW_GUI', None)
+    with _initialize_lock:
+        _probe_backends()
 
-    # 根据Python版本设置合适的后端
-    if sys.version_info >= (3, 14):
-        # Python 3.14+ 环境下，避免使用需要pythonnet的后端
-        os.environ['PYWEBVIEW_GUI'] = 'edgechromium'
-        os.environ['WEBVIEW_GUI'] = 'edgechromium'  # 兼容旧版本
-        # 只使用不需要pythonnet的后端
-        SUPPORTED_GUIS = ['edgechromium', 'cef', 'qt', 'qt5', 'qt6', 'gtk', 'wx']
+def _backend_cache_key():
+    """
+    GUI 后端缓存的键，Python 版本、平台或 pywebview 安装变化后缓存失效
+    
+    使用 pywebview 包文件的修改时间代替版本号，读取包元数据需要扫描 sys.path，耗时几十毫秒。
+    只查找包的位置，不导入 pywebview。
+    """
+    try:
+        installed = os.stat(importlib.util.find_spec('webview').origin).st_mtime_ns
+    except (ImportError, AttributeError, TypeError, ValueError, OSError):
+        installed = 'unknown'
+    return f"{sys.version_info[0]}.{sys.version_info[1]}-{sys.platform}-{installed}"
+
+def _get_backend_cache_path():
+    return os.path.join(get_cache_dir(), _BACKEND_CACHE_FILE)
+
+def _load_cached_backend():
+    """
+    读取缓存的 GUI 后端
+    
+    Returns:
+        str: 上次探测成功的后端，没有缓存或缓存不匹配当前环境时返回 None
+    """
+    try:
+        with open(_get_backend_cache_path(), encoding='utf-8') as f:
+            cache = json.load(f)
+        return cache.get(_backend_cache_key()) if isinstance(cache, dict) else None
+    except (OSError, ValueError):
+        return None
+
+def _save_cached_backend(gui):
+    """
+    保存探测成功的 GUI 后端，gui 为 None 时删除当前环境的缓存
+    
+    缓存写入失败不影响启动，只记录调试日志。
+    
+    Args:
+        gui: webview.start() 的 gui 参数
+    """
+    path = _get_backend_cache_path()
+    try:
+        with open(path, encoding='utf-8') as f:
+            cache = json.load(f)
+        if not isinstance(cache, dict):
+            cache = {}
+    except (OSError, ValueError):
+        cache = {}
+    key = _backend_cache_key()
+    if cache.get(key) == gui:
+        return
+    if gui is None:
+        cache.pop(key, None)
     else:
-        # 在较旧的Python版本上，可以使用更多后端
-        os.environ['PYWEBVIEW_GUI'] = 'edgechromium'
-        os.environ['WEBVIEW_GUI'] = 'edgechromium'  # 兼容旧版本
-        # 支持的后端列表，按优先级排序
-        SUPPORTED_GUIS = ['edgechromium', 'cef', 'gtk', 'qt', 'qt5', 'qt6', 'wx']
+        cache[key] = gui
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再替换，多个应用同时启动时不会读到写了一半的文件
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        debug("保存 GUI 后端缓存失败: {}", e)
 
-    # 尝试在所有 Python 版本上导入 webview 并初始化
-    for gui in SUPPORTED_GUIS:
+def _started_gui():
+    """
+    pywebview 实际启动的 GUI，在 webview.start() 初始化 GUI 之后调用
+    
+    Returns:
+        str: 可以传给 webview.start() 的 gui 参数，无法确定时返回 None
+    """
+    guilib = getattr(webview, 'guilib', None)
+    gui = getattr(guilib, '__name__', '').rpartition('.')[2]
+    if gui == 'winforms':
+        # Windows 上 winforms 根据 gui 参数选择渲染器
+        gui = getattr(webview, 'renderer', None)
+    return gui if gui in _GUI_TYPES else None
+
+def _remember_gui():
+    """由 webview.start() 在 GUI 启动后的后台线程中调用，保存实际启动的 GUI"""
+    gui = _started_gui()
+    if gui is not None:
+        _save_cached_backend(gui)
+
+def _probe_backends():
+    """导入 pywebview（未安装时尝试自动安装），按优先级尝试 GUI 后端"""
+    global webview, webview_import_successful, webview_installed
+    
+    # 首先检查webview模块是否已安装
+    try:
+        # 先尝试简单导入，不初始化
+        import webview
+        webview_installed = True
+    except ImportError:
+        debug("WebView 模块未安装，尝试安装...")
+        # 尝试自动安装pywebview
         try:
-            # 设置当前尝试的后端
-            os.environ['PYWEBVIEW_GUI'] = gui
-            os.environ['WEBVIEW_GUI'] = gui
+            import subprocess
+            subprocess.check_call([sys.executable, "-m", "pip", "install", "pywebview>=6.1"])
+            # 安装后再次尝试导入
+            import webview
+            webview_installed = True
+            info("WebView 模块安装成功")
+        except Exception as e:
+            warning("WebView 模块安装失败: {}", e)
+            warning("建议手动安装: pip install pvue[webview]")
+
+    if webview_installed:
+        # 确保不导入 pythonnet，避免 Python 3.14 兼容性问题
+        if 'pythonnet' in sys.modules:
+            del sys.modules['pythonnet']
+
+        # 根据Python版本设置合适的后端
+        if sys.version_info >= (3, 14):
+            # Python 3.14+ 环境下，避免使用需要pythonnet的后端
+            os.environ['PYWEBVIEW_GUI'] = 'edgechromium'
+            os.environ['WEBVIEW_GUI'] = 'edgechromium'  # 兼容旧版本
+            # 只使用不需要pythonnet的后端
+            SUPPORTED_GUIS = ['edgechromium', 'cef', 'qt', 'qt5', 'qt6', 'gtk', 'wx']
+        else:
+            # 在较旧的Python版本上，可以使用更多后端
+            os.environ['PYWEBVIEW_GUI'] = 'edgechromium'
+            os.environ['WEBVIEW_GUI'] = 'edgechromium'  # 兼容旧版本
+            # 支持的后端列表，按优先级排序
+            SUPPORTED_GUIS = ['edgechromium', 'cef', 'gtk', 'qt', 'qt5', 'qt6', 'wx']
+
+        # 尝试在所有 Python 版本上导入 webview 并初始化
+        for gui in SUPPORTED_GUIS:
+            try:
+                # 设置当前尝试的后端
+                os.environ['PYWEBVIEW_GUI'] = gui
+                os.environ['WEBVIEW_GUI'] = gui
             
-            # 清除之前的 webview 导入（如果有）
-            if 'webview' in sys.modules:
-                del sys.modules['webview']
+                # 清除之前的 webview 导入（如果有）
+                if 'webview' in sys.modules:
+                    del sys.modules['webview']
             
-            # 导入 webview 模块
-            import webview
+                # 导入 webview 模块
+                import webview
             
-            # 直接设置 gui 属性
-            webview.gui = gui
+                # 直接设置 gui 属性
+                webview.gui = gui
             
-            # 对于 Python 3.14，进行特殊处理，防止尝试导入 winforms
-            if sys.version_info >= (3, 14):
-                import types
+                # 对于 Python 3.14，进行特殊处理，防止尝试导入 winforms
+                if sys.version_info >= (3, 14):
+                    import types
                 
-                # 确保 platforms 模块存在
-                if not hasattr(webview, 'platforms'):
-                    webview.platforms = types.ModuleType('webview.platforms')
+                    # 确保 platforms 模块存在
+                    if not hasattr(webview, 'platforms'):
+                        webview.platforms = types.ModuleType('webview.platforms')
                 
-                # 确保当前后端模块存在
-                if not hasattr(webview.platforms, gui):
-                    # 尝试导入真正的后端模块
-                    try:
-                        import importlib
-                        real_backend = importlib.import_module(f'webview.platforms.{gui}')
-                        # 将后端模块添加到 webview.platforms
-                        setattr(webview.platforms, gui, real_backend)
-                    except ImportError:
-                        # 如果导入失败，创建一个基本的后端模块
-                        backend_module = types.ModuleType(f'webview.platforms.{gui}')
+                    # 确保当前后端模块存在
+                    if not hasattr(webview.platforms, gui):
+                        # 尝试导入真正的后端模块
+                        try:
+                            import importlib
+                            real_backend = importlib.import_module(f'webview.platforms.{gui}')
+                            # 将后端模块添加到 webview.platforms
+                            setattr(webview.platforms, gui, real_backend)
+                        except ImportError:
+                            # 如果导入失败，创建一个基本的后端模块
+                            backend_module = types.ModuleType(f'webview.platforms.{gui}')
                         
-                        # 定义必要的函数
-                        def create_window(*args, **kwargs):
-                            # 简单实现，实际会由 webview 库处理
-                            pass
+                            # 定义必要的函数
+                            def create_window(*args, **kwargs):
+                                # 简单实现，实际会由 webview 库处理
+                                pass
                         
-                        def start(*args, **kwargs):
-                            # 简单实现，实际会由 webview 库处理
-                            pass
+                            def start(*args, **kwargs):
+                                # 简单实现，实际会由 webview 库处理
+                                pass
                         
-                        def load_url(*args, **kwargs):
-                            # 简单实现，实际会由 webview 库处理
-                            pass
+                            def load_url(*args, **kwargs):
+                                # 简单实现，实际会由 webview 库处理
+                                pass
                         
-                        # 添加函数到后端模块
-                        backend_module.create_window = create_window
-                        backend_module.start = start
-                        backend_module.load_url = load_url
+                            # 添加函数到后端模块
+                            backend_module.create_window = create_window
+                            backend_module.start = start
+                            backend_module.load_url = load_url
                         
-                        # 将后端模块添加到 webview.platforms
-                        setattr(webview.platforms, gui, backend_module)
-                        # 添加到 sys.modules
-                        sys.modules[f'webview.platforms.{gui}'] = backend_module
+                            # 将后端模块添加到 webview.platforms
+                            setattr(webview.platforms, gui, backend_module)
+                            # 添加到 sys.modules
+                            sys.modules[f'webview.platforms.{gui}'] = backend_module
                 
-                # 重写 webview.guilib 模块，确保只使用当前后端
-                new_guilib = types.ModuleType('webview.guilib')
+                    # 重写 webview.guilib 模块，确保只使用当前后端
+                    new_guilib = types.ModuleType('webview.guilib')
                 
-                # 定义一个安全的 initialize 函数，只返回当前后端
-                def safe_initialize(gui_param=None):
-                    # 在当前 Python 环境下，只支持选定的后端
-                    return getattr(webview.platforms, gui)
+                    # 定义一个安全的 initialize 函数，只返回当前后端
+                    def safe_initialize(gui_param=None):
+                        # 在当前 Python 环境下，只支持选定的后端
+                        return getattr(webview.platforms, gui)
                 
-                # 定义一个安全的 try_import 函数，只尝试当前后端
-                def safe_try_import(guis):
-                    return True
+                    # 定义一个安全的 try_import 函数，只尝试当前后端
+                    def safe_try_import(guis):
+                        return True
                 
-                # 为新的 guilib 模块添加必要的属性
-                new_guilib.initialize = safe_initialize
-                new_guilib.try_import = safe_try_import
-                new_guilib.GUI = {gui: gui}
-                new_guilib.current_gui = gui
+                    # 为新的 guilib 模块添加必要的属性
+                    new_guilib.initialize = safe_initialize
+                    new_guilib.try_import = safe_try_import
+                    new_guilib.GUI = {gui: gui}
+                    new_guilib.current_gui = gui
                 
-                # 完全替换 webview.guilib 模块
-                webview.guilib = new_guilib
+                    # 完全替换 webview.guilib 模块
+                    webview.guilib = new_guilib
                 
-                # 防止 webview 尝试导入 clr 和 pythonnet
-                # 创建假的模块，防止真正的模块被导入
-                fake_clr = types.ModuleType('clr')
+                    # 防止 webview 尝试导入 clr 和 pythonnet
+                    # 创建假的模块，防止真正的模块被导入
+                    fake_clr = types.ModuleType('clr')
                 
-                # 为fake_clr添加必要的方法，防止AttributeError
-                def fake_add_reference(*args, **kwargs):
-                    # 模拟AddReference方法，不做任何实际操作
-                    print(f"[Pvue] 模拟调用 clr.AddReference{args}")
-                    return None
+                    # 为fake_clr添加必要的方法，防止AttributeError
+                    def fake_add_reference(*args, **kwargs):
+                        # 模拟AddReference方法，不做任何实际操作
+                        print(f"[Pvue] 模拟调用 clr.AddReference{args}")
+                        return None
                 
-                def fake_find_assembly(*args, **kwargs):
-                    # 模拟FindAssembly方法，返回None
-                    print(f"[Pvue] 模拟调用 clr.FindAssembly{args}")
-                    return None
+                    def fake_find_assembly(*args, **kwargs):
+                        # 模拟FindAssembly方法，返回None
+                        print(f"[Pvue] 模拟调用 clr.FindAssembly{args}")
+                        return None
                 
-                # 添加方法到fake_clr
-                fake_clr.AddReference = fake_add_reference
-                fake_clr.AddReferenceByName = fake_add_reference
-                fake_clr.FindAssembly = fake_find_assembly
-                fake_clr.Reference = types.ModuleType('clr.Reference')
+                    # 添加方法到fake_clr
+                    fake_clr.AddReference = fake_add_reference
+                    fake_clr.AddReferenceByName = fake_add_reference
+                    fake_clr.FindAssembly = fake_find_assembly
+                    fake_clr.Reference = types.ModuleType('clr.Reference')
                 
-                # 为Reference子模块添加必要的属性
-                fake_clr.Reference.Add = fake_add_reference
+                    # 为Reference子模块添加必要的属性
+                    fake_clr.Reference.Add = fake_add_reference
                 
-                sys.modules['clr'] = fake_clr
+                    sys.modules['clr'] = fake_clr
                 
-                fake_pythonnet = types.ModuleType('pythonnet')
-                sys.modules['pythonnet'] = fake_pythonnet
+                    fake_pythonnet = types.ModuleType('pythonnet')
+                    sys.modules['pythonnet'] = fake_pythonnet
                 
-                # 确保没有 winforms 相关模块
-                if hasattr(webview.platforms, 'winforms'):
-                    # 创建一个更完整的winforms模拟模块
-                    fake_winforms = types.ModuleType('webview.platforms.winforms')
+                    # 确保没有 winforms 相关模块
+                    if hasattr(webview.platforms, 'winforms'):
+                        # 创建一个更完整的winforms模拟模块
+                        fake_winforms = types.ModuleType('webview.platforms.winforms')
                     
-                    # 为fake_winforms添加必要的属性和方法
-                    def fake_create_window(*args, **kwargs):
-                        print(f"[Pvue] 模拟调用 winforms.create_window{args}")
-                        return None
+                        # 为fake_winforms添加必要的属性和方法
+                        def fake_create_window(*args, **kwargs):
+                            print(f"[Pvue] 模拟调用 winforms.create_window{args}")
+                            return None
                     
-                    def fake_start(*args, **kwargs):
-                        print(f"[Pvue] 模拟调用 winforms.start{args}")
-                        return None
+                        def fake_start(*args, **kwargs):
+                            print(f"[Pvue] 模拟调用 winforms.start{args}")
+                            return None
                     
-                    fake_winforms.create_window = fake_create_window
-                    fake_winforms.start = fake_start
-                    fake_winforms.close_window = lambda *args, **kwargs: None
+                        fake_winforms.create_window = fake_create_window
+                        fake_winforms.start = fake_start
+                        fake_winforms.close_window = lambda *args, **kwargs: None
                     
-                    # 替换winforms模块
-                    webview.platforms.winforms = fake_winforms
+                        # 替换winforms模块
+                        webview.platforms.winforms = fake_winforms
                 
-                # 清除 sys.modules 中的 winforms 相关模块
-                for module_name in list(sys.modules.keys()):
-                    if 'winforms' in module_name:
-                        del sys.modules[module_name]
+                    # 清除 sys.modules 中的 winforms 相关模块
+                    for module_name in list(sys.modules.keys()):
+                        if 'winforms' in module_name:
+                            del sys.modules[module_name]
                 
-                # 替换webview.guilib的import_winforms函数，防止它尝试导入winforms
-                if hasattr(webview.guilib, 'import_winforms'):
-                    def fake_import_winforms():
-                        print(f"[Pvue] 跳过winforms导入，Python 3.14不支持pythonnet")
-                        return False  # 返回False表示导入失败
+                    # 替换webview.guilib的import_winforms函数，防止它尝试导入winforms
+                    if hasattr(webview.guilib, 'import_winforms'):
+                        def fake_import_winforms():
+                            print(f"[Pvue] 跳过winforms导入，Python 3.14不支持pythonnet")
+                            return False  # 返回False表示导入失败
                     
-                    webview.guilib.import_winforms = fake_import_winforms
+                        webview.guilib.import_winforms = fake_import_winforms
                 
-                # 确保guilib的try_import函数不会尝试winforms
-                if hasattr(webview.guilib, 'try_import'):
-                    original_try_import = webview.guilib.try_import
+                    # 确保guilib的try_import函数不会尝试winforms
+                    if hasattr(webview.guilib, 'try_import'):
+                        original_try_import = webview.guilib.try_import
                     
-                    def safe_try_import(guis):
-                        # 过滤掉winforms，只尝试支持的后端
-                        filtered_guis = [gui for gui in guis if gui != 'winforms']
-                        debug("过滤后的后端列表: {}", filtered_guis)
-                        return original_try_import(filtered_guis)
+                        def safe_try_import(guis):
+                            # 过滤掉winforms，只尝试支持的后端
+                            filtered_guis = [gui for gui in guis if gui != 'winforms']
+                            debug("过滤后的后端列表: {}", filtered_guis)
+                            return original_try_import(filtered_guis)
                     
-                    webview.guilib.try_import = safe_try_import
+                        webview.guilib.try_import = safe_try_import
                 
-                # 确保webview.guilib.GUI不包含winforms
-                if hasattr(webview.guilib, 'GUI'):
-                    # 过滤掉winforms后端
-                    webview.guilib.GUI = {k: v for k, v in webview.guilib.GUI.items() if k != 'winforms'}
+                    # 确保webview.guilib.GUI不包含winforms
+                    if hasattr(webview.guilib, 'GUI'):
+                        # 过滤掉winforms后端
+                        webview.guilib.GUI = {k: v for k, v in webview.guilib.GUI.items() if k != 'winforms'}
             
-            # 测试 webview 是否能正常工作
-            # 尝试调用一个简单的函数，确保模块能正常使用
-            if hasattr(webview, 'create_window'):
-                webview_import_successful = True
-                info("WebView 初始化成功，使用 {} 后端", gui)
-                break  # 成功，退出循环
-        except Exception as e:
-            debug("尝试使用 {} 后端失败: {}", gui, e)
-            # 继续尝试下一个后端
-            continue
+                # 测试 webview 是否能正常工作
+                # 尝试调用一个简单的函数，确保模块能正常使用
+                if hasattr(webview, 'create_window'):
+                    webview_import_successful = True
+                    info("WebView 初始化成功，使用 {} 后端", gui)
+                    break  # 成功，退出循环
+            except Exception as e:
+                debug("尝试使用 {} 后端失败: {}", gui, e)
+                # 继续尝试下一个后端
+                continue
     
-    # 如果所有后端都失败，尝试使用一个基本的 webview 替代品
-    if not webview_import_successful:
-        warning("所有后端都初始化失败，尝试使用默认配置")
-        # 再次导入webview，但不初始化任何后端
-        import webview
-        webview_import_successful = True
-        # 确保基本属性存在
-        if not hasattr(webview, 'create_window'):
-            # 创建一个简单的create_window函数
-            def simple_create_window(*args, **kwargs):
-                debug("使用简单的create_window实现")
-                # 实际调用webview的内部实现
-                return webview.create_window(*args, **kwargs)
+        # 如果所有后端都失败，尝试使用一个基本的 webview 替代品
+        if not webview_import_successful:
+            warning("所有后端都初始化失败，尝试使用默认配置")
+            # 再次导入webview，但不初始化任何后端
+            import webview
+            webview_import_successful = True
+            # 确保基本属性存在
+            if not hasattr(webview, 'create_window'):
+                # 创建一个简单的create_window函数
+                def simple_create_window(*args, **kwargs):
+                    debug("使用简单的create_window实现")
+                    # 实际调用webview的内部实现
+                    return webview.create_window(*args, **kwargs)
             
-            webview.create_window = simple_create_window
-        info("WebView 模块已加载，将使用可用的默认配置")
-else:
-    warning("WebView 模块导入失败: 请先安装 pywebview")
-    warning("安装命令: pip install pvue[webview]")
-    webview = None
+                webview.create_window = simple_create_window
+            info("WebView 模块已加载，将使用可用的默认配置")
+    else:
+        warning("WebView 模块导入失败: 请先安装 pywebview")
+        warning("安装命令: pip install pvue[webview]")
+        webview = None
 
 class WebViewApp:
     """WebView 应用类，用于管理 PyWebView 初始化和前后端通信"""
@@ -321,22 +477,13 @@ class WebViewApp:
         Raises:
             RuntimeError: WebView不可用时
         """
-        # 检查 webview 是否可用
-        if webview is None:
+        # 首次使用时导入 pywebview 并探测后端，检查 webview 是否可用
+        if not initialize_webview():
             raise RuntimeError("WebView is not available. Please use web mode instead: app = PvueApp(mode='web')")
         
         try:
             # 创建 WebView 窗口
-            self.window = webview.create_window(
-                title=self.title,
-                url=server_url,
-                width=self.size[0],
-                height=self.size[1],
-                resizable=self.resizable,
-                fullscreen=self.fullscreen,
-                frameless=self.frameless,
-                js_api=self.exposed_functions
-            )
+            self._create_window(server_url)
             
             # 对于 Python 3.14，使用自定义的start逻辑，避免调用webview.start()
             if sys.version_info >= (3, 14):
@@ -361,9 +508,24 @@ class WebViewApp:
             else:
                 # 正常启动 WebView 主循环（必须在主线程中运行）
                 try:
-                    webview.start(debug=self.debug)
+                    self._start_gui()
+                    started = True
                 except Exception as e:
                     error("WebView启动失败: {}", e)
+                    started = False
+                    if _cached_gui is not None:
+                        # 缓存的 GUI 不可用：清除缓存，重新探测后端并重新创建窗口
+                        warning("缓存的 {} 后端启动失败，重新探测 GUI 后端", _cached_gui)
+                        _reprobe_backends()
+                        try:
+                            self._create_window(server_url)
+                            self._start_gui()
+                            started = True
+                        except Exception as e:
+                            error("WebView启动失败: {}", e)
+                    if not started:
+                        _save_cached_backend(None)
+                if not started:
                     warning("尝试使用自定义逻辑继续...")
                     # 启动失败时使用备用逻辑
                     info("WebView窗口已启动，访问地址: {}", server_url)
@@ -383,6 +545,28 @@ class WebViewApp:
             warning("建议使用web模式或eel模式")
             raise
     
+    def _create_window(self, server_url):
+        """创建 WebView 窗口，重新探测后端后需要在新导入的 webview 中重新创建"""
+        self.window = webview.create_window(
+            title=self.title,
+            url=server_url,
+            width=self.size[0],
+            height=self.size[1],
+            resizable=self.resizable,
+            fullscreen=self.fullscreen,
+            frameless=self.frameless,
+            js_api=self.exposed_functions
+        )
+    
+    def _start_gui(self):
+        """
+        启动 GUI 主循环，窗口关闭后返回
+        
+        使用缓存时通过 gui 参数直接指定上次实际启动的 GUI；GUI 启动后记录实际使用的 GUI。
+        """
+        options = {'gui': _cached_gui} if _cached_gui is not None else {}
+        webview.start(_remember_gui, debug=self.debug, **options)
+    
     def call(self, js_function, *args, **kwargs):
         """
         调用前端 JavaScript 函数
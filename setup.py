@@ -6,12 +6,12 @@ with open(os.path.join(os.path.dirname(__file__), 'README.md'), 'r', encoding='u
     long_description = f.read()
 
 # 核心依赖列表，不包含可能导致问题的pywebview
-# 选择兼容Python 3.6+的依赖版本
+# 选择兼容Python 3.7+的依赖版本（contextvars、asyncio.current_task 等需要 Python 3.7）
 install_requires = [
-    'websockets>=9.1',  # websockets 9.1支持Python 3.6+
-    'eel>=0.17.0',      # eel 0.17.0支持Python 3.6+
+    'websockets>=9.1',  # websockets 9.1支持Python 3.7
+    'eel>=0.17.0',      # eel 0.17.0支持Python 3.7
     'proxy_tools>=0.1.0',
-    'typing_extensions>=3.7.4.3;python_version<="3.7"',  # 为Python 3.6-3.7添加typing_extensions
+    'typing_extensions>=3.7.4.3;python_version<="3.7"',  # 为Python 3.7添加typing_extensions
 ]
 
 setup(
@@ -32,7 +32,6 @@ setup(
         "Intended Audience :: Developers",
         "Topic :: Software Development :: Libraries :: Python Modules",
         "License :: OSI Approved :: MIT License",
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
@@ -46,7 +45,7 @@ setup(
     ],
     
     # Python版本要求
-    python_requires=">=3.6",
+    python_requires=">=3.7",
     
     # 支持Python 3.14的特殊配置
     keywords=["vue", "python", "websocket", "desktop", "gui", "python3.14"],
@@ -60,9 +59,25 @@ setup(
         "webview": [
             'pywebview>=6.1',
         ],
+        # 二进制消息编解码器（WebSocket 子协议 pvue.msgpack / pvue.cbor）
+        "msgpack": [
+            'msgpack>=1.0',
+        ],
+        "cbor": [
+            'cbor2>=5.0',
+        ],
+        # 更快的 JSON 编解码器和事件循环
+        "fast": [
+            'orjson>=3.6',
+            'uvloop>=0.17; sys_platform != "win32"',
+        ],
         # 完整安装（包含所有可选依赖）
         "full": [
             'pywebview>=6.1',
+            'msgpack>=1.0',
+            'cbor2>=5.0',
+            'orjson>=3.6',
+            'uvloop>=0.17; sys_platform != "win32"',
         ],
     },
     
@@ -9,6 +9,10 @@ createApp({
     let isConnecting = false;
     let reconnectTimer = null;
     
+    // 未完成的请求，key 为请求 id
+    let nextRequestId = 1;
+    const pendingRequests = new Map();
+    
     // 状态管理
     const display = ref('');
     const history = ref('');
@@ -36,6 +40,7 @@ createApp({
       
       try {
         ws = new WebSocket(wsUrl);
+        ws.onmessage = handleResponse;
         
         // 连接打开事件
         ws.onopen = () => {
@@ -48,6 +53,7 @@ createApp({
         ws.onclose = () => {
           console.log('WebSocket连接已关闭');
           isConnecting = false;
+          rejectPendingRequests();
           showMessage('计算器与服务器连接已断开', 'error');
           // 3秒后尝试重连
           reconnectTimer = setTimeout(() => {
@@ -81,33 +87,52 @@ createApp({
           return;
         }
         
-        // 创建请求对象
+        // 创建请求对象，id 用于匹配响应（多个调用可以同时进行）
+        const id = nextRequestId++;
         const request = {
+          id: id,
           function: functionName,
           params: params
         };
         
+        pendingRequests.set(id, { resolve, reject });
+        
         // 发送请求
         ws.send(JSON.stringify(request));
-        
-        // 临时事件处理器，用于接收特定请求的响应
-        const handleResponse = (event) => {
-          try {
-            const response = JSON.parse(event.data);
-            // 移除临时事件处理器
-            ws.removeEventListener('message', handleResponse);
-            resolve(response.result);
-          } catch (error) {
-            ws.removeEventListener('message', handleResponse);
-            reject(new Error('响应解析失败'));
-          }
-        };
-        
-        // 添加临时事件处理器
-        ws.addEventListener('message', handleResponse);
       });
     };
     
+    // 处理后端响应，根据 id 找到对应的请求
+    const handleResponse = (event) => {
+      let response;
+      try {
+        response = JSON.parse(event.data);
+      } catch (error) {
+        console.error('响应解析失败:', error);
+        return;
+      }
+      
+      const pending = pendingRequests.get(response.id);
+      if (!pending) {
+        return;
+      }
+      pendingRequests.delete(response.id);
+      
+      if (response.error) {
+        pending.reject(new Error(response.error.message));
+      } else {
+        pending.resolve(response.result);
+      }
+    };
+    
+    // 连接断开时，拒绝所有未完成的请求
+    const rejectPendingRequests = () => {
+      pendingRequests.forEach(({ reject }) => {
+        reject(new Error('WebSocket连接已关闭'));
+      });
+      pendingRequests.clear();
+    };
+    
     // 切换标准/科学模式
     const toggleMode = () => {
       isScientific.value = !isScientific.value;
@@ -0,0 +1,33 @@
+"""测试共用的 fixture"""
+
+import socket
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def serve():
+    """
+    在后台线程中启动 WebSocketServer，返回连接地址，测试结束后停止
+
+    服务器监听临时端口，调用方在启动前暴露函数：
+
+        server = WebSocketServer(port=0)
+        server.expose_function('add', add)
+        url = serve(server)
+    """
+    started = []
+
+    def serve(server):
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        started.append((server, thread))
+        assert server.wait_ready(5), 'WebSocket server did not start'
+        port = next(sock.getsockname()[1] for sock in server.server.sockets if sock.family == socket.AF_INET)
+        return f'ws://127.0.0.1:{port}'
+
+    yield serve
+    for server, thread in started:
+        server.stop()
+        thread.join(5)
@@ -0,0 +1,101 @@
+"""结果缓存测试：缓存键、LRU 淘汰、过期、失效和共享编码结果"""
+
+import pytest
+
+from pvue.backend import cache as cache_module
+from pvue.backend.cache import CachedResult, ResultCache, make_key
+
+
+class CountingCodec:
+    name = 'counting'
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, value):
+        self.calls += 1
+        return repr(value)
+
+
+def test_make_key_ignores_dict_order():
+    assert make_key([{'a': 1, 'b': 2}]) == make_key([{'b': 2, 'a': 1}])
+
+
+def test_make_key_distinguishes_bytes_from_strings():
+    assert make_key([b'abc']) != make_key(['abc'])
+    assert make_key([b'abc']) == make_key([bytearray(b'abc')])
+
+
+def test_make_key_distinguishes_types():
+    assert make_key([1]) != make_key(['1'])
+    assert make_key([{1, 2}]) != make_key([[1, 2]])
+
+
+def test_lru_eviction():
+    cache = ResultCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a').value == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a').value == 1
+    assert cache.get('c').value == 3
+    assert cache.stats() == {'hits': 3, 'misses': 1, 'size': 2, 'maxsize': 2, 'ttl': None}
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, 'monotonic', lambda: now[0])
+    cache = ResultCache(ttl=10)
+    cache.put('a', 1)
+    now[0] = 109.0
+    assert cache.get('a').value == 1
+    now[0] = 110.0
+    assert cache.get('a') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_invalidate():
+    cache = ResultCache()
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.invalidate('a') == 1
+    assert cache.invalidate('a') == 0
+    assert cache.get('a') is None
+    assert cache.invalidate() == 1
+    assert cache.get('b') is None
+
+
+def test_put_after_invalidate_is_not_cached():
+    cache = ResultCache()
+    generation = cache.generation
+    cache.invalidate('a')
+    entry = cache.put('a', 'stale', generation)
+    assert entry.value == 'stale'
+    assert cache.get('a') is None
+    cache.put('a', 'fresh', cache.generation)
+    assert cache.get('a').value == 'fresh'
+
+
+def test_cached_result_encodes_once_per_codec():
+    codec = CountingCodec()
+    entry = CachedResult({'x': 1})
+    assert entry.encode(codec) == entry.encode(codec) == "{'x': 1}"
+    assert codec.calls == 1
+
+
+@pytest.mark.parametrize('option, expected', [
+    (None, None),
+    (False, None),
+    (True, (cache_module.DEFAULT_MAXSIZE, None)),
+    ({'maxsize': 5, 'ttl': 1.5}, (5, 1.5)),
+])
+def test_from_option(option, expected):
+    cache = ResultCache.from_option(option)
+    assert (cache and (cache.maxsize, cache.ttl)) == expected
+
+
+@pytest.mark.parametrize('option', [{'size': 1}, {'maxsize': 0}, {'ttl': -1}, 'yes'])
+def test_from_option_rejects_invalid_values(option):
+    with pytest.raises(ValueError):
+        ResultCache.from_option(option)
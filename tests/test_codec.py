@@ -0,0 +1,211 @@
+"""编解码器的类型编码测试：同一个返回值在所有编解码器中解码后得到相同的值"""
+
+import dataclasses
+import datetime
+import decimal
+import enum
+import uuid
+from pathlib import PurePosixPath
+
+import pytest
+
+from pvue.backend import codec as codec_module
+from pvue.backend.codec import CborCodec, JsonCodec, MsgpackCodec, TypeEncoderRegistry
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Color(enum.Enum):
+    RED = 1
+
+
+class Level(enum.IntEnum):
+    HIGH = 3
+
+
+class Tag(str):
+    pass
+
+
+class Ratio(float):
+    pass
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+    y: tuple
+
+
+def make_codecs(registry):
+    """创建当前环境可用的所有编解码器，JSON 分别使用 orjson 和标准库 json"""
+    codecs = [JsonCodec(registry, use_orjson=False)]
+    if codec_module.orjson is not None:
+        codecs.append(JsonCodec(registry, use_orjson=True))
+    if codec_module.msgpack is not None:
+        codecs.append(MsgpackCodec(registry))
+    if codec_module.cbor2 is not None:
+        codecs.append(CborCodec(registry))
+    return codecs
+
+
+def decode_all(registry, value):
+    return {
+        f'{codec.name}{"+orjson" if getattr(codec, "use_orjson", False) else ""}': codec.decode(codec.encode(value))
+        for codec in make_codecs(registry)
+    }
+
+
+def assert_identical(registry, value, expected):
+    for name, decoded in decode_all(registry, value).items():
+        assert decoded == expected, name
+
+
+def sample_value():
+    value = {
+        'datetime': datetime.datetime(2024, 1, 2, 3, 4, 5, 6),
+        'date': datetime.date(2024, 1, 2),
+        'time': datetime.time(3, 4, 5),
+        'decimal': decimal.Decimal('1.50'),
+        'uuid': uuid.UUID(int=1),
+        'enum': Color.RED,
+        'int_enum': Level.HIGH,
+        'path': PurePosixPath('/tmp/a'),
+        'set': {1},
+        'frozenset': frozenset(['a']),
+        'point': Point(1, (2, 3)),
+        'tuple': (1, (2, 'x')),
+        'tag': Tag('t'),
+        'ratio': Ratio(0.5),
+    }
+    if numpy is not None:
+        value['array'] = numpy.arange(3)
+        value['scalar'] = numpy.float64(0.25)
+    return value
+
+
+def test_builtin_types_identical_across_codecs():
+    expected = {
+        'datetime': '2024-01-02T03:04:05.000006',
+        'date': '2024-01-02',
+        'time': '03:04:05',
+        'decimal': '1.50',
+        'uuid': '00000000-0000-0000-0000-000000000001',
+        'enum': 1,
+        'int_enum': 3,
+        'path': '/tmp/a',
+        'set': [1],
+        'frozenset': ['a'],
+        'point': {'x': 1, 'y': [2, 3]},
+        'tuple': [1, [2, 'x']],
+        'tag': 't',
+        'ratio': 0.5,
+    }
+    if numpy is not None:
+        expected['array'] = [0, 1, 2]
+        expected['scalar'] = 0.25
+    assert_identical(TypeEncoderRegistry(), sample_value(), expected)
+
+
+def test_registered_encoders_override_native_handling():
+    registry = TypeEncoderRegistry()
+    registry.register(uuid.UUID, lambda value: {'uuid': value.int})
+    registry.register(Color, lambda value: value.name)
+    registry.register(Level, lambda value: value.name)
+    registry.register(Tag, lambda value: {'tag': str.__str__(value)})
+    registry.register(datetime.datetime, lambda value: value.year)
+    registry.register(Point, lambda value: [value.x])
+    if numpy is not None:
+        registry.register(numpy.ndarray, lambda value: {'shape': list(value.shape)})
+
+    value = sample_value()
+    expected = {
+        'datetime': 2024,
+        'date': '2024-01-02',
+        'time': '03:04:05',
+        'decimal': '1.50',
+        'uuid': {'uuid': 1},
+        'enum': 'RED',
+        'int_enum': 'HIGH',
+        'path': '/tmp/a',
+        'set': [1],
+        'frozenset': ['a'],
+        'point': [1],
+        'tuple': [1, [2, 'x']],
+        'tag': {'tag': 't'},
+        'ratio': 0.5,
+    }
+    if numpy is not None:
+        expected['array'] = {'shape': [3]}
+        expected['scalar'] = 0.25
+    assert_identical(registry, value, expected)
+
+
+def test_encoder_registered_after_first_encode_takes_effect():
+    registry = TypeEncoderRegistry()
+    codecs = make_codecs(registry)
+    for codec in codecs:
+        codec.encode(Color.RED)
+    registry.register(Color, lambda value: value.name)
+    for codec in codecs:
+        assert codec.decode(codec.encode(Color.RED)) == 'RED', codec.name
+
+
+def test_bytes_are_base64_in_json_and_raw_in_binary_codecs():
+    registry = TypeEncoderRegistry()
+    value = [b'\x00\x01', bytearray(b'\x02'), memoryview(b'\x03')]
+    for name, decoded in decode_all(registry, value).items():
+        if name.startswith('json'):
+            assert decoded == ['AAE=', 'Ag==', 'Aw=='], name
+        else:
+            assert decoded == [b'\x00\x01', b'\x02', b'\x03'], name
+
+
+def test_unsupported_type_raises_type_error():
+    for codec in make_codecs(TypeEncoderRegistry()):
+        with pytest.raises(TypeError):
+            codec.encode({'value': object()})
+
+
+@pytest.mark.parametrize('length', [0, 1, 15, 16, 23, 24, 255, 256, 65535, 65536])
+def test_encode_array_matches_encoding_the_whole_list(length):
+    items = list(range(length))
+    for codec in make_codecs(TypeEncoderRegistry()):
+        spliced = codec.encode_array([codec.encode(item) for item in items])
+        assert codec.decode(spliced) == items, codec.name
+
+
+@pytest.mark.parametrize('length', [0, 1, 15, 16, 23, 24, 65536])
+def test_encode_object_matches_encoding_the_whole_dict(length):
+    value = {f'key{index}': index for index in range(length)}
+    for codec in make_codecs(TypeEncoderRegistry()):
+        spliced = codec.encode_object([(key, codec.encode(item)) for key, item in value.items()])
+        assert codec.decode(spliced) == value, codec.name
+
+
+def test_encode_object_escapes_keys():
+    value = {'quote"': 1, 'newline\n': 2, '中文': 3}
+    for codec in make_codecs(TypeEncoderRegistry()):
+        spliced = codec.encode_object([(key, codec.encode(item)) for key, item in value.items()])
+        assert codec.decode(spliced) == value, codec.name
+
+
+def test_nested_splicing():
+    for codec in make_codecs(TypeEncoderRegistry()):
+        inner = codec.encode_object([('result', codec.encode([1, 'a']))])
+        spliced = codec.encode_object([('id', codec.encode(1)), ('batch', codec.encode_array([inner, inner]))])
+        assert codec.decode(spliced) == {'id': 1, 'batch': [{'result': [1, 'a']}] * 2}, codec.name
+
+
+def test_decode_rejects_invalid_messages():
+    for codec in make_codecs(TypeEncoderRegistry()):
+        invalid = b'\xc1' if codec.binary else '{"id": '
+        with pytest.raises(codec_module.DecodeError):
+            codec.decode(invalid)
+        if codec.binary:
+            # 二进制编解码器只接受二进制帧
+            with pytest.raises(codec_module.DecodeError):
+                codec.decode('{}')
@@ -0,0 +1,67 @@
+"""压缩测试：配置校验和按阈值压缩"""
+
+import pytest
+
+from pvue.backend import compression
+from pvue.backend.compression import DEFAULT_COMPRESSION, compression_options, serve_options
+
+needs_extensions = pytest.mark.skipif(
+    compression.PerMessageDeflate is None, reason='websockets does not support custom extensions'
+)
+
+
+def negotiate(threshold):
+    """与客户端协商 permessage-deflate，返回服务器端扩展"""
+    factory = serve_options(compression_options({'threshold': threshold}))['extensions'][0]
+    _, extension = factory.process_request_params([], [])
+    return extension
+
+
+def text_frame(data, fin=True):
+    from websockets.frames import Frame, Opcode
+    return Frame(Opcode.TEXT, data, fin=fin)
+
+
+def test_compression_options_defaults():
+    assert compression_options(True) == DEFAULT_COMPRESSION
+    assert compression_options(None)['enabled'] is False
+    assert compression_options(False)['enabled'] is False
+    assert compression_options({'threshold': 0})['threshold'] == 0
+
+
+@pytest.mark.parametrize('value', [
+    {'level': 1}, {'window_bits': 8}, {'memory_level': 10}, {'threshold': -1}, 'deflate'
+])
+def test_compression_options_rejects_invalid_values(value):
+    with pytest.raises(ValueError):
+        compression_options(value)
+
+
+def test_serve_options_disabled():
+    assert serve_options(compression_options(False)) == {'compression': None}
+
+
+@needs_extensions
+def test_small_messages_are_sent_uncompressed():
+    extension = negotiate(threshold=1024)
+    data = b'x' * 1023
+    frame = extension.encode(text_frame(data))
+    assert frame.data == data
+    assert not frame.rsv1
+
+
+@needs_extensions
+def test_large_messages_are_compressed():
+    extension = negotiate(threshold=1024)
+    data = b'x' * 1024
+    frame = extension.encode(text_frame(data))
+    assert frame.rsv1
+    assert len(frame.data) < len(data)
+    assert extension.decode(frame).data == data
+
+
+@needs_extensions
+def test_fragmented_messages_are_compressed_regardless_of_size():
+    extension = negotiate(threshold=1024)
+    frame = extension.encode(text_frame(b'x' * 10, fin=False))
+    assert frame.rsv1
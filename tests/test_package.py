@@ -0,0 +1,31 @@
+"""包入口测试：导入 pvue 不加载服务器和 GUI 依赖"""
+
+import os
+import subprocess
+import sys
+
+import pvue
+
+
+def test_import_does_not_load_server_or_gui_modules():
+    # 在新的解释器中检查，测试进程中其他测试已经导入过这些模块
+    code = (
+        "import sys, pvue\n"
+        "heavy = ('asyncio', 'websockets', 'pvue.backend.server', 'pvue.backend.tracing', 'pvue.main', 'webview', 'eel')\n"
+        "print(','.join(name for name in heavy if name in sys.modules))\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(pvue.__file__)))
+    output = subprocess.run(
+        [sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip() == ''
+
+
+def test_lazy_attributes_are_importable():
+    from pvue.backend.context import CallCancelled
+    from pvue.backend.server import WebSocketServer
+    assert pvue.WebSocketServer is WebSocketServer
+    assert pvue.CallCancelled is CallCancelled
+    for name in pvue.__all__:
+        assert hasattr(pvue, name)
+    assert set(pvue.__all__) <= set(dir(pvue))
@@ -0,0 +1,441 @@
+"""WebSocket 服务器测试：启动真实的服务器，通过 websockets 客户端收发消息"""
+
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import pytest
+import websockets
+
+from pvue.backend.cache import make_key
+from pvue.backend.context import get_cancel_token
+from pvue.backend import server as server_module
+from pvue.backend.server import WebSocketServer
+from pvue.backend.transfer import Download, unpack_frame
+from pvue.backend.workers import COMMAND_INVALIDATE_CACHE, MessageReader, decode_message, encode_message
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 10))
+
+
+async def send(ws, message):
+    await ws.send(json.dumps(message))
+
+
+async def receive(ws, timeout=5):
+    return json.loads(await asyncio.wait_for(ws.recv(), timeout))
+
+
+async def slow(seconds):
+    await asyncio.sleep(seconds)
+    return 'slow'
+
+
+def test_cancel_when_concurrent_call_limit_is_reached(serve):
+    server = WebSocketServer(port=0, max_concurrent_calls=2)
+    server.expose_function('slow', slow)
+    server.expose_function('ping', lambda: 'pong', execution='inline')
+    url = serve(server)
+
+    async def main():
+        async with websockets.connect(url) as ws:
+            await send(ws, {'id': 1, 'function': 'slow', 'params': [3]})
+            await send(ws, {'id': 2, 'function': 'slow', 'params': [3]})
+            started = time.monotonic()
+            await send(ws, {'type': 'cancel', 'id': 1})
+            await send(ws, {'type': 'cancel', 'id': 2})
+            await send(ws, {'id': 3, 'function': 'ping'})
+            # 被取消的调用不发送响应，名额释放后下一个调用立即执行
+            assert await receive(ws) == {'id': 3, 'result': 'pong'}
+            assert time.monotonic() - started < 2
+
+    run(main())
+
+
+class RecordingSupervisor:
+    """代替监督进程，记录主进程发送的命令"""
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, command, *args):
+        self.sent.append((command, args))
+
+
+def test_main_process_forwards_cache_invalidation_to_workers():
+    server = WebSocketServer(port=0)
+    server.expose_function('square', lambda x: x * x, cache=True)
+    server.supervisor = RecordingSupervisor()
+    assert server.invalidate_cache('square', [3]) is None
+    assert server.supervisor.sent == [(COMMAND_INVALIDATE_CACHE, ('square', [3]))]
+    with pytest.raises(KeyError):
+        server.invalidate_cache('missing')
+    # 缓存统计和性能分析只存在于工作进程中，不在主进程中静默返回空结果
+    for method in (server.cache_stats, server.start_profiling, server.stop_profiling, server.profiling_status):
+        with pytest.raises(RuntimeError):
+            method()
+
+
+def test_worker_applies_forwarded_cache_invalidation():
+    server = WebSocketServer(port=0)
+    server.expose_function('square', lambda x: x * x, cache=True)
+    cache = server.functions['square'].cache
+    supervisor, channel = socket.socketpair()
+    channel.setblocking(False)
+    server.worker_index = 0
+    server._channel = channel
+
+    async def main():
+        # 代替 run_worker()，只运行接收转发消息的任务
+        server.loop = asyncio.get_running_loop()
+        server._loop_thread_id = threading.get_ident()
+        receiver = asyncio.ensure_future(server._receive_messages())
+        try:
+            cache.put(make_key([3]), 9)
+            supervisor.sendall(encode_message(COMMAND_INVALIDATE_CACHE, 'square', [3]))
+            while cache.stats()['size']:
+                await asyncio.sleep(0.01)
+
+            # 在工作进程中调用时删除本进程的缓存，同时经监督进程通知其他工作进程
+            cache.put(make_key([4]), 16)
+            assert server.invalidate_cache('square', [4]) == 1
+            data = await server.loop.run_in_executor(None, supervisor.recv, 65536)
+            frames = MessageReader().feed(data)
+            assert [decode_message(frame) for frame in frames] == [(COMMAND_INVALIDATE_CACHE, ('square', [4]))]
+        finally:
+            receiver.cancel()
+
+    try:
+        run(main())
+    finally:
+        supervisor.close()
+        channel.close()
+
+
+def test_parallel_batch_respects_concurrent_call_limit(serve):
+    server = WebSocketServer(port=0, max_concurrent_calls=2)
+    running = []
+    peak = []
+
+    async def track(value):
+        running.append(value)
+        peak.append(len(running))
+        await asyncio.sleep(0.05)
+        running.remove(value)
+        return value
+
+    server.expose_function('track', track)
+    url = serve(server)
+
+    async def main():
+        async with websockets.connect(url) as ws:
+            await send(ws, [{'id': i, 'function': 'track', 'params': [i]} for i in range(6)])
+            assert await receive(ws) == [{'id': i, 'result': i} for i in range(6)]
+
+    run(main())
+    assert max(peak) == 2
+
+
+def test_download_reads_frames_in_executor(serve, tmp_path, monkeypatch):
+    data = bytes(range(256)) * 10
+    (tmp_path / 'a.bin').write_bytes(data)
+    threads = []
+    frame = Download.frame
+
+    def record_thread(download, offset, chunk_size):
+        threads.append(threading.current_thread().name)
+        return frame(download, offset, chunk_size)
+
+    monkeypatch.setattr(Download, 'frame', record_thread)
+    server = WebSocketServer(port=0, download_roots=[str(tmp_path)])
+    url = serve(server)
+
+    async def main():
+        async with websockets.connect(url) as ws:
+            await send(ws, {'id': 1, 'type': 'download', 'path': str(tmp_path / 'a.bin'), 'chunk_size': 1000})
+            started = await receive(ws)
+            assert started['result']['size'] == len(data)
+            received = bytearray()
+            for _ in range(3):
+                transfer_id, offset, chunk = unpack_frame(await asyncio.wait_for(ws.recv(), 5))
+                assert (transfer_id, offset) == (started['result']['transfer'], len(received))
+                received += chunk
+            assert bytes(received) == data
+            assert await receive(ws) == {'id': 1, 'done': True, 'count': 3, 'size': len(data)}
+
+    run(main())
+    # 文件在线程池中读取，不阻塞事件循环
+    assert len(threads) == 3
+    assert all(name.startswith('pvue-worker') for name in threads)
+
+
+def thread_name():
+    return threading.current_thread().name
+
+
+def test_execution_policies(serve):
+    server = WebSocketServer(port=0)
+    server.expose_function('inline', threading.get_ident, execution='inline')
+    server.expose_function('pool', thread_name)
+    server.expose_function('dedicated', thread_name, execution='dedicated')
+    url = serve(server)
+
+    async def main():
+        async with websockets.connect(url) as ws:
+            for index, name in enumerate(('inline', 'pool', 'dedicated')):
+                await send(ws, {'id': index, 'function': name})
+            return {response['id']: response['result'] for response in [await receive(ws) for _ in range(3)]}
+
+    results = run(main())
+    assert results[0] == server._loop_thread_id
+    assert results[1].startswith('pvue-worker')
+    assert results[2].startswith('pvue-dedicated')
+
+
+def test_blocking_call_does_not_block_other_clients(serve):
+    server = WebSocketServer(port=0)
+    server.expose_function('block', time.sleep)
+    server.expose_function('ping', lambda: 'pong', execution='inline')
+    url = serve(server)
+
+    async def main():
+        async with websockets.connect(url) as first, websockets.connect(url) as second:
+            await send(first, {'id': 1, 'function': 'block', 'params': [1]})
+            started = time.monotonic()
+            await send(second, {'id': 1, 'function': 'ping'})
+            assert await receive(second) == {'id': 1, 'result': 'pong'}
+            assert time.monotonic() - started < 0.5
+            assert await receive(first) == {'id': 1, 'result': None}
+
+    run(main())
+
+
+def test_responses_are_sent_as_calls_finish(serve):
+    server = WebSocketServer(port=0)
+    server.expose_function('slow', slow)
+    server.expose_function('echo', lambda value: value, execution='inline')
+    url = serve(server)
+
+    async def main():
+        async with websockets.connect(url) as ws:
+            await send(ws, {'id': 'a', 'function': 'slow', 'params': [0.3]})
+            await send(ws, {'id': 'b', 'function': 'echo', 'params': [1]})
+            await send(ws, {'id': 3, 'function': 'echo', 'params': [2]})
+            # 请求 ID 原样返回，先完成的调用先响应
+            assert await receive(ws) == {'id': 'b', 'result': 1}
+            assert await receive(ws) == {'id': 3, 'result': 2}
+            assert await receive(ws) == {'id': 'a', 'result': 'slow'}
+
+    run(main())
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+def test_error_envelope(serve):
+    server = WebSocketServer(port=0)
+    server.expose_function('fail', fail)
+    url = serve(server)
+
+    async def main():
+        async with websockets.connect(url) as ws:
+            await send(ws, {'id': 1, 'function': 'missing'})
+            assert (await receive(ws))['error'] == {
+                'code': 'function_not_found', 'type': 'RpcError', 'message': '不支持的功能 "missing"'
+            }
+            await send(ws, {'id': 2, 'function': 'fail', 'params': ['bad value']})
+            assert await receive(ws) == {
+                'id': 2, 'error': {'code': 'function_error', 'type': 'ValueError', 'message': 'bad value'}
+            }
+            await send(ws, {'id': 3, 'function': 'fail', 'params': 'x'})
+            assert (await receive(ws))['error']['code'] == 'invalid_request'
+            await send(ws, {'id': 4})
+            assert (await receive(ws))['error']['code'] == 'invalid_request'
+            await ws.send('{not json')
+            response = await receive(ws)
+            assert response['id'] is None
+            assert response['error']['code'] == 'invalid_json'
+
+    run(main())
+
+
+def test_batch(serve):
+    server = WebSocketServer(port=0)
+    values = []
+    server.expose_function('append', lambda value: values.append(value) or list(values), execution='inline')
+    url = serve(server)
+
+    async def main():
+        async with websockets.connect(url) as ws:
+            await send(ws, [{'id': 1, 'function': 'uppercase', 'params': ['a']}, {'id': 2, 'function': 'missing'}])
+            first, second = await receive(ws)
+            assert first == {'id': 1, 'result': 'A'}
+            assert second['id'] == 2 and second['error']['code'] == 'function_not_found'
+
+            calls = [{'id': index, 'function': 'append', 'params': [index]} for index in range(3)]
+            await send(ws, {'id': 'batch', 'batch': calls, 'parallel': False})
+            assert await receive(ws) == {'id': 'batch', 'batch': [
+                {'id': 0, 'result': [0]}, {'id': 1, 'result': [0, 1]}, {'id': 2, 'result': [0, 1, 2]}
+            ]}
+
+            await send(ws, {'id': 'bad', 'batch': {}})
+            assert (await receive(ws))['error']['code'] == 'invalid_request'
+
+    run(main())
+
+
+def test_streaming(serve):
+    server = WebSocketServer(port=0)
+    server.expose_function('count', lambda n: (i for i in range(n)))
+
+    async def count_async(n):
+        for i in range(n):
+            yield i
+
+    server.expose_function('count_async', count_async)
+    url = serve(server)
+
+    async def main():
+        async with websockets.connect(url) as ws:
+            for name in ('count', 'count_async'):
+                await send(ws, {'id': name, 'function': name, 'params': [3]})
+                assert [await receive(ws) for _ in range(4)] == [
+                    {'id': name, 'chunk': 0}, {'id': name, 'chunk': 1}, {'id': name, 'chunk': 2},
+                    {'id': name, 'done': True, 'count': 3}
+                ]
+            # 批量调用中收集所有数据块作为结果
+            await send(ws, [{'id': 1, 'function': 'count', 'params': [2]}])
+            assert await receive(ws) == [{'id': 1, 'result': [0, 1]}]
+
+    run(main())
+
+
+def test_streaming_pauses_generator_for_slow_readers(serve):
+    server = WebSocketServer(port=0)
+    produced = []
+    chunk = 'x' * 256 * 1024
+
+    def chunks():
+        for index in range(200):
+            produced.append(index)
+            yield chunk
+
+    server.expose_function('chunks', chunks)
+    url = serve(server)
+
+    async def main():
+        # 不协商压缩，重复的字符压缩后几乎不占用缓冲区
+        async with websockets.connect(url, max_queue=1, max_size=None, compression=None) as ws:
+            await send(ws, {'id': 1, 'function': 'chunks'})
+            await receive(ws)
+            # 客户端不再读取，写缓冲区满后生成器暂停
+            await asyncio.sleep(1)
+            assert len(produced) < 200
+            received = 1
+            while 'done' not in await receive(ws):
+                received += 1
+            assert received == 200
+
+    run(main())
+    assert len(produced) == 200
+
+
+def test_cancel_running_call(serve):
+    server = WebSocketServer(port=0)
+    observed = []
+
+    def wait_for_cancel():
+        token = get_cancel_token()
+        observed.append(token.wait(5))
+
+    server.expose_function('wait_for_cancel', wait_for_cancel)
+    server.expose_function('slow', slow)
+    url = serve(server)
+
+    async def main():
+        async with websockets.connect(url) as ws:
+            await send(ws, {'id': 1, 'function': 'wait_for_cancel'})
+            await send(ws, {'id': 2, 'function': 'slow', 'params': [5]})
+            await asyncio.sleep(0.1)
+            await send(ws, {'type': 'cancel', 'id': 1})
+            await send(ws, {'type': 'cancel', 'id': 2})
+            await send(ws, {'id': 3, 'function': 'uppercase', 'params': ['ok']})
+            # 被取消的调用不发送响应
+            assert await receive(ws) == {'id': 3, 'result': 'OK'}
+            with pytest.raises(asyncio.TimeoutError):
+                await receive(ws, timeout=0.3)
+
+    run(main())
+    # 线程池中的函数通过取消令牌得知调用已被取消
+    assert observed == [True]
+
+
+def test_single_flight(serve):
+    server = WebSocketServer(port=0)
+    calls = []
+
+    def load(key):
+        calls.append(key)
+        time.sleep(0.2)
+        return key * 2
+
+    server.expose_function('load', load, single_flight=True)
+    url = serve(server)
+
+    async def main():
+        async with websockets.connect(url) as first, websockets.connect(url) as second:
+            for ws in (first, second):
+                await send(ws, {'id': 1, 'function': 'load', 'params': [21]})
+                await send(ws, {'id': 2, 'function': 'load', 'params': [1]})
+            for ws in (first, second):
+                responses = [await receive(ws) for _ in range(2)]
+                assert sorted(responses, key=lambda response: response['id']) == [
+                    {'id': 1, 'result': 42}, {'id': 2, 'result': 2}
+                ]
+
+    run(main())
+    # 参数相同的并发调用只执行一次
+    assert sorted(calls) == [1, 21]
+
+
+def test_broadcast_to_subscribers(serve):
+    server = WebSocketServer(port=0)
+    url = serve(server)
+
+    async def main():
+        async with websockets.connect(url) as subscriber, websockets.connect(url) as other:
+            await send(subscriber, {'id': 1, 'type': 'subscribe', 'topics': ['news']})
+            assert await receive(subscriber) == {'id': 1, 'result': ['news']}
+            # 在其他线程中广播，结果为收到消息的客户端数量
+            future = server.broadcast('news', {'title': 'hello'})
+            assert await asyncio.wrap_future(future) == 1
+            assert await receive(subscriber) == {'topic': 'news', 'data': {'title': 'hello'}}
+            with pytest.raises(asyncio.TimeoutError):
+                await receive(other, timeout=0.2)
+
+            await send(subscriber, {'id': 2, 'type': 'unsubscribe', 'topics': 'news'})
+            assert await receive(subscriber) == {'id': 2, 'result': []}
+            assert await asyncio.wrap_future(server.broadcast('news', 1)) == 0
+
+    run(main())
+
+
+def test_client_errors_are_not_logged_as_server_errors(monkeypatch):
+    logged = []
+    monkeypatch.setattr(server_module, 'warning', lambda message, *args: logged.append(('warning', message)))
+    monkeypatch.setattr(server_module, 'error', lambda message, *args: logged.append(('error', message)))
+    server = WebSocketServer(port=0)
+    server.expose_function('fail', fail, execution='inline')
+
+    for request in ({'id': 1, 'function': 'missing'}, {'id': 2, 'function': 'fail', 'params': 'x'}, {'id': 3}):
+        run(server.handle_call(request))
+    assert [level for level, _ in logged] == ['warning'] * 3
+
+    # 函数自身抛出的异常仍然记录为错误
+    logged.clear()
+    run(server.handle_call({'id': 4, 'function': 'fail', 'params': ['bad']}))
+    assert [level for level, _ in logged] == ['error']
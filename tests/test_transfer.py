@@ -0,0 +1,216 @@
+"""文件传输测试：传输帧、上传续传和下载路径检查"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pvue.backend.transfer import (
+    FRAME_HEADER, TransferError, TransferManager, is_transfer_frame, pack_frame, unpack_frame
+)
+
+CLIENT = object()
+
+
+@pytest.fixture
+def manager(tmp_path):
+    root = tmp_path / 'files'
+    root.mkdir()
+    return TransferManager(upload_dir=str(tmp_path / 'uploads'), download_roots=[str(root)])
+
+
+def upload(manager, name, data, chunk_size=4, upload_id=None):
+    started = manager.start_upload(CLIENT, name, len(data), upload_id)
+    for offset in range(started['offset'], len(data), chunk_size):
+        manager.write_frame(CLIENT, pack_frame(started['transfer'], offset, data[offset:offset + chunk_size]))
+    return manager.finish_upload(CLIENT, started['transfer'])
+
+
+def test_pack_and_unpack_frame():
+    frame = pack_frame(7, 2 ** 40, b'data')
+    assert is_transfer_frame(frame)
+    transfer_id, offset, data = unpack_frame(frame)
+    assert (transfer_id, offset, bytes(data)) == (7, 2 ** 40, b'data')
+
+
+def test_unpack_empty_payload():
+    assert bytes(unpack_frame(pack_frame(1, 0, b''))[2]) == b''
+
+
+def test_unpack_truncated_frame():
+    with pytest.raises(TransferError):
+        unpack_frame(pack_frame(1, 0, b'')[:FRAME_HEADER.size - 1])
+
+
+def test_is_transfer_frame_rejects_other_messages():
+    assert not is_transfer_frame('\x00PVF')
+    assert not is_transfer_frame(b'\x00PV')
+    assert not is_transfer_frame(b'{"id": 1}')
+
+
+def test_upload(manager):
+    result = upload(manager, 'notes.txt', b'hello world')
+    assert result['name'] == 'notes.txt'
+    with open(result['path'], 'rb') as f:
+        assert f.read() == b'hello world'
+    assert manager.uploads == {}
+
+
+def test_upload_does_not_overwrite_existing_files(manager):
+    assert upload(manager, 'a.txt', b'1')['name'] == 'a.txt'
+    assert upload(manager, 'a.txt', b'2')['name'] == 'a (1).txt'
+
+
+def test_concurrent_uploads_with_the_same_name_do_not_overwrite_each_other(manager):
+    started = [manager.start_upload(CLIENT, 'a.txt', 1) for _ in range(8)]
+    for index, upload in enumerate(started):
+        manager.write_frame(CLIENT, pack_frame(upload['transfer'], 0, str(index).encode()))
+    barrier = threading.Barrier(len(started))
+
+    def finish(upload):
+        barrier.wait()
+        return manager.finish_upload(CLIENT, upload['transfer'])
+
+    with ThreadPoolExecutor(len(started)) as executor:
+        results = list(executor.map(finish, started))
+    assert len({result['path'] for result in results}) == len(started)
+    contents = set()
+    for result in results:
+        with open(result['path'], 'rb') as f:
+            contents.add(f.read())
+    assert contents == {str(index).encode() for index in range(len(started))}
+    assert manager.uploads == {}
+
+
+def test_upload_without_hard_links(manager, monkeypatch):
+    def link(source, path):
+        raise OSError('hard links are not supported')
+
+    monkeypatch.setattr(os, 'link', link)
+    assert upload(manager, 'a.txt', b'1')['name'] == 'a.txt'
+    result = upload(manager, 'a.txt', b'2')
+    assert result['name'] == 'a (1).txt'
+    with open(result['path'], 'rb') as f:
+        assert f.read() == b'2'
+    assert sorted(os.listdir(manager.upload_dir)) == ['a (1).txt', 'a.txt']
+
+
+def test_upload_keeps_only_the_file_name(manager):
+    result = upload(manager, '../../etc/passwd', b'x')
+    assert result['name'] == 'passwd'
+    assert os.path.dirname(result['path']) == manager.upload_dir
+
+
+def test_upload_resumes_from_received_offset(manager):
+    started = manager.start_upload(CLIENT, 'big.bin', 10)
+    manager.write_frame(CLIENT, pack_frame(started['transfer'], 0, b'01234'))
+    manager.close_client(CLIENT)
+
+    result = upload(manager, 'big.bin', b'0123456789', upload_id=started['upload_id'])
+    with open(result['path'], 'rb') as f:
+        assert f.read() == b'0123456789'
+
+
+def test_upload_rejects_out_of_order_and_oversized_data(manager):
+    transfer_id = manager.start_upload(CLIENT, 'a.bin', 4)['transfer']
+    with pytest.raises(TransferError):
+        manager.write_frame(CLIENT, pack_frame(transfer_id, 1, b'x'))
+    with pytest.raises(TransferError):
+        manager.write_frame(CLIENT, pack_frame(transfer_id, 0, b'12345'))
+    with pytest.raises(TransferError):
+        manager.finish_upload(CLIENT, transfer_id)
+
+
+def test_upload_belongs_to_its_client(manager):
+    transfer_id = manager.start_upload(CLIENT, 'a.bin', 1)['transfer']
+    with pytest.raises(TransferError):
+        manager.write_frame(object(), pack_frame(transfer_id, 0, b'x'))
+
+
+def test_abort_upload_removes_part_file(manager):
+    started = manager.start_upload(CLIENT, 'a.bin', 4)
+    manager.write_frame(CLIENT, pack_frame(started['transfer'], 0, b'12'))
+    manager.abort_upload(CLIENT, started['transfer'])
+    assert os.listdir(manager.upload_dir) == []
+
+
+@pytest.mark.parametrize('name, size, upload_id', [
+    ('', 1, None), (None, 1, None), ('a', -1, None), ('a', '1', None), ('a', 1, '../x')
+])
+def test_start_upload_rejects_invalid_parameters(manager, name, size, upload_id):
+    with pytest.raises(TransferError):
+        manager.start_upload(CLIENT, name, size, upload_id)
+
+
+def test_transfers_disabled_by_default(tmp_path):
+    manager = TransferManager()
+    with pytest.raises(TransferError):
+        manager.start_upload(CLIENT, 'a', 1)
+    with pytest.raises(TransferError):
+        manager.resolve_download(str(tmp_path))
+
+
+def test_resolve_download(manager):
+    root = manager.download_roots[0]
+    path = os.path.join(root, 'a.txt')
+    with open(path, 'wb') as f:
+        f.write(b'x')
+    assert manager.resolve_download(path) == path
+    assert manager.resolve_download(os.path.join(root, 'sub', '..', 'a.txt')) == path
+
+
+def test_resolve_download_rejects_path_traversal(manager, tmp_path):
+    secret = tmp_path / 'secret.txt'
+    secret.write_bytes(b'x')
+    root = manager.download_roots[0]
+    with pytest.raises(TransferError):
+        manager.resolve_download(os.path.join(root, '..', 'secret.txt'))
+    with pytest.raises(TransferError):
+        manager.resolve_download(str(secret))
+    # 与允许的目录同名前缀的目录
+    sibling = tmp_path / 'files2'
+    sibling.mkdir()
+    (sibling / 'a.txt').write_bytes(b'x')
+    with pytest.raises(TransferError):
+        manager.resolve_download(str(sibling / 'a.txt'))
+
+
+@pytest.mark.skipif(not hasattr(os, 'symlink'), reason='symlinks are not supported')
+def test_resolve_download_rejects_symlinks_out_of_root(manager, tmp_path):
+    secret = tmp_path / 'secret.txt'
+    secret.write_bytes(b'x')
+    link = os.path.join(manager.download_roots[0], 'link.txt')
+    os.symlink(str(secret), link)
+    with pytest.raises(TransferError):
+        manager.resolve_download(link)
+
+
+@pytest.mark.parametrize('path', ['missing.txt', '.', 42])
+def test_resolve_download_rejects_missing_files_and_directories(manager, path):
+    if isinstance(path, str):
+        path = os.path.join(manager.download_roots[0], path)
+    with pytest.raises(TransferError):
+        manager.resolve_download(path)
+
+
+def test_download_frames(manager):
+    path = os.path.join(manager.download_roots[0], 'a.bin')
+    with open(path, 'wb') as f:
+        f.write(b'0123456789')
+    download = manager.open_download(manager.resolve_download(path))
+    try:
+        assert download.size == 10
+        chunks = [unpack_frame(download.frame(offset, 4)) for offset in range(0, 10, 4)]
+    finally:
+        download.close()
+    assert [(offset, bytes(data)) for _, offset, data in chunks] == [(0, b'0123'), (4, b'4567'), (8, b'89')]
+    assert {transfer_id for transfer_id, _, _ in chunks} == {download.transfer_id}
+
+
+def test_download_empty_file(manager):
+    path = os.path.join(manager.download_roots[0], 'empty.bin')
+    open(path, 'wb').close()
+    download = manager.open_download(manager.resolve_download(path))
+    assert download.size == 0
+    download.close()
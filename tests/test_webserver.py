@@ -0,0 +1,282 @@
+"""静态文件服务器测试：Range 解析、keep-alive、sendfile 和路径检查
+
+服务器只监听 127.0.0.1 的临时端口。
+"""
+
+import http.client
+import io
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+from pvue.backend import webserver
+from pvue.backend.webserver import iter_file, make_web_server, parse_range
+from pvue.backend.server import WebSocketServer
+from pvue.main import ADMIN_TOKEN_HEADER, PvueApp
+
+LARGE_SIZE = 3 * webserver.FILE_BLOCK_SIZE + 123
+
+
+@pytest.mark.parametrize('value, size, expected', [
+    (None, 100, None),
+    ('', 100, None),
+    ('bytes=0-99', 100, (0, 99)),
+    ('bytes=10-19', 100, (10, 19)),
+    ('bytes=10-', 100, (10, 99)),
+    ('bytes=0-1000', 100, (0, 99)),
+    ('bytes=-10', 100, (90, 99)),
+    ('bytes=-200', 100, (0, 99)),
+    (' bytes=99-99 ', 100, (99, 99)),
+    # 无效或不支持的范围返回完整文件
+    ('bytes=5-2', 100, None),
+    ('bytes=0-1,5-6', 100, None),
+    ('bytes=-', 100, None),
+    ('items=0-1', 100, None),
+    ('bytes=a-b', 100, None),
+])
+def test_parse_range(value, size, expected):
+    assert parse_range(value, size) == expected
+
+
+@pytest.mark.parametrize('value, size', [
+    ('bytes=100-', 100),
+    ('bytes=100-200', 100),
+    ('bytes=-0', 100),
+    ('bytes=0-', 0),
+    ('bytes=-5', 0),
+])
+def test_parse_range_unsatisfiable(value, size):
+    with pytest.raises(ValueError):
+        parse_range(value, size)
+
+
+def test_iter_file_reads_length_from_current_position():
+    f = io.BytesIO(b'0123456789')
+    f.seek(2)
+    assert list(iter_file(f, 5, block_size=2)) == [b'23', b'45', b'6']
+    assert f.closed
+
+
+def test_iter_file_stops_at_end_of_file():
+    f = io.BytesIO(b'0123')
+    assert b''.join(iter_file(f, 100)) == b'0123'
+    assert f.closed
+
+
+def test_iter_file_closes_file_when_closed_early():
+    f = io.BytesIO(b'0123')
+    blocks = iter_file(f, 4, block_size=1)
+    next(blocks)
+    blocks.close()
+    assert f.closed
+
+
+@pytest.fixture(scope='module')
+def static_dir(tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp('webserver')
+    root = tmp_path / 'static'
+    root.mkdir()
+    (root / 'index.html').write_bytes(b'<h1>index</h1>')
+    (root / 'empty.txt').write_bytes(b'')
+    (root / 'large.bin').write_bytes(bytes(range(256)) * (LARGE_SIZE // 256) + b'x' * (LARGE_SIZE % 256))
+    (tmp_path / 'secret.txt').write_bytes(b'secret')
+    return root
+
+
+@pytest.fixture(scope='module')
+def server(static_dir):
+    app = PvueApp(static_dir=str(static_dir))
+    server = make_web_server('127.0.0.1', 0, app._static_file_handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def connection(server):
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+    yield connection
+    connection.close()
+
+
+def get(connection, path, headers=None, method='GET'):
+    connection.request(method, path, headers=headers or {})
+    response = connection.getresponse()
+    return response, response.read()
+
+
+def test_full_file(connection, static_dir):
+    response, body = get(connection, '/')
+    assert response.status == 200
+    assert body == (static_dir / 'index.html').read_bytes()
+    assert response.getheader('Content-Type') == 'text/html; charset=utf-8'
+    assert response.getheader('Accept-Ranges') == 'bytes'
+    assert response.getheader('Content-Length') == str(len(body))
+
+
+def test_range_requests(connection, static_dir):
+    data = (static_dir / 'large.bin').read_bytes()
+    response, body = get(connection, '/large.bin', {'Range': 'bytes=10-19'})
+    assert response.status == 206
+    assert response.getheader('Content-Range') == f'bytes 10-19/{len(data)}'
+    assert body == data[10:20]
+
+    response, body = get(connection, '/large.bin', {'Range': 'bytes=-100'})
+    assert response.status == 206
+    assert body == data[-100:]
+
+    response, body = get(connection, '/large.bin', {'Range': 'bytes=0-1,5-6'})
+    assert response.status == 200
+    assert body == data
+
+
+def test_range_past_end_of_file(connection, static_dir):
+    size = (static_dir / 'large.bin').stat().st_size
+    response, body = get(connection, '/large.bin', {'Range': f'bytes={size}-'})
+    assert response.status == 416
+    assert response.getheader('Content-Range') == f'bytes */{size}'
+    assert body == b''
+
+
+def test_empty_file(connection):
+    response, body = get(connection, '/empty.txt')
+    assert response.status == 200
+    assert response.getheader('Content-Length') == '0'
+    assert body == b''
+
+    response, body = get(connection, '/empty.txt', {'Range': 'bytes=0-'})
+    assert response.status == 416
+
+
+def test_head_sends_full_length_without_body(connection, static_dir):
+    response, body = get(connection, '/large.bin', method='HEAD')
+    assert response.status == 200
+    assert response.getheader('Content-Length') == str(LARGE_SIZE)
+    assert body == b''
+    # 连接仍然可以继续使用
+    response, body = get(connection, '/')
+    assert body == (static_dir / 'index.html').read_bytes()
+
+
+def test_keep_alive_reuses_connection(connection):
+    get(connection, '/')
+    sock = connection.sock
+    for path in ('/empty.txt', '/large.bin', '/missing.txt', '/'):
+        response, _ = get(connection, path)
+        assert response.getheader('Connection') != 'close'
+        assert connection.sock is sock
+
+
+def test_http_1_0_closes_connection(server):
+    with socket.create_connection(server.server_address, timeout=5) as sock:
+        sock.sendall(b'GET /index.html HTTP/1.0\r\n\r\n')
+        data = b''
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    assert data.startswith(b'HTTP/1.1 200')
+    assert data.endswith(b'<h1>index</h1>')
+
+
+def test_large_file_uses_sendfile(connection, static_dir, monkeypatch):
+    calls = []
+    original = webserver.KeepAliveServerHandler.sendfile
+
+    def sendfile(handler):
+        calls.append(original(handler))
+        return calls[-1]
+
+    monkeypatch.setattr(webserver.KeepAliveServerHandler, 'sendfile', sendfile)
+    data = (static_dir / 'large.bin').read_bytes()
+
+    response, body = get(connection, '/large.bin')
+    assert body == data
+    response, body = get(connection, '/large.bin', {'Range': f'bytes={len(data) - 1000}-'})
+    assert body == data[-1000:]
+
+    # 不到文件末尾的范围分块读取，不使用 file_wrapper
+    response, body = get(connection, '/large.bin', {'Range': 'bytes=100-70000'})
+    assert body == data[100:70001]
+    # 客户端收到完整响应时服务器线程可能还没有从 sendfile() 返回，
+    # 同一个连接上的请求按顺序处理，收到下一个响应后前面的请求都已处理完
+    get(connection, '/missing.txt')
+    assert calls == [True, True]
+
+
+@pytest.mark.parametrize('path', ['/../secret.txt', '/%2e%2e/secret.txt', '//etc/passwd', '/a/../../secret.txt'])
+def test_path_traversal_is_rejected(connection, path):
+    response, body = get(connection, path)
+    assert response.status == 404
+    assert b'secret' not in body
+
+
+@pytest.mark.skipif(os.sep != '\\', reason='backslash is only a separator on Windows')
+def test_backslash_path_traversal_is_rejected(connection):
+    response, _ = get(connection, '/..\\secret.txt')
+    assert response.status == 404
+
+
+@pytest.fixture
+def admin_app(tmp_path):
+    app = PvueApp(static_dir=str(tmp_path), admin=True)
+    app.ws_server = WebSocketServer(port=0)
+    server = make_web_server('127.0.0.1', 0, app._static_file_handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+    yield app, connection
+    connection.close()
+    server.shutdown()
+    server.server_close()
+    if app.ws_server.profiler.status()['active']:
+        app.ws_server.stop_profiling()
+
+
+def test_profile_start_and_stop_require_post(admin_app):
+    app, connection = admin_app
+    headers = {ADMIN_TOKEN_HEADER: app.admin_token}
+    for action in ('start', 'stop'):
+        response, _ = get(connection, f'/_pvue/profile/{action}', headers)
+        assert response.status == 405
+        assert response.getheader('Allow') == 'POST'
+    assert not app.profiling_status()['active']
+
+
+@pytest.mark.parametrize('headers', [{}, {ADMIN_TOKEN_HEADER: 'wrong'}])
+def test_profile_start_requires_admin_token(admin_app, headers):
+    app, connection = admin_app
+    response, _ = get(connection, '/_pvue/profile/start', headers, method='POST')
+    assert response.status == 403
+    assert not app.profiling_status()['active']
+
+
+def test_profile_start_and_stop_with_admin_token(admin_app):
+    app, connection = admin_app
+    headers = {ADMIN_TOKEN_HEADER: app.admin_token, 'Content-Type': 'application/x-www-form-urlencoded'}
+    connection.request('POST', '/_pvue/profile/start?calls=10', body='sample_rate=0.5', headers=headers)
+    response = connection.getresponse()
+    assert response.status == 200
+    assert json.loads(response.read())['active']
+    # 查询状态不改变状态，不需要令牌
+    response, body = get(connection, '/_pvue/profile/status')
+    assert response.status == 200
+    assert json.loads(body)['active']
+    # 参数可以放在查询字符串或表单请求体中
+    assert (app.ws_server.profiler.max_calls, app.ws_server.profiler.sample_rate) == (10, 0.5)
+    response, body = get(connection, '/_pvue/profile/stop', {ADMIN_TOKEN_HEADER: app.admin_token}, method='POST')
+    assert response.status == 200
+    assert 'files' in json.loads(body)
+    assert not app.profiling_status()['active']
+
+
+def test_admin_token_is_random_per_app(static_dir):
+    assert PvueApp(static_dir=str(static_dir)).admin_token is None
+    tokens = {PvueApp(static_dir=str(static_dir), admin=True).admin_token for _ in range(2)}
+    assert len(tokens) == 2
@@ -0,0 +1,112 @@
+"""webview 模式的 GUI 后端缓存测试，使用模拟的 pywebview 模块，不打开窗口"""
+
+import os
+import sys
+import types
+
+import pytest
+
+from pvue import webview as pvue_webview
+
+
+def fake_webview(started_gui='qt', fail=False):
+    """模拟 pywebview：start() 按 gui 参数“启动”GUI 并在后台回调中记录"""
+    module = types.ModuleType('webview')
+    module.guilib = None
+    module.renderer = None
+    module.windows = []
+    module.starts = []
+
+    def create_window(**kwargs):
+        module.windows.append(kwargs)
+        return kwargs
+
+    def start(func=None, debug=False, gui=None):
+        module.starts.append(gui)
+        if fail:
+            raise RuntimeError('GUI not available')
+        module.guilib = types.ModuleType(f'webview.platforms.{gui or started_gui}')
+        func()
+
+    module.create_window = create_window
+    module.start = start
+    return module
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    monkeypatch.setattr(pvue_webview, 'get_cache_dir', lambda: str(tmp_path))
+    monkeypatch.setattr(pvue_webview, '_initialized', False)
+    monkeypatch.setattr(pvue_webview, '_cached_gui', None)
+    monkeypatch.setattr(pvue_webview, 'webview', None)
+    monkeypatch.setattr(pvue_webview, 'webview_import_successful', False)
+    monkeypatch.delenv('PYWEBVIEW_GUI', raising=False)
+    monkeypatch.delenv('WEBVIEW_GUI', raising=False)
+    probes = []
+
+    def install(module):
+        monkeypatch.setitem(sys.modules, 'webview', module)
+
+    def probe():
+        probes.append(True)
+        pvue_webview.webview = sys.modules['webview']
+
+    monkeypatch.setattr(pvue_webview, '_probe_backends', probe)
+    return types.SimpleNamespace(install=install, probes=probes)
+
+
+def start_app():
+    app = pvue_webview.WebViewApp('.')
+    app.start('http://localhost:1')
+    return app
+
+
+def test_without_cache_probes_and_remembers_started_gui(env):
+    module = fake_webview(started_gui='gtk')
+    env.install(module)
+    start_app()
+    assert env.probes == [True]
+    assert module.starts == [None]
+    assert pvue_webview._load_cached_backend() == 'gtk'
+
+
+def test_cached_gui_skips_probe(env):
+    module = fake_webview()
+    env.install(module)
+    pvue_webview._save_cached_backend('qt')
+    start_app()
+    assert env.probes == []
+    assert module.starts == ['qt']
+    assert pvue_webview._load_cached_backend() == 'qt'
+
+
+def test_cached_gui_failure_reprobes_and_retries(env, monkeypatch):
+    failing = fake_webview(fail=True)
+    working = fake_webview(started_gui='gtk')
+    env.install(failing)
+    pvue_webview._save_cached_backend('qt')
+
+    def probe():
+        env.probes.append(True)
+        sys.modules['webview'] = working
+        pvue_webview.webview = working
+
+    monkeypatch.setattr(pvue_webview, '_probe_backends', probe)
+    start_app()
+    assert failing.starts == ['qt']
+    assert env.probes == [True]
+    # 重新探测后在新导入的模块中重新创建窗口，由 pywebview 选择 GUI
+    assert len(working.windows) == 1
+    assert working.starts == [None]
+    assert pvue_webview._load_cached_backend() == 'gtk'
+    assert 'PYWEBVIEW_GUI' not in os.environ
+
+
+def test_started_gui_maps_winforms_to_renderer(env):
+    module = fake_webview()
+    module.guilib = types.ModuleType('webview.platforms.winforms')
+    module.renderer = 'edgechromium'
+    pvue_webview.webview = module
+    assert pvue_webview._started_gui() == 'edgechromium'
+    module.renderer = 'unknown'
+    assert pvue_webview._started_gui() is None